@@ -1,9 +1,13 @@
 """SQLite database with FTS5 for session storage and search."""
 
 import sqlite3
+import threading
+import zlib
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from contextlib import contextmanager
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -34,43 +38,346 @@ class Message:
     timestamp: str
 
 
-def get_connection() -> sqlite3.Connection:
-    """Get a database connection with row factory."""
+# Connection-local tuning applied to every connection. journal_mode=WAL is
+# persistent in the database file, so it is set once in init_db().
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",  # 64MB
+    # Map up to 1GB of the file so FTS/list reads hit the page cache without
+    # a read() copy per page; this reserves address space, not memory
+    "PRAGMA mmap_size=1073741824",
+    "PRAGMA busy_timeout=60000",
+)
+
+# Size of sqlite3's per-connection prepared statement cache
+CACHED_STATEMENTS = 256
+
+# Hot statements, shared so every call hits the statement cache
+SQL_SESSION_EXISTS = "SELECT 1 FROM sessions WHERE id = ?"
+SQL_SESSION_FILE_INFO = (
+    "SELECT file_size, file_hash, file_mtime_ns FROM sessions WHERE id = ?"
+)
+SQL_GET_SESSION = "SELECT * FROM sessions WHERE id = ?"
+SQL_SESSION_IMPORT_STATE = (
+    "SELECT file_size, file_hash, file_mtime_ns, project, message_count "
+    "FROM sessions WHERE id = ?"
+)
+SQL_MESSAGE_COUNT = "SELECT COUNT(*) as cnt FROM messages WHERE session_id = ?"
+SQL_DELETE_SESSION_MESSAGES = "DELETE FROM messages WHERE session_id = ?"
+SQL_INSERT_MESSAGE = """
+    INSERT INTO messages (session_id, msg_id, role, content, timestamp)
+    VALUES (?, ?, ?, ?, ?)
+"""
+SQL_UPSERT_SESSION = """
+    INSERT INTO sessions (id, project, machine, first_message, started_at, ended_at, message_count, file_size, file_hash, agent, file_mtime_ns)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        project = excluded.project,
+        machine = excluded.machine,
+        first_message = excluded.first_message,
+        started_at = excluded.started_at,
+        ended_at = excluded.ended_at,
+        message_count = excluded.message_count,
+        file_size = excluded.file_size,
+        file_hash = excluded.file_hash,
+        agent = excluded.agent,
+        file_mtime_ns = excluded.file_mtime_ns
+"""
+
+
+def get_connection(read_only: bool = False) -> sqlite3.Connection:
+    """Get a database connection with row factory and tuned PRAGMAs.
+
+    Args:
+        read_only: Open an autocommit, query_only connection for reads.
+            Each statement then runs in its own short read transaction,
+            so readers never hold a snapshot open between calls.
+    """
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(
+        DB_PATH,
+        cached_statements=CACHED_STATEMENTS,
+        isolation_level=None if read_only else "",
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+# Long-lived connections per thread, one for writes and one for reads;
+# sqlite3 connections must not be shared across threads, but reusing them
+# keeps the page and statement caches warm between calls. Under WAL the
+# reader never waits on the writer's lock.
+_local = threading.local()
+
+
+def _thread_connection() -> sqlite3.Connection:
+    """Return this thread's cached write connection, opening it if needed.
+
+    The connection is reopened if DB_PATH has changed since it was opened.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_PATH:
+        return conn
+    if conn is not None:
+        _optimize_and_close(conn)
+    conn = get_connection()
+    _local.conn = conn
+    _local.path = DB_PATH
+    return conn
+
+
+def _thread_reader() -> sqlite3.Connection:
+    """Return this thread's cached read-only connection, opening it if needed.
+
+    The connection is reopened if DB_PATH has changed since it was opened.
+    """
+    conn = getattr(_local, "reader", None)
+    if conn is not None and _local.reader_path == DB_PATH:
+        return conn
+    if conn is not None:
+        conn.close()
+    conn = get_connection(read_only=True)
+    _local.reader = conn
+    _local.reader_path = DB_PATH
     return conn
 
 
+def optimize(conn: Optional[sqlite3.Connection] = None):
+    """Refresh planner statistics for tables whose stats are stale.
+
+    analysis_limit bounds the work ANALYZE does per index, so this is cheap
+    enough to run after every sync and on every close.
+    """
+    if conn is None:
+        conn = _thread_connection()
+    conn.execute("PRAGMA analysis_limit=400")
+    conn.execute("PRAGMA optimize")
+
+
+def _optimize_and_close(conn: sqlite3.Connection):
+    """Run PRAGMA optimize, then close the connection."""
+    try:
+        optimize(conn)
+    except sqlite3.Error:
+        pass  # Statistics are best-effort; never block closing
+    conn.close()
+
+
+def close_connection():
+    """Close this thread's cached connections, if any."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        _optimize_and_close(conn)
+        _local.conn = None
+    reader = getattr(_local, "reader", None)
+    if reader is not None:
+        reader.close()
+        _local.reader = None
+
+
+@lru_cache(maxsize=8)
+def _cached_names(table: str, db_path: Path) -> tuple[str, ...]:
+    """Sorted names from project_names or machine_names, cached per database."""
+    with get_read_db() as conn:
+        rows = conn.execute(f"SELECT name FROM {table} ORDER BY name").fetchall()
+        return tuple(row["name"] for row in rows)
+
+
+def _mark_names_dirty():
+    """Note that this thread wrote sessions; see _flush_name_cache."""
+    _local.names_dirty = True
+
+
+def _flush_name_cache():
+    """Drop cached project/machine names once a session write has ended.
+
+    Clearing after commit (or rollback) rather than at write time means no
+    thread can repopulate the cache from data that is not yet committed.
+    """
+    if getattr(_local, "names_dirty", False):
+        _local.names_dirty = False
+        _cached_names.cache_clear()
+
+
 @contextmanager
 def get_db():
-    """Context manager for database connections."""
-    conn = get_connection()
+    """Context manager yielding this thread's reusable connection.
+
+    Commits on success and rolls back on error; the connection stays open.
+    Inside transaction() the outer block owns the commit.
+    """
+    conn = _thread_connection()
+    if getattr(_local, "in_transaction", False):
+        yield conn
+        return
     try:
         yield conn
         conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
     finally:
-        conn.close()
+        _flush_name_cache()
+
+
+@contextmanager
+def get_read_db():
+    """Context manager yielding this thread's read-only connection.
+
+    Inside transaction() the write connection is yielded instead, so reads
+    in the block see its uncommitted changes.
+    """
+    if getattr(_local, "in_transaction", False):
+        yield _thread_connection()
+    else:
+        yield _thread_reader()
+
+
+@contextmanager
+def transaction():
+    """Run a block of db helper calls as a single IMMEDIATE transaction.
+
+    Helpers called inside the block share the transaction instead of
+    committing individually, so a whole session import costs one commit.
+    Nested calls join the outer transaction.
+    """
+    conn = _thread_connection()
+    if getattr(_local, "in_transaction", False):
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    _local.in_transaction = True
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        _local.in_transaction = False
+        _flush_name_cache()
+
+
+@contextmanager
+def savepoint():
+    """Run part of a transaction() block so that it can fail on its own.
+
+    On error the block's writes are rolled back and the error re-raised,
+    leaving earlier writes in the enclosing transaction in place.
+    """
+    conn = _thread_connection()
+    conn.execute("SAVEPOINT block")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK TO block")
+        raise
+    finally:
+        conn.execute("RELEASE block")
+
+
+# Bumped whenever an existing database needs a migration step that
+# CREATE ... IF NOT EXISTS cannot express; stored in PRAGMA user_version.
+SCHEMA_VERSION = 4
+
+# Only the first FTS_CONTENT_LIMIT characters of a message are tokenized,
+# bounding insert time and index growth for huge tool outputs. Full content
+# is still stored in (and returned from) the messages table.
+FTS_CONTENT_LIMIT = 16384
+
+
+# Column definitions shared by the schema script and the sessions rebuild.
+# The table is WITHOUT ROWID so lookups by id go straight to the row instead
+# of through a separate primary-key index.
+SESSIONS_COLUMNS = """
+    id TEXT PRIMARY KEY,
+    project TEXT NOT NULL,
+    machine TEXT DEFAULT 'local',
+    first_message TEXT,
+    started_at TEXT,
+    ended_at TEXT,
+    message_count INTEGER DEFAULT 0,
+    file_size INTEGER,
+    file_hash TEXT,
+    agent TEXT DEFAULT 'claude',
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    file_mtime_ns INTEGER
+"""
+# Columns the version 3 rebuild copies over (file_mtime_ns came later)
+SESSIONS_COLUMN_NAMES = (
+    "id, project, machine, first_message, started_at, ended_at, "
+    "message_count, file_size, file_hash, agent, created_at"
+)
+
+
+def _drop_fts(conn: sqlite3.Connection):
+    """Drop the FTS table and its sync triggers so they can be recreated."""
+    conn.executescript("""
+        DROP TRIGGER IF EXISTS messages_ai;
+        DROP TRIGGER IF EXISTS messages_ad;
+        DROP TRIGGER IF EXISTS messages_au;
+        DROP TABLE IF EXISTS messages_fts;
+    """)
+
+
+def _migrate_schema(conn: sqlite3.Connection, version: int) -> bool:
+    """Bring a database at schema `version` up to SCHEMA_VERSION.
+
+    Objects that are dropped here are recreated by init_db's schema script.
+
+    Returns:
+        True if the FTS index must be rebuilt from the messages table
+    """
+    rebuild_fts = False
+    if version < 1:
+        # Switch messages_fts to the porter tokenizer with prefix indexes
+        _drop_fts(conn)
+        rebuild_fts = True
+    if version < 2:
+        # Index only the first FTS_CONTENT_LIMIT characters of each message
+        _drop_fts(conn)
+        rebuild_fts = True
+    if version < 3:
+        # Rebuild sessions as a WITHOUT ROWID table. Its indexes and triggers
+        # go with the old table; the name tables are left as they are.
+        conn.executescript(f"""
+            BEGIN;
+            CREATE TABLE sessions_new ({SESSIONS_COLUMNS}) WITHOUT ROWID;
+            INSERT INTO sessions_new ({SESSIONS_COLUMN_NAMES})
+                SELECT {SESSIONS_COLUMN_NAMES} FROM sessions WHERE id IS NOT NULL;
+            DROP TABLE sessions;
+            ALTER TABLE sessions_new RENAME TO sessions;
+            COMMIT;
+        """)
+    elif version < 4:
+        # Source file mtime, which lets sync skip hashing unchanged files
+        # (the version 3 rebuild above already creates the column)
+        conn.execute("ALTER TABLE sessions ADD COLUMN file_mtime_ns INTEGER")
+    return rebuild_fts
 
 
 def init_db():
-    """Initialize the database schema."""
+    """Initialize the database schema, migrating older databases."""
     with get_db() as conn:
-        conn.executescript("""
+        # WAL lets readers proceed during imports and cuts fsyncs per commit
+        conn.execute("PRAGMA journal_mode=WAL")
+
+        rebuild_fts = False
+        has_schema = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sessions'"
+        ).fetchone() is not None
+        if has_schema:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            rebuild_fts = _migrate_schema(conn, version)
+
+        conn.executescript(f"""
             -- Sessions table
-            CREATE TABLE IF NOT EXISTS sessions (
-                id TEXT PRIMARY KEY,
-                project TEXT NOT NULL,
-                machine TEXT DEFAULT 'local',
-                first_message TEXT,
-                started_at TEXT,
-                ended_at TEXT,
-                message_count INTEGER DEFAULT 0,
-                file_size INTEGER,
-                file_hash TEXT,
-                agent TEXT DEFAULT 'claude',
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            );
+            CREATE TABLE IF NOT EXISTS sessions ({SESSIONS_COLUMNS}) WITHOUT ROWID;
 
             -- Messages table
             CREATE TABLE IF NOT EXISTS messages (
@@ -83,58 +390,210 @@ def init_db():
                 FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE CASCADE
             );
 
-            -- Full-text search virtual table
+            -- Capped view of message content that the FTS index is built from.
+            -- Triggers, 'rebuild' and snippet() all read the same truncated text,
+            -- so external-content deletes always match what was indexed.
+            CREATE VIEW IF NOT EXISTS messages_fts_content AS
+                SELECT id, substr(content, 1, {FTS_CONTENT_LIMIT}) AS content FROM messages;
+
+            -- Full-text search virtual table. Porter stemming folds word forms
+            -- into one term and the prefix indexes serve "term*" queries.
             CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
                 content,
-                content='messages',
-                content_rowid='id'
+                content='messages_fts_content',
+                content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2',
+                prefix='2 3'
             );
 
             -- Triggers to keep FTS in sync
             CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
-                INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+                INSERT INTO messages_fts(rowid, content)
+                    VALUES (new.id, substr(new.content, 1, {FTS_CONTENT_LIMIT}));
             END;
 
             CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
-                INSERT INTO messages_fts(messages_fts, rowid, content) VALUES('delete', old.id, old.content);
+                INSERT INTO messages_fts(messages_fts, rowid, content)
+                    VALUES('delete', old.id, substr(old.content, 1, {FTS_CONTENT_LIMIT}));
             END;
 
             CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE ON messages BEGIN
-                INSERT INTO messages_fts(messages_fts, rowid, content) VALUES('delete', old.id, old.content);
-                INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+                INSERT INTO messages_fts(messages_fts, rowid, content)
+                    VALUES('delete', old.id, substr(old.content, 1, {FTS_CONTENT_LIMIT}));
+                INSERT INTO messages_fts(rowid, content)
+                    VALUES (new.id, substr(new.content, 1, {FTS_CONTENT_LIMIT}));
+            END;
+
+            -- Distinct project/machine names with reference counts, kept in
+            -- sync by triggers so listing them is O(distinct names)
+            CREATE TABLE IF NOT EXISTS project_names (
+                name TEXT PRIMARY KEY,
+                session_count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+
+            CREATE TABLE IF NOT EXISTS machine_names (
+                name TEXT PRIMARY KEY,
+                session_count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS sessions_names_ai AFTER INSERT ON sessions BEGIN
+                INSERT INTO project_names(name, session_count)
+                    SELECT new.project, 1 WHERE new.project IS NOT NULL
+                    ON CONFLICT(name) DO UPDATE SET session_count = session_count + 1;
+                INSERT INTO machine_names(name, session_count)
+                    SELECT new.machine, 1 WHERE new.machine IS NOT NULL
+                    ON CONFLICT(name) DO UPDATE SET session_count = session_count + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS sessions_names_ad AFTER DELETE ON sessions BEGIN
+                UPDATE project_names SET session_count = session_count - 1 WHERE name = old.project;
+                DELETE FROM project_names WHERE name = old.project AND session_count <= 0;
+                UPDATE machine_names SET session_count = session_count - 1 WHERE name = old.machine;
+                DELETE FROM machine_names WHERE name = old.machine AND session_count <= 0;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS sessions_project_au AFTER UPDATE OF project ON sessions
+            WHEN old.project IS NOT new.project BEGIN
+                UPDATE project_names SET session_count = session_count - 1 WHERE name = old.project;
+                DELETE FROM project_names WHERE name = old.project AND session_count <= 0;
+                INSERT INTO project_names(name, session_count)
+                    SELECT new.project, 1 WHERE new.project IS NOT NULL
+                    ON CONFLICT(name) DO UPDATE SET session_count = session_count + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS sessions_machine_au AFTER UPDATE OF machine ON sessions
+            WHEN old.machine IS NOT new.machine BEGIN
+                UPDATE machine_names SET session_count = session_count - 1 WHERE name = old.machine;
+                DELETE FROM machine_names WHERE name = old.machine AND session_count <= 0;
+                INSERT INTO machine_names(name, session_count)
+                    SELECT new.machine, 1 WHERE new.machine IS NOT NULL
+                    ON CONFLICT(name) DO UPDATE SET session_count = session_count + 1;
+            END;
+
+            -- Rendered HTML exports (zlib-compressed). Every import path
+            -- upserts the session row, so dropping the entry whenever that
+            -- row changes keeps the cache from outliving its messages.
+            CREATE TABLE IF NOT EXISTS session_export_cache (
+                session_id TEXT PRIMARY KEY,
+                message_count INTEGER NOT NULL,
+                format_version INTEGER NOT NULL,
+                html BLOB NOT NULL,
+                built_at TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+
+            CREATE TRIGGER IF NOT EXISTS sessions_export_au AFTER UPDATE ON sessions BEGIN
+                DELETE FROM session_export_cache WHERE session_id = old.id;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS sessions_export_ad AFTER DELETE ON sessions BEGIN
+                DELETE FROM session_export_cache WHERE session_id = old.id;
             END;
 
             -- Indexes
-            CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id);
+            -- (session_id, timestamp, id) serves session loads and keyset pages
+            -- in order without a sort; it supersedes the session_id-only index
+            CREATE INDEX IF NOT EXISTS idx_messages_session_ts ON messages(session_id, timestamp, id);
+            DROP INDEX IF EXISTS idx_messages_session;
             CREATE INDEX IF NOT EXISTS idx_sessions_project ON sessions(project);
             CREATE INDEX IF NOT EXISTS idx_sessions_machine ON sessions(machine);
+
+            -- Partial expression indexes matching get_sessions_summary's filter and sort,
+            -- so listing pages walk an index instead of sorting in memory
+            CREATE INDEX IF NOT EXISTS idx_sessions_recent
+                ON sessions(COALESCE(ended_at, started_at, created_at) DESC)
+                WHERE message_count > 0;
+            CREATE INDEX IF NOT EXISTS idx_sessions_project_recent
+                ON sessions(project, COALESCE(ended_at, started_at, created_at) DESC)
+                WHERE message_count > 0;
         """)
 
+        # Backfill the name tables for databases created before they existed
+        _mark_names_dirty()
+        if conn.execute("SELECT 1 FROM project_names LIMIT 1").fetchone() is None:
+            conn.execute("""
+                INSERT INTO project_names(name, session_count)
+                SELECT project, COUNT(*) FROM sessions
+                WHERE project IS NOT NULL GROUP BY project
+            """)
+        if conn.execute("SELECT 1 FROM machine_names LIMIT 1").fetchone() is None:
+            conn.execute("""
+                INSERT INTO machine_names(name, session_count)
+                SELECT machine, COUNT(*) FROM sessions
+                WHERE machine IS NOT NULL GROUP BY machine
+            """)
+
+        if rebuild_fts:
+            conn.execute("INSERT INTO messages_fts(messages_fts) VALUES('rebuild')")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def _fetch_dicts(conn: sqlite3.Connection, sql: str, params=()) -> list[dict]:
+    """Run a query and return its rows as plain dicts.
+
+    Uses a tuple-returning cursor and zips each row with the column names
+    looked up once, instead of building a sqlite3.Row per row and copying
+    it through the mapping protocol with dict(row).
+    """
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+    names = [col[0] for col in cursor.description]
+    return [dict(zip(names, row)) for row in cursor]
+
 
 def session_exists(session_id: str) -> bool:
     """Check if a session exists."""
-    with get_db() as conn:
-        row = conn.execute(
-            "SELECT 1 FROM sessions WHERE id = ?", (session_id,)
-        ).fetchone()
+    with get_read_db() as conn:
+        row = conn.execute(SQL_SESSION_EXISTS, (session_id,)).fetchone()
         return row is not None
 
 
-def get_session_file_info(session_id: str) -> Optional[tuple[int, str]]:
-    """Get stored file size and hash for a session.
+def get_all_session_file_info() -> dict[str, tuple[int, str, Optional[int], str]]:
+    """Get stored file size, hash, mtime and project for every session in one scan.
+
+    Lets a sync run warm its change checks up front instead of issuing a
+    point lookup per file; the project lets an unchanged file be skipped
+    without any further query.
 
     Returns:
-        Tuple of (file_size, file_hash) or None if not found
+        Dict of session_id -> (file_size, file_hash, file_mtime_ns, project)
     """
-    with get_db() as conn:
-        row = conn.execute(
-            "SELECT file_size, file_hash FROM sessions WHERE id = ?", (session_id,)
-        ).fetchone()
+    with get_read_db() as conn:
+        rows = conn.execute(
+            "SELECT id, file_size, file_hash, file_mtime_ns, project FROM sessions"
+            " WHERE file_size IS NOT NULL"
+        ).fetchall()
+        return {
+            row["id"]: (row["file_size"], row["file_hash"], row["file_mtime_ns"], row["project"])
+            for row in rows
+        }
+
+
+def get_session_file_info(session_id: str) -> Optional[tuple[int, str, Optional[int]]]:
+    """Get stored file size, hash and mtime for a session.
+
+    Returns:
+        Tuple of (file_size, file_hash, file_mtime_ns) or None if not found
+    """
+    with get_read_db() as conn:
+        row = conn.execute(SQL_SESSION_FILE_INFO, (session_id,)).fetchone()
         if row and row["file_size"] is not None:
-            return (row["file_size"], row["file_hash"])
+            return (row["file_size"], row["file_hash"], row["file_mtime_ns"])
         return None
 
 
+def get_session_import_state(session_id: str) -> Optional[dict]:
+    """Get everything sync needs to decide whether to re-import a session.
+
+    Returns:
+        Dict with file_size, file_hash, file_mtime_ns, project and message_count,
+        or None if the session does not exist
+    """
+    with get_read_db() as conn:
+        row = conn.execute(SQL_SESSION_IMPORT_STATE, (session_id,)).fetchone()
+        return dict(row) if row else None
+
+
 def upsert_session(
     session_id: str,
     project: str,
@@ -146,37 +605,54 @@ def upsert_session(
     file_size: Optional[int] = None,
     file_hash: Optional[str] = None,
     agent: str = "claude",
+    file_mtime_ns: Optional[int] = None,
 ):
-    """Insert or update a session."""
+    """Insert or update a session.
+
+    file_mtime_ns is the source file's st_mtime_ns when file_size and
+    file_hash describe the whole file, letting sync skip rehashing it.
+    """
     with get_db() as conn:
-        conn.execute("""
-            INSERT INTO sessions (id, project, machine, first_message, started_at, ended_at, message_count, file_size, file_hash, agent)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(id) DO UPDATE SET
-                project = excluded.project,
-                machine = excluded.machine,
-                first_message = excluded.first_message,
-                started_at = excluded.started_at,
-                ended_at = excluded.ended_at,
-                message_count = excluded.message_count,
-                file_size = excluded.file_size,
-                file_hash = excluded.file_hash,
-                agent = excluded.agent
-        """, (session_id, project, machine, first_message, started_at, ended_at, message_count, file_size, file_hash, agent))
+        conn.execute(SQL_UPSERT_SESSION, (session_id, project, machine, first_message, started_at, ended_at, message_count, file_size, file_hash, agent, file_mtime_ns))
+        _mark_names_dirty()
+
+
+def update_session_file_mtime(
+    session_id: str, file_mtime_ns: Optional[int], file_hash: Optional[str] = None,
+):
+    """Record a new source mtime for a session whose file content is unchanged.
+
+    A `file_hash`, if given, replaces the stored hash of the same content.
+    """
+    with get_db() as conn:
+        conn.execute(
+            "UPDATE sessions SET file_mtime_ns = ?, file_hash = COALESCE(?, file_hash) WHERE id = ?",
+            (file_mtime_ns, file_hash, session_id),
+        )
+
+
+def upsert_sessions_batch(rows: Iterable[tuple]):
+    """Insert or update many sessions with a single executemany.
+
+    Args:
+        rows: Tuples of (session_id, project, machine, first_message, started_at,
+            ended_at, message_count, file_size, file_hash, agent, file_mtime_ns)
+    """
+    with get_db() as conn:
+        conn.executemany(SQL_UPSERT_SESSION, rows)
+        _mark_names_dirty()
 
 
 def delete_session_messages(session_id: str):
     """Delete all messages for a session (before re-importing)."""
     with get_db() as conn:
-        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        conn.execute(SQL_DELETE_SESSION_MESSAGES, (session_id,))
 
 
 def get_message_count(session_id: str) -> int:
     """Get the number of messages for a session."""
-    with get_db() as conn:
-        row = conn.execute(
-            "SELECT COUNT(*) as cnt FROM messages WHERE session_id = ?", (session_id,)
-        ).fetchone()
+    with get_read_db() as conn:
+        row = conn.execute(SQL_MESSAGE_COUNT, (session_id,)).fetchone()
         return row["cnt"] if row else 0
 
 
@@ -189,30 +665,63 @@ def insert_message(
 ):
     """Insert a message."""
     with get_db() as conn:
-        conn.execute("""
-            INSERT INTO messages (session_id, msg_id, role, content, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (session_id, msg_id, role, content, timestamp))
+        conn.execute(SQL_INSERT_MESSAGE, (session_id, msg_id, role, content, timestamp))
+
+
+# Rows per executemany() call when bulk inserting messages
+INSERT_CHUNK_SIZE = 1000
+
+
+def _insert_message_rows(
+    conn: sqlite3.Connection,
+    messages: Iterable[tuple],
+    chunk_size: int = INSERT_CHUNK_SIZE,
+):
+    """Insert message tuples in chunks so no caller needs a full list."""
+    rows = iter(messages)
+    while chunk := list(islice(rows, chunk_size)):
+        conn.executemany(SQL_INSERT_MESSAGE, chunk)
+
 
+def insert_messages_batch(messages: Iterable[tuple], chunk_size: int = INSERT_CHUNK_SIZE):
+    """Insert multiple messages in a batch.
 
-def insert_messages_batch(messages: list[tuple]):
-    """Insert multiple messages in a batch."""
+    Accepts any iterable of (session_id, msg_id, role, content, timestamp)
+    tuples and inserts it in chunks of chunk_size rows.
+    """
     with get_db() as conn:
-        conn.executemany("""
-            INSERT INTO messages (session_id, msg_id, role, content, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, messages)
+        _insert_message_rows(conn, messages, chunk_size)
+
+
+def replace_session_messages(session_id: str, messages: Iterable[tuple]):
+    """Replace all messages for a session (delete + bulk insert).
 
+    Runs as one transaction: FTS5 buffers the trigger-driven index updates
+    in memory and writes them out in bulk at commit, rather than flushing
+    the inverted index for each message.
+    """
+    with transaction() as conn:
+        conn.execute(SQL_DELETE_SESSION_MESSAGES, (session_id,))
+        _insert_message_rows(conn, messages)
+
+
+# Columns the session list needs; file bookkeeping stays out of listings
+SESSION_SUMMARY_COLUMNS = (
+    "id, project, machine, agent, first_message, started_at, ended_at, message_count"
+)
 
-def get_sessions(
+
+def get_sessions_summary(
     project: Optional[str] = None,
     machine: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
 ) -> list[dict]:
-    """Get sessions with optional filters."""
-    with get_db() as conn:
-        query = "SELECT * FROM sessions WHERE COALESCE(message_count, 0) > 0"
+    """Get list-view columns for sessions with optional filters."""
+    with get_read_db() as conn:
+        # "message_count > 0" (which also excludes NULL) and the ORDER BY
+        # expression must match the idx_sessions_*recent index definitions
+        query = f"SELECT {SESSION_SUMMARY_COLUMNS} FROM sessions WHERE message_count > 0"
         params = []
 
         if project:
@@ -225,86 +734,203 @@ def get_sessions(
         query += " ORDER BY COALESCE(ended_at, started_at, created_at) DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
 
-        rows = conn.execute(query, params).fetchall()
-        return [dict(row) for row in rows]
+        return _fetch_dicts(conn, query, params)
 
 
-def get_session(session_id: str) -> Optional[dict]:
-    """Get a single session."""
-    with get_db() as conn:
-        row = conn.execute(
-            "SELECT * FROM sessions WHERE id = ?", (session_id,)
-        ).fetchone()
+def get_session_detail(session_id: str) -> Optional[dict]:
+    """Get the full row for a single session."""
+    with get_read_db() as conn:
+        row = conn.execute(SQL_GET_SESSION, (session_id,)).fetchone()
         return dict(row) if row else None
 
 
 def get_session_messages(session_id: str) -> list[dict]:
     """Get all messages for a session."""
-    with get_db() as conn:
-        rows = conn.execute(
-            "SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp",
-            (session_id,)
-        ).fetchall()
-        return [dict(row) for row in rows]
+    with get_read_db() as conn:
+        return _fetch_dicts(
+            conn,
+            "SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp, id",
+            (session_id,),
+        )
+
+
+# Keyset page of a session's messages in (timestamp, id) order. The cursor
+# is the id of the last message already returned, so later pages cost an
+# index seek rather than an OFFSET scan.
+SQL_SESSION_MESSAGES_PAGE = """
+    SELECT * FROM messages
+    WHERE session_id = ?
+      AND (timestamp, id) > (SELECT timestamp, id FROM messages WHERE id = ?)
+    ORDER BY timestamp, id
+    LIMIT ?
+"""
+SQL_SESSION_MESSAGES_FIRST_PAGE = """
+    SELECT * FROM messages
+    WHERE session_id = ?
+    ORDER BY timestamp, id
+    LIMIT ?
+"""
+
+
+def get_session_messages_page(
+    session_id: str,
+    after_id: Optional[int] = None,
+    limit: int = 500,
+) -> list[dict]:
+    """Get up to `limit` messages for a session following message `after_id`."""
+    with get_read_db() as conn:
+        if after_id is None:
+            return _fetch_dicts(
+                conn, SQL_SESSION_MESSAGES_FIRST_PAGE, (session_id, limit)
+            )
+        return _fetch_dicts(
+            conn, SQL_SESSION_MESSAGES_PAGE, (session_id, after_id, limit)
+        )
+
+
+# Rows from a timestamp onward, skipping those at that timestamp already
+# returned. iter_session_messages pages by this instead of by row id:
+# a re-import replaces every id but keeps each message's position.
+SQL_SESSION_MESSAGES_FROM = """
+    SELECT * FROM messages
+    WHERE session_id = ? AND timestamp >= ?
+    ORDER BY timestamp, id
+    LIMIT ? OFFSET ?
+"""
+
+
+def iter_session_messages(session_id: str, page_size: int = 500) -> Iterator[dict]:
+    """Lazily yield all messages for a session, one page at a time."""
+    page = get_session_messages_page(session_id, limit=page_size)
+    timestamp, seen = None, 0
+    while True:
+        yield from page
+        if len(page) < page_size:
+            return
+        for message in page:
+            if message["timestamp"] == timestamp:
+                seen += 1
+            else:
+                timestamp, seen = message["timestamp"], 1
+        with get_read_db() as conn:
+            page = _fetch_dicts(
+                conn, SQL_SESSION_MESSAGES_FROM,
+                (session_id, timestamp, page_size, seen),
+            )
+
+
+# FTS5 drives both searches: the planner scans messages_fts through its
+# MATCH index in rank order and probes messages/sessions by primary key.
+# Pushing the project filter into a rowid IN (...) subquery instead loses
+# the rank-ordered scan and adds a temp B-tree sort.
+SQL_SEARCH_MESSAGES = """
+    SELECT m.*, s.project, s.machine,
+           snippet(messages_fts, 0, '<mark>', '</mark>', '...', 32) as snippet
+    FROM messages_fts
+    JOIN messages m ON messages_fts.rowid = m.id
+    JOIN sessions s ON m.session_id = s.id
+    WHERE messages_fts MATCH ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?
+"""
+SQL_SEARCH_MESSAGES_IN_PROJECT = """
+    SELECT m.*, s.project, s.machine,
+           snippet(messages_fts, 0, '<mark>', '</mark>', '...', 32) as snippet
+    FROM messages_fts
+    JOIN messages m ON messages_fts.rowid = m.id
+    JOIN sessions s ON m.session_id = s.id
+    WHERE messages_fts MATCH ? AND s.project = ?
+    ORDER BY rank
+    LIMIT ? OFFSET ?
+"""
+
+
+# Level 1 compresses repetitive export markup well at a fraction of the CPU cost
+EXPORT_COMPRESSION_LEVEL = 1
+
+SQL_GET_CACHED_EXPORT = """
+    SELECT html FROM session_export_cache
+    WHERE session_id = ? AND message_count = ? AND format_version = ?
+"""
+SQL_SAVE_CACHED_EXPORT = """
+    INSERT OR REPLACE INTO session_export_cache (session_id, message_count, format_version, html)
+    VALUES (?, ?, ?, ?)
+"""
+
+
+def get_cached_export(session_id: str, message_count: int, format_version: int) -> Optional[str]:
+    """Get cached export HTML if it was built for this message count and format.
+
+    Returns:
+        The HTML, or None on a cache miss
+    """
+    data = get_compressed_export(session_id, message_count, format_version)
+    if data is None:
+        return None
+    return zlib.decompress(data).decode("utf-8")
 
 
-def search_messages(query: str, limit: int = 100, project: str | None = None) -> list[dict]:
-    """Full-text search across messages, optionally filtered by project."""
+def get_compressed_export(session_id: str, message_count: int, format_version: int) -> Optional[bytes]:
+    """Get cached export HTML as stored, zlib-compressed.
+
+    Returns:
+        The compressed HTML, or None on a cache miss
+    """
+    with get_read_db() as conn:
+        row = conn.execute(
+            SQL_GET_CACHED_EXPORT, (session_id, message_count, format_version)
+        ).fetchone()
+    return row["html"] if row else None
+
+
+def save_cached_export(session_id: str, message_count: int, format_version: int, html: str):
+    """Store rendered export HTML, replacing any previous entry."""
+    data = zlib.compress(html.encode("utf-8"), EXPORT_COMPRESSION_LEVEL)
+    save_compressed_export(session_id, message_count, format_version, data)
+
+
+def save_compressed_export(session_id: str, message_count: int, format_version: int, data: bytes):
+    """Store export HTML that is already zlib-compressed (e.g. while streaming)."""
     with get_db() as conn:
+        conn.execute(SQL_SAVE_CACHED_EXPORT, (session_id, message_count, format_version, data))
+
+
+def search_messages(
+    query: str, limit: int = 100, project: str | None = None, offset: int = 0
+) -> list[dict]:
+    """Full-text search across messages, optionally filtered by project.
+
+    Results are ordered by FTS5's bm25 rank; offset pages through them.
+    """
+    with get_read_db() as conn:
         if project:
-            rows = conn.execute("""
-                SELECT m.*, s.project, s.machine,
-                       snippet(messages_fts, 0, '<mark>', '</mark>', '...', 32) as snippet
-                FROM messages_fts
-                JOIN messages m ON messages_fts.rowid = m.id
-                JOIN sessions s ON m.session_id = s.id
-                WHERE messages_fts MATCH ? AND s.project = ?
-                ORDER BY rank
-                LIMIT ?
-            """, (query, project, limit)).fetchall()
-        else:
-            rows = conn.execute("""
-                SELECT m.*, s.project, s.machine,
-                       snippet(messages_fts, 0, '<mark>', '</mark>', '...', 32) as snippet
-                FROM messages_fts
-                JOIN messages m ON messages_fts.rowid = m.id
-                JOIN sessions s ON m.session_id = s.id
-                WHERE messages_fts MATCH ?
-                ORDER BY rank
-                LIMIT ?
-            """, (query, limit)).fetchall()
-        return [dict(row) for row in rows]
+            return _fetch_dicts(
+                conn, SQL_SEARCH_MESSAGES_IN_PROJECT, (query, project, limit, offset)
+            )
+        return _fetch_dicts(conn, SQL_SEARCH_MESSAGES, (query, limit, offset))
 
 
 def get_projects() -> list[str]:
-    """Get list of unique projects."""
-    with get_db() as conn:
-        rows = conn.execute(
-            "SELECT DISTINCT project FROM sessions ORDER BY project"
-        ).fetchall()
-        return [row["project"] for row in rows]
+    """Get list of unique projects (cached until sessions are written)."""
+    return list(_cached_names("project_names", DB_PATH))
 
 
 def get_machines() -> list[str]:
-    """Get list of unique machines."""
-    with get_db() as conn:
-        rows = conn.execute(
-            "SELECT DISTINCT machine FROM sessions ORDER BY machine"
-        ).fetchall()
-        return [row["machine"] for row in rows]
+    """Get list of unique machines (cached until sessions are written)."""
+    return list(_cached_names("machine_names", DB_PATH))
 
 
-def get_stats() -> dict:
-    """Get database statistics."""
-    with get_db() as conn:
-        sessions = conn.execute("SELECT COUNT(*) as count FROM sessions").fetchone()["count"]
-        messages = conn.execute("SELECT COUNT(*) as count FROM messages").fetchone()["count"]
-        projects = conn.execute("SELECT COUNT(DISTINCT project) as count FROM sessions").fetchone()["count"]
-        machines = conn.execute("SELECT COUNT(DISTINCT machine) as count FROM sessions").fetchone()["count"]
+SQL_STATS = """
+    SELECT
+        (SELECT COUNT(*) FROM sessions) AS sessions,
+        (SELECT COUNT(*) FROM messages) AS messages,
+        (SELECT COUNT(*) FROM project_names) AS projects,
+        (SELECT COUNT(*) FROM machine_names) AS machines
+"""
 
-        return {
-            "sessions": sessions,
-            "messages": messages,
-            "projects": projects,
-            "machines": machines,
-        }
+
+def get_stats() -> dict:
+    """Get database statistics in a single query."""
+    with get_read_db() as conn:
+        row = conn.execute(SQL_STATS).fetchone()
+        return dict(row)
@@ -2,23 +2,36 @@
 
 import argparse
 import asyncio
-import json
+import hashlib
+import io
+import os
+import re
+import shutil
 import sys
+import time
 import webbrowser
-from pathlib import Path
+import zlib
+from pathlib import Path, PurePath
 from datetime import datetime
-from typing import Optional
-from contextlib import asynccontextmanager
-from dataclasses import dataclass, asdict
-import urllib.request
-import urllib.error
+from functools import lru_cache, partial
+from typing import Iterable, Iterator, Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager, suppress
+from dataclasses import dataclass, fields, replace
 import urllib.parse
 
-from fastapi import FastAPI, Query, UploadFile, File, HTTPException, Response
+from fastapi import FastAPI, Query, Request, UploadFile, File, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+import httpx
+import orjson
+
+try:
+    from watchfiles import awatch
+except ImportError:  # compiled extension; fall back to polling without it
+    awatch = None
 
 from . import db
 from . import sync as sync_module
@@ -30,19 +43,27 @@ DATA_DIR = Path.home() / ".agent-session-viewer"
 CONFIG_FILE = DATA_DIR / "config.json"
 
 
+# Parsed config as (path, config); the file only changes through save_config
+_config_cache: Optional[tuple[Path, dict]] = None
+
+
 def load_config() -> dict:
-    """Load configuration from config file."""
-    if CONFIG_FILE.exists():
-        try:
-            return json.loads(CONFIG_FILE.read_text())
-        except (json.JSONDecodeError, IOError):
-            return {}
-    return {}
+    """Load configuration from config file, parsing it only once."""
+    global _config_cache
+    if _config_cache is None or _config_cache[0] != CONFIG_FILE:
+        config = {}
+        if CONFIG_FILE.exists():
+            try:
+                config = orjson.loads(CONFIG_FILE.read_bytes())
+            except (orjson.JSONDecodeError, IOError):
+                config = {}
+        _config_cache = (CONFIG_FILE, config)
+    # Callers may modify the result before saving it
+    return dict(_config_cache[1])
 
 
 def save_config(config: dict) -> None:
     """Save configuration to config file with secure permissions."""
-    import os
     import stat
 
     # Ensure directory exists with restricted permissions (0o700)
@@ -53,10 +74,10 @@ def save_config(config: dict) -> None:
         pass  # May fail on some systems, but directory exists
 
     # Write config with restricted permissions (0o600)
-    content = json.dumps(config, indent=2)
+    content = orjson.dumps(config, option=orjson.OPT_INDENT_2)
     fd = os.open(CONFIG_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, stat.S_IRUSR | stat.S_IWUSR)
     try:
-        with os.fdopen(fd, 'w') as f:
+        with os.fdopen(fd, 'wb') as f:
             f.write(content)
         # Enforce permissions on existing files (os.open mode only applies on creation)
         CONFIG_FILE.chmod(stat.S_IRUSR | stat.S_IWUSR)  # 0o600
@@ -64,6 +85,9 @@ def save_config(config: dict) -> None:
         os.close(fd)
         raise
 
+    global _config_cache
+    _config_cache = (CONFIG_FILE, dict(config))
+
 
 def get_github_token() -> Optional[str]:
     """Get GitHub token from config."""
@@ -78,48 +102,99 @@ def set_github_token(token: str) -> None:
     save_config(config)
 
 
-def create_github_gist(content: str, filename: str, description: str, token: str) -> dict:
+GITHUB_API_URL = "https://api.github.com"
+
+# Shared client so calls to api.github.com reuse a pooled keep-alive
+# connection; created on first use and closed by lifespan on shutdown
+_github_client: Optional[httpx.AsyncClient] = None
+
+
+def get_github_client() -> httpx.AsyncClient:
+    """Get the shared GitHub API client, creating it if needed."""
+    global _github_client
+    if _github_client is None:
+        _github_client = httpx.AsyncClient(
+            base_url=GITHUB_API_URL,
+            timeout=30,
+            headers={
+                "Accept": "application/vnd.github.v3+json",
+                "User-Agent": "agent-session-viewer",
+            },
+        )
+    return _github_client
+
+
+async def close_github_client() -> None:
+    """Close the shared GitHub API client, if one was created."""
+    global _github_client
+    if _github_client is not None:
+        await _github_client.aclose()
+        _github_client = None
+
+
+async def create_github_gist(content: str, filename: str, description: str, token: str) -> dict:
     """Create a GitHub Gist and return the response."""
-    url = "https://api.github.com/gists"
-    data = json.dumps({
+    data = orjson.dumps({
         "description": description,
         "public": True,
         "files": {
             filename: {"content": content}
         }
-    }).encode("utf-8")
+    })
 
-    req = urllib.request.Request(
-        url,
-        data=data,
-        headers={
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json",
-            "Content-Type": "application/json",
-            "User-Agent": "agent-session-viewer",
-        },
-        method="POST",
-    )
+    try:
+        response = await get_github_client().post(
+            "/gists",
+            content=data,
+            headers={
+                "Authorization": f"token {token}",
+                "Content-Type": "application/json",
+            },
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to connect to GitHub: {e}")
 
+    if response.is_error:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"GitHub API error: {response.reason_phrase}. {response.text}"
+        )
+    return orjson.loads(response.content)
+
+
+async def get_github_user(token: str) -> dict:
+    """Fetch the authenticated GitHub user, validating the token."""
     try:
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else ""
+        response = await get_github_client().get(
+            "/user",
+            headers={"Authorization": f"token {token}"},
+            timeout=10,
+        )
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to connect to GitHub: {e}")
+
+    if response.status_code == 401:
+        raise HTTPException(status_code=401, detail="Invalid GitHub token")
+    if response.is_error:
         raise HTTPException(
-            status_code=e.code,
-            detail=f"GitHub API error: {e.reason}. {error_body}"
+            status_code=response.status_code,
+            detail=f"GitHub API error: {response.reason_phrase}"
         )
-    except urllib.error.URLError as e:
-        raise HTTPException(status_code=502, detail=f"Failed to connect to GitHub: {e.reason}")
+    return orjson.loads(response.content)
 
 
 class TokenRequest(BaseModel):
     token: str
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SyncStatus:
+    """Snapshot of sync progress.
+
+    Frozen: the sync thread publishes each update as a new object, so
+    /api/status always reads a consistent set of counters.
+    """
+
     is_syncing: bool = False
     current_project: str = ""
     current_session: str = ""
@@ -130,92 +205,234 @@ class SyncStatus:
     messages_indexed: int = 0
     phase: str = "idle"  # idle, discovering, syncing, done
 
+    def to_dict(self) -> dict:
+        """Flat dict of the fields, without asdict()'s recursive copying."""
+        return {name: getattr(self, name) for name in _SYNC_STATUS_FIELDS}
+
+
+_SYNC_STATUS_FIELDS = tuple(f.name for f in fields(SyncStatus))
+
 
 # Global state
 last_sync_time: Optional[datetime] = None
-scheduler: Optional[AsyncIOScheduler] = None
 sync_status = SyncStatus()
 
 
+# Minimum seconds between progress bar redraws during a sync
+PROGRESS_PRINT_INTERVAL = 0.05
+
+
 def run_sync():
     """Run sync and update last sync time."""
     global last_sync_time, sync_status
     import sys
 
+    last_print = 0.0
+
+    def print_progress():
+        """Redraw the progress line."""
+        nonlocal last_print
+        last_print = time.monotonic()
+        pct = (sync_status.sessions_done / sync_status.sessions_total * 100) if sync_status.sessions_total > 0 else 0
+        bar_width = 30
+        filled = int(bar_width * sync_status.sessions_done / sync_status.sessions_total) if sync_status.sessions_total > 0 else 0
+        bar = "█" * filled + "░" * (bar_width - filled)
+        sys.stdout.write(f"\r{bar} {pct:5.1f}% | {sync_status.sessions_done}/{sync_status.sessions_total} sessions | {sync_status.messages_indexed} msgs | {sync_status.current_project}")
+        sys.stdout.write("\033[K")  # Clear to end of line
+        sys.stdout.flush()
+
     def on_progress(event: str, **kwargs):
         """Handle sync progress updates."""
         global sync_status
+        status = sync_status
         if event == "start":
-            sync_status.is_syncing = True
-            sync_status.phase = "discovering"
-            sync_status.projects_total = kwargs.get("projects", 0)
-            sync_status.projects_done = 0
-            sync_status.sessions_total = 0
-            sync_status.sessions_done = 0
-            sync_status.messages_indexed = 0
+            sync_status = replace(
+                status,
+                is_syncing=True,
+                phase="discovering",
+                projects_total=kwargs.get("projects", 0),
+                projects_done=0,
+                sessions_total=0,
+                sessions_done=0,
+                messages_indexed=0,
+            )
             print(f"Syncing {sync_status.projects_total} projects...")
         elif event == "project_start":
-            sync_status.phase = "syncing"
-            sync_status.current_project = kwargs.get("project", "")
-            sync_status.sessions_total += kwargs.get("sessions", 0)
+            sync_status = replace(
+                status,
+                phase="syncing",
+                current_project=kwargs.get("project", ""),
+                sessions_total=status.sessions_total + kwargs.get("sessions", 0),
+            )
         elif event == "project_done":
-            sync_status.projects_done += 1
+            sync_status = replace(status, projects_done=status.projects_done + 1)
         elif event == "session_start":
-            sync_status.current_session = kwargs.get("session", "")
+            sync_status = replace(status, current_session=kwargs.get("session", ""))
         elif event == "session_done":
-            sync_status.sessions_done += 1
-            sync_status.messages_indexed += kwargs.get("messages", 0)
-            # Print progress line
-            pct = (sync_status.sessions_done / sync_status.sessions_total * 100) if sync_status.sessions_total > 0 else 0
-            bar_width = 30
-            filled = int(bar_width * sync_status.sessions_done / sync_status.sessions_total) if sync_status.sessions_total > 0 else 0
-            bar = "█" * filled + "░" * (bar_width - filled)
-            sys.stdout.write(f"\r{bar} {pct:5.1f}% | {sync_status.sessions_done}/{sync_status.sessions_total} sessions | {sync_status.messages_indexed} msgs | {sync_status.current_project}")
-            sys.stdout.write("\033[K")  # Clear to end of line
-            sys.stdout.flush()
+            sync_status = replace(
+                status,
+                sessions_done=status.sessions_done + 1,
+                messages_indexed=status.messages_indexed + kwargs.get("messages", 0),
+            )
+            # Redraw at most PROGRESS_PRINT_INTERVAL apart; terminal writes
+            # would otherwise dominate fast syncs of many small sessions
+            if (time.monotonic() - last_print >= PROGRESS_PRINT_INTERVAL
+                    or sync_status.sessions_done == sync_status.sessions_total):
+                print_progress()
         elif event == "done":
-            sync_status.is_syncing = False
-            sync_status.phase = "done"
-            sync_status.current_project = ""
-            sync_status.current_session = ""
+            if last_print:
+                print_progress()  # Show the final counts
+            sync_status = replace(
+                status,
+                is_syncing=False,
+                phase="done",
+                current_project="",
+                current_session="",
+            )
             print()  # Newline after progress bar
 
-    result = sync_module.sync_all(on_progress=on_progress)
+    try:
+        result = sync_module.sync_all(on_progress=on_progress)
+    except BaseException:
+        # A failed sync never sends "done"; don't leave /api/status
+        # reporting it as still running
+        if last_print:
+            print()  # End the partial progress bar
+        sync_status = replace(
+            sync_status,
+            is_syncing=False,
+            phase="idle",
+            current_project="",
+            current_session="",
+        )
+        raise
     last_sync_time = datetime.now()
-    sync_status.phase = "idle"
+    sync_status = replace(sync_status, phase="idle")
     print(f"Sync complete: {result['total_sessions']} sessions, {sync_status.messages_indexed} messages indexed")
     return result
 
 
+# Admission control: at most one sync runs at a time. Manual syncs wait for
+# the active one to finish; scheduled ticks are skipped instead of queued.
+# The state lives on app.state, created by lifespan: an asyncio.Condition
+# belongs to the event loop that first uses it, so one made at import would
+# break a later lifespan on another loop.
+
+# Seconds shutdown waits for an unfinished initial sync
+SHUTDOWN_SYNC_TIMEOUT = 10.0
+
+
+async def run_sync_exclusive():
+    """Run run_sync in a worker thread once no other sync is active."""
+    state = app.state
+    async with state.sync_lock:
+        while state.sync_active:
+            await state.sync_lock.wait()
+        state.sync_active = True
+    try:
+        return await asyncio.to_thread(run_sync)
+    finally:
+        async with state.sync_lock:
+            state.sync_active = False
+            state.sync_lock.notify_all()
+
+
+async def initial_sync():
+    """Run the startup sync, reporting a failure rather than leaving it in the task."""
+    try:
+        await run_sync_exclusive()
+    except Exception as e:
+        print(f"Initial sync failed: {e}")
+
+
+# Seconds between background syncs
+SYNC_INTERVAL = 15 * 60
+
+
+async def periodic_sync():
+    """Sync every SYNC_INTERVAL seconds, skipping ticks during another sync."""
+    while True:
+        await asyncio.sleep(SYNC_INTERVAL)
+        if app.state.sync_active:
+            continue
+        try:
+            await run_sync_exclusive()
+        except Exception as e:
+            print(f"Periodic sync failed: {e}")
+
+
+# uvicorn binds its socket right after lifespan startup; wait this long
+# before opening the browser so the first request doesn't race the bind
+BROWSER_OPEN_DELAY = 0.1
+
+
+async def open_browser(url: str):
+    """Open `url` in the browser shortly after startup."""
+    await asyncio.sleep(BROWSER_OPEN_DELAY)
+    await asyncio.to_thread(webbrowser.open, url)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
-    global scheduler, last_sync_time
-
     # Ensure database is initialized
     db.init_db()
+    load_index_page()
+
+    app.state.sync_lock = asyncio.Condition()
+    app.state.sync_active = False
 
-    # Initial sync
-    print("Running initial sync...")
-    run_sync()
+    # Initial sync runs in the background so the server (and /api/status,
+    # which reports sync progress) is reachable while it indexes
+    app.state.initial_sync = asyncio.create_task(initial_sync())
 
-    # Start scheduler for periodic sync
-    scheduler = AsyncIOScheduler()
-    scheduler.add_job(run_sync, "interval", minutes=15)
-    scheduler.start()
-    print("Scheduler started (sync every 15 minutes)")
+    app.state.periodic_sync = asyncio.create_task(periodic_sync())
+    print(f"Scheduler started (sync every {SYNC_INTERVAL // 60} minutes)")
+
+    browser_url = getattr(app.state, "browser_url", None)
+    if browser_url:
+        app.state.browser_task = asyncio.create_task(open_browser(browser_url))
 
     yield
 
-    # Shutdown
-    if scheduler:
-        scheduler.shutdown()
+    # Shutdown. The sync thread can't be interrupted, so give it a bounded
+    # wait rather than cancelling the task
+    await asyncio.wait({app.state.initial_sync}, timeout=SHUTDOWN_SYNC_TIMEOUT)
+    app.state.periodic_sync.cancel()
+    with suppress(asyncio.CancelledError):
+        await app.state.periodic_sync
+    await close_github_client()
+    db.close_connection()
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response serialized with orjson, used for every API route."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
 
 
 app = FastAPI(
     title="Claude Code Session Viewer",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
+# Compresses responses that aren't already encoded. Starlette 0.46+ leaves
+# text/event-stream alone, so SSE events aren't buffered (see pyproject.toml)
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+# Read-only queries run on a small pool of threads, each with its own
+# read-only SQLite connection (see db.get_read_db), so slow queries don't
+# block the event loop or SSE streams. WAL mode lets them run alongside a sync.
+DB_READ_WORKERS = min(8, os.cpu_count() or 1)
+_db_read_executor = ThreadPoolExecutor(DB_READ_WORKERS, thread_name_prefix="db-read")
+
+
+async def run_db_read(fn, *args, **kwargs):
+    """Run a db read helper on the read pool and return its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_read_executor, partial(fn, *args, **kwargs))
 
 
 # API Routes
@@ -223,20 +440,19 @@ app = FastAPI(
 @app.get("/api/status")
 async def get_status():
     """Get server status."""
-    stats = db.get_stats()
+    stats = await run_db_read(db.get_stats)
     return {
         "status": "ok",
         "last_sync": last_sync_time.isoformat() if last_sync_time else None,
         "stats": stats,
-        "sync": asdict(sync_status),
+        "sync": sync_status.to_dict(),
     }
 
 
 @app.post("/api/sync")
 async def trigger_sync():
     """Trigger a manual sync."""
-    result = run_sync()
-    return result
+    return await run_sync_exclusive()
 
 
 @app.get("/api/sessions")
@@ -247,7 +463,8 @@ async def list_sessions(
     offset: int = Query(default=0, ge=0),
 ):
     """List sessions with optional filters."""
-    sessions = db.get_sessions(
+    sessions = await run_db_read(
+        db.get_sessions_summary,
         project=project,
         machine=machine,
         limit=limit,
@@ -259,27 +476,71 @@ async def list_sessions(
 @app.get("/api/sessions/{session_id}")
 async def get_session(session_id: str):
     """Get session details with messages."""
-    session = db.get_session(session_id)
+    session = await run_db_read(db.get_session_detail, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    messages = db.get_session_messages(session_id)
+    messages = await run_db_read(db.get_session_messages, session_id)
     return {
         "session": session,
         "messages": messages,
     }
 
 
+@app.get("/api/sessions/{session_id}/messages")
+async def get_session_messages_page(
+    session_id: str,
+    after_id: Optional[int] = Query(default=None, ge=0),
+    limit: int = Query(default=500, ge=1, le=5000),
+):
+    """Get a page of session messages, continuing after message `after_id`."""
+    if not await run_db_read(db.session_exists, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    messages = await run_db_read(
+        db.get_session_messages_page, session_id, after_id=after_id, limit=limit
+    )
+    next_after_id = messages[-1]["id"] if len(messages) == limit else None
+    return {
+        "messages": messages,
+        "count": len(messages),
+        "next_after_id": next_after_id,
+    }
+
+
+def _accepts_encoding(accept_encoding: str, coding: str) -> bool:
+    """Check whether an Accept-Encoding header allows `coding`.
+
+    Honours q-values, so "deflate;q=0" refuses deflate, and falls back to a
+    "*" entry when the coding isn't listed by name.
+    """
+    wildcard = False
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if name != coding and name != "*":
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name == coding:
+            return q > 0
+        wildcard = q > 0
+    return wildcard
+
+
 @app.get("/api/sessions/{session_id}/export")
-async def export_session(session_id: str):
+async def export_session(session_id: str, request: Request):
     """Export session as a self-contained HTML file."""
-    session = db.get_session(session_id)
+    session = await run_db_read(db.get_session_detail, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    messages = db.get_session_messages(session_id)
-    html = generate_export_html(session, messages)
-
     # Create filename from project and date
     project = session.get("project", "session").replace("/", "-").replace("\\", "-")
     date_str = ""
@@ -290,16 +551,124 @@ async def export_session(session_id: str):
         except (ValueError, AttributeError):
             pass
     filename = sanitize_filename(f"{project}-{date_str or session_id[:8]}.html")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    # The export cache holds zlib data, which is exactly HTTP's deflate
+    # encoding, so a cache hit can be sent without recompressing
+    if _accepts_encoding(request.headers.get("accept-encoding", ""), "deflate"):
+        data = await run_db_read(
+            db.get_compressed_export,
+            session_id, session.get("message_count") or 0, EXPORT_FORMAT_VERSION
+        )
+        if data is not None:
+            headers["Content-Encoding"] = "deflate"
+            headers["Vary"] = "Accept-Encoding"
+            return Response(content=data, media_type="text/html", headers=headers)
 
-    return Response(
-        content=html,
+    return StreamingResponse(
+        stream_session_export(session),
         media_type="text/html",
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"',
-        },
+        headers=headers,
     )
 
 
+# Bump whenever generate_export_html's output changes so cached exports
+# rendered by an older version are not served
+EXPORT_FORMAT_VERSION = 2
+
+
+def render_session_export(session: dict) -> str:
+    """Render a session's HTML export, reusing the cached copy when current."""
+    session_id = session["id"]
+    message_count = session.get("message_count") or 0
+    html = db.get_cached_export(session_id, message_count, EXPORT_FORMAT_VERSION)
+    if html is None:
+        messages = db.get_session_messages(session_id)
+        html = generate_export_html(session, messages)
+        db.save_cached_export(session_id, message_count, EXPORT_FORMAT_VERSION, html)
+    return html
+
+
+# Streamed exports are sent in pieces of about this many characters. Each
+# item of a sync iterator costs a threadpool hop in StreamingResponse, so
+# sending per message would be mostly overhead.
+EXPORT_STREAM_CHUNK_SIZE = 1 << 16
+
+
+def _coalesce_chunks(chunks: Iterable[str], size: int) -> Iterator[str]:
+    """Buffer small string chunks and yield them in pieces of at least `size`."""
+    buf = io.StringIO()
+    pending = 0
+    for chunk in chunks:
+        buf.write(chunk)
+        pending += len(chunk)
+        if pending >= size:
+            yield buf.getvalue()
+            buf = io.StringIO()
+            pending = 0
+    if pending:
+        yield buf.getvalue()
+
+
+def stream_session_export(session: dict) -> Iterator[bytes]:
+    """Yield a session's HTML export, filling the export cache on a miss.
+
+    Messages are read a page at a time and the cached copy is compressed as
+    chunks go out, so memory is bounded by a page of messages rather than
+    the whole document.
+    """
+    session_id = session["id"]
+    message_count = session.get("message_count") or 0
+    html = db.get_cached_export(session_id, message_count, EXPORT_FORMAT_VERSION)
+    if html is not None:
+        yield html.encode("utf-8")
+        return
+
+    compressor = zlib.compressobj(db.EXPORT_COMPRESSION_LEVEL)
+    compressed = []
+    rendered = 0
+
+    def counted(messages: Iterable[dict]) -> Iterator[dict]:
+        nonlocal rendered
+        for message in messages:
+            rendered += 1
+            yield message
+
+    messages = counted(db.iter_session_messages(session_id))
+    html_chunks = iter_export_html(session, messages, message_count)
+    for chunk in _coalesce_chunks(html_chunks, EXPORT_STREAM_CHUNK_SIZE):
+        data = chunk.encode("utf-8")
+        compressed.append(compressor.compress(data))
+        yield data
+    # A re-import overlapping the stream can leave it out of step with the
+    # count it would be cached under; send it, but don't cache it
+    if rendered != message_count or db.get_message_count(session_id) != message_count:
+        return
+    compressed.append(compressor.flush())
+    db.save_compressed_export(session_id, message_count, EXPORT_FORMAT_VERSION, b"".join(compressed))
+
+
+# Export formatting patterns, compiled once rather than per message
+_RE_CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f]')
+_RE_THINKING_STRIP = re.compile(r"\[Thinking\]\n?[\s\S]*?(?=\n\[|\n\n\[|$)")
+# Fenced code blocks and inline code, sharing their leading backtick
+_CODE_PATTERN = r"`(?:``\w*\n(?P<code_body>[\s\S]*?)```|(?P<inline_body>[^`]+)`)"
+# Block bodies step over fenced code whole, so brackets and blank lines
+# inside code don't end the block
+_BLOCK_BODY = r"(?:[^`\n]+|```\w*\n[\s\S]*?```|[\s\S])*?"
+# Code spans, thinking blocks and tool blocks in one alternation, so content
+# is scanned once and markers inside an already-matched block are left alone.
+# Every branch starts with ` or [, which lets the engine skip plain text fast.
+_RE_FORMAT = re.compile(
+    _CODE_PATTERN
+    + r"|\[(?:Thinking\]\n?(?P<thinking_body>" + _BLOCK_BODY + r")(?=\n\[|\n\n\[|$)"
+    + r"|(?P<tool>Tool|Read|Write|Edit|Bash|Glob|Grep|Task|Question|Todo List|Entering Plan Mode|Exiting Plan Mode)"
+    + r"(?P<tool_args>[^\]]*)\](?P<tool_body>" + _BLOCK_BODY + r")(?=\n\[|\n\n|$))"
+)
+# Thinking and tool bodies only get code formatting
+_RE_CODE = re.compile(_CODE_PATTERN)
+
+
 def escape_html(text: str) -> str:
     """Escape HTML special characters.
 
@@ -324,9 +693,8 @@ def sanitize_filename(filename: str) -> str:
 
     Removes control characters, quotes, and other problematic chars.
     """
-    import re
     # Remove control characters (0x00-0x1F, 0x7F)
-    filename = re.sub(r'[\x00-\x1f\x7f]', '', filename)
+    filename = _RE_CONTROL_CHARS.sub('', filename)
     # Remove/replace problematic characters for Content-Disposition
     filename = filename.replace('"', "'").replace('\\', '_')
     # Remove any remaining newlines/carriage returns (safety)
@@ -348,42 +716,39 @@ def sanitize_agent_class(agent: str) -> str:
 
 def is_thinking_only(content: str) -> bool:
     """Check if message contains only thinking blocks."""
-    if not content:
+    # Text before the first thinking block always survives the strip below,
+    # so most messages are settled by this prefix check without the regex
+    if not content or not content.lstrip().startswith("[Thinking]"):
         return False
-    import re
     # Remove thinking blocks and check if anything meaningful remains
-    without_thinking = re.sub(r"\[Thinking\]\n?[\s\S]*?(?=\n\[|\n\n\[|$)", "", content).strip()
+    without_thinking = _RE_THINKING_STRIP.sub("", content).strip()
     return without_thinking == ""
 
 
 def format_content_for_export(text: str) -> str:
     """Format message content with markdown-ish formatting."""
-    import re
     if not text:
         return ""
 
-    html = escape_html(text)
-    # Code blocks
-    html = re.sub(r"```(\w*)\n([\s\S]*?)```", r"<pre><code>\2</code></pre>", html)
-    # Inline code
-    html = re.sub(r"`([^`]+)`", r"<code>\1</code>", html)
-    # Thinking blocks
-    html = re.sub(
-        r"\[Thinking\]\n?([\s\S]*?)(?=\n\[|\n\n\[|$)",
-        r'<div class="thinking-block"><div class="thinking-label">Thinking</div>\1</div>',
-        html,
-    )
-    # Tool blocks
-    html = re.sub(
-        r"\[(Tool|Read|Write|Edit|Bash|Glob|Grep|Task|Question|Todo List|Entering Plan Mode|Exiting Plan Mode)([^\]]*)\]([\s\S]*?)(?=\n\[|\n\n|<div|$)",
-        r'<div class="tool-block">[\1\2]\3</div>',
-        html,
-    )
-    return html
+    return _RE_FORMAT.sub(_format_match, escape_html(text))
+
 
+def _format_match(m: re.Match) -> str:
+    """Render one code span, thinking block or tool block for export."""
+    if m.group("code_body") is not None:
+        return f"<pre><code>{m.group('code_body')}</code></pre>"
+    if m.group("inline_body") is not None:
+        return f"<code>{m.group('inline_body')}</code>"
+    if m.group("thinking_body") is not None:
+        body = _RE_CODE.sub(_format_match, m.group("thinking_body"))
+        return f'<div class="thinking-block"><div class="thinking-label">Thinking</div>{body}</div>'
+    body = _RE_CODE.sub(_format_match, m.group("tool_body"))
+    return f'<div class="tool-block">[{m.group("tool")}{m.group("tool_args")}]{body}</div>'
 
+
+@lru_cache(maxsize=4096)
 def format_timestamp(ts: str) -> str:
-    """Format timestamp for display."""
+    """Format timestamp for display (memoized; exports repeat many values)."""
     if not ts:
         return ""
     try:
@@ -393,52 +758,28 @@ def format_timestamp(ts: str) -> str:
         return ts
 
 
-def generate_export_html(session: dict, messages: list) -> str:
-    """Generate a self-contained HTML export of a session."""
-
-    # Generate messages HTML (in chronological order - CSS handles sort toggle)
-    messages_html_parts = []
-    for i, m in enumerate(messages):
-        role_raw = m.get("role", "unknown")
-        role_class = sanitize_role_class(role_raw)
-        content = m.get("content", "")
-        timestamp = m.get("timestamp", "")
-        thinking_only_class = " thinking-only" if role_class == "assistant" and is_thinking_only(content) else ""
+def _export_message_html(m: dict, i: int) -> str:
+    """Render one message block of an HTML export."""
+    role_raw = m.get("role", "unknown")
+    role_class = sanitize_role_class(role_raw)
+    content = m.get("content", "")
+    timestamp = m.get("timestamp", "")
+    thinking_only_class = " thinking-only" if role_class == "assistant" and is_thinking_only(content) else ""
 
-        messages_html_parts.append(f'''
+    return f'''
             <div class="message {role_class}{thinking_only_class}" data-index="{i}">
                 <div class="message-header">
                     <span class="message-role">{escape_html(role_raw)}</span>
                     <span class="message-time">{format_timestamp(timestamp)}</span>
                 </div>
                 <div class="message-content">{format_content_for_export(content)}</div>
-            </div>''')
+            </div>'''
 
-    messages_html = "\n".join(messages_html_parts)
-
-    # Session metadata
-    project = escape_html(session.get("project", "Unknown"))
-    agent_raw = session.get("agent", "claude")
-    agent_class = sanitize_agent_class(agent_raw)
-    # Preserve original agent name for display, with friendly names for known agents
-    if agent_raw == "claude":
-        agent_display = "Claude"
-    elif agent_raw == "codex":
-        agent_display = "Codex"
-    else:
-        agent_display = escape_html(agent_raw) if agent_raw else "Claude"
-    message_count = session.get("message_count", len(messages))
-    started_at = format_timestamp(session.get("started_at", ""))
-    first_message = escape_html(session.get("first_message", "")[:100])
 
-    html = f'''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{project} - Agent Session</title>
-    <style>
-        :root {{
+# Stylesheet for HTML exports; a plain constant so it is built once rather
+# than re-formatted inside the header f-string on every export
+_EXPORT_CSS = """\
+        :root {
             --bg: #0d1117;
             --surface: #161b22;
             --surface-hover: #21262d;
@@ -454,28 +795,28 @@ def generate_export_html(session: dict, messages: list) -> str:
             --tool-bg: #1a2332;
             --thinking-bg: #1f1a24;
             --agent-accent: #9d7cd8;
-        }}
+        }
 
-        * {{ box-sizing: border-box; margin: 0; padding: 0; }}
+        * { box-sizing: border-box; margin: 0; padding: 0; }
 
-        body {{
+        body {
             font-family: 'SF Mono', Monaco, 'Cascadia Code', 'Consolas', monospace;
             background: var(--bg);
             color: var(--text);
             line-height: 1.5;
-        }}
+        }
 
         /* Header */
-        header {{
+        header {
             background: var(--surface);
             border-bottom: 1px solid var(--border);
             padding: 16px 24px;
             position: sticky;
             top: 0;
             z-index: 100;
-        }}
+        }
 
-        .header-content {{
+        .header-content {
             max-width: 900px;
             margin: 0 auto;
             display: flex;
@@ -483,50 +824,50 @@ def generate_export_html(session: dict, messages: list) -> str:
             justify-content: space-between;
             flex-wrap: wrap;
             gap: 12px;
-        }}
+        }
 
-        .header-left {{
+        .header-left {
             display: flex;
             flex-direction: column;
             gap: 4px;
-        }}
+        }
 
-        h1 {{
+        h1 {
             font-size: 1.1rem;
             font-weight: 600;
             color: var(--text);
-        }}
+        }
 
-        .session-meta {{
+        .session-meta {
             font-size: 0.8rem;
             color: var(--text-muted);
             display: flex;
             gap: 12px;
             flex-wrap: wrap;
-        }}
+        }
 
-        .session-meta .agent-name {{
+        .session-meta .agent-name {
             color: #d4a574;
-        }}
+        }
 
-        .session-meta .agent-name.codex {{
+        .session-meta .agent-name.codex {
             color: #7dd3fc;
-        }}
+        }
 
-        .controls {{
+        .controls {
             display: flex;
             gap: 12px;
             align-items: center;
-        }}
+        }
 
         /* CSS-only toggle buttons using checkbox hack */
-        .toggle-input {{
+        .toggle-input {
             position: absolute;
             opacity: 0;
             pointer-events: none;
-        }}
+        }
 
-        .toggle-label {{
+        .toggle-label {
             display: inline-flex;
             align-items: center;
             gap: 6px;
@@ -539,106 +880,106 @@ def generate_export_html(session: dict, messages: list) -> str:
             font-size: 0.85rem;
             user-select: none;
             transition: background 0.15s, border-color 0.15s;
-        }}
+        }
 
-        .toggle-label:hover {{
+        .toggle-label:hover {
             background: var(--border);
-        }}
+        }
 
-        .toggle-input:checked + .toggle-label {{
+        .toggle-input:checked + .toggle-label {
             background: var(--accent-muted);
             border-color: var(--accent);
-        }}
+        }
 
-        .toggle-indicator {{
+        .toggle-indicator {
             display: inline-block;
             width: 8px;
             height: 8px;
             border-radius: 50%;
             background: var(--text-muted);
             transition: background 0.15s;
-        }}
+        }
 
-        .toggle-input:checked + .toggle-label .toggle-indicator {{
+        .toggle-input:checked + .toggle-label .toggle-indicator {
             background: var(--text);
-        }}
+        }
 
         /* Main content */
-        main {{
+        main {
             max-width: 900px;
             margin: 0 auto;
             padding: 24px;
-        }}
+        }
 
-        .messages {{
+        .messages {
             display: flex;
             flex-direction: column;
             gap: 16px;
-        }}
+        }
 
-        .message {{
+        .message {
             padding: 16px;
             border-radius: 8px;
             border: 1px solid var(--border);
-        }}
+        }
 
-        .message.user {{
+        .message.user {
             background: var(--user-bg);
             border-left: 3px solid var(--accent);
-        }}
+        }
 
-        .message.assistant {{
+        .message.assistant {
             background: var(--assistant-bg);
             border-left: 3px solid var(--agent-accent);
-        }}
+        }
 
-        .message-header {{
+        .message-header {
             display: flex;
             justify-content: space-between;
             margin-bottom: 8px;
             font-size: 0.8rem;
-        }}
+        }
 
-        .message-role {{
+        .message-role {
             font-weight: 600;
             text-transform: uppercase;
             letter-spacing: 0.5px;
-        }}
+        }
 
-        .message.user .message-role {{ color: var(--accent); }}
-        .message.assistant .message-role {{ color: var(--agent-accent); }}
+        .message.user .message-role { color: var(--accent); }
+        .message.assistant .message-role { color: var(--agent-accent); }
 
-        .message-time {{ color: var(--text-muted); }}
+        .message-time { color: var(--text-muted); }
 
-        .message-content {{
+        .message-content {
             white-space: pre-wrap;
             word-break: break-word;
             font-size: 0.9rem;
-        }}
+        }
 
-        .message-content code {{
+        .message-content code {
             background: var(--bg);
             padding: 2px 6px;
             border-radius: 4px;
             font-family: inherit;
             font-size: 0.85em;
-        }}
+        }
 
-        .message-content pre {{
+        .message-content pre {
             background: var(--bg);
             padding: 12px;
             border-radius: 6px;
             overflow-x: auto;
             margin: 12px 0;
-        }}
+        }
 
-        .message-content pre code {{
+        .message-content pre code {
             background: none;
             padding: 0;
-        }}
+        }
 
         /* Thinking blocks - hidden by default */
-        .thinking-block {{
+        .thinking-block {
             background: var(--thinking-bg);
             border-left: 2px solid #8b5cf6;
             padding: 12px;
@@ -647,9 +988,9 @@ def generate_export_html(session: dict, messages: list) -> str:
             font-style: italic;
             color: var(--text-muted);
             display: none;
-        }}
+        }
 
-        .thinking-label {{
+        .thinking-label {
             font-size: 0.75rem;
             font-weight: 600;
             color: #8b5cf6;
@@ -657,38 +998,38 @@ def generate_export_html(session: dict, messages: list) -> str:
             letter-spacing: 0.5px;
             margin-bottom: 4px;
             font-style: normal;
-        }}
+        }
 
         /* Messages that only contain thinking content */
-        .message.thinking-only {{
+        .message.thinking-only {
             display: none;
-        }}
+        }
 
         /* When thinking toggle is checked, show thinking blocks */
-        #thinking-toggle:checked ~ main .thinking-block {{
+        #thinking-toggle:checked ~ main .thinking-block {
             display: block;
-        }}
+        }
 
-        #thinking-toggle:checked ~ main .message.thinking-only {{
+        #thinking-toggle:checked ~ main .message.thinking-only {
             display: block;
-        }}
+        }
 
-        .tool-block {{
+        .tool-block {
             background: var(--tool-bg);
             border-left: 2px solid var(--warning);
             padding: 8px 12px;
             margin: 8px 0;
             border-radius: 4px;
             font-size: 0.85rem;
-        }}
+        }
 
         /* Sort order toggle - reverse message order when checked */
-        #sort-toggle:checked ~ main .messages {{
+        #sort-toggle:checked ~ main .messages {
             flex-direction: column-reverse;
-        }}
+        }
 
         /* Footer */
-        footer {{
+        footer {
             max-width: 900px;
             margin: 40px auto;
             padding: 16px 24px;
@@ -696,30 +1037,56 @@ def generate_export_html(session: dict, messages: list) -> str:
             font-size: 0.8rem;
             color: var(--text-muted);
             text-align: center;
-        }}
+        }
 
-        footer a {{
+        footer a {
             color: var(--accent);
             text-decoration: none;
-        }}
+        }
 
-        footer a:hover {{
+        footer a:hover {
             text-decoration: underline;
-        }}
+        }
 
         /* Responsive */
-        @media (max-width: 600px) {{
-            header {{
+        @media (max-width: 600px) {
+            header {
                 padding: 12px 16px;
-            }}
-            main {{
+            }
+            main {
                 padding: 16px;
-            }}
-            .header-content {{
+            }
+            .header-content {
                 flex-direction: column;
                 align-items: flex-start;
-            }}
-        }}
+            }
+        }"""
+
+
+def _export_header_html(session: dict, message_count: int) -> str:
+    """Render an HTML export up to the opening of the messages container."""
+    # Session metadata
+    project = escape_html(session.get("project", "Unknown"))
+    agent_raw = session.get("agent", "claude")
+    agent_class = sanitize_agent_class(agent_raw)
+    # Preserve original agent name for display, with friendly names for known agents
+    if agent_raw == "claude":
+        agent_display = "Claude"
+    elif agent_raw == "codex":
+        agent_display = "Codex"
+    else:
+        agent_display = escape_html(agent_raw) if agent_raw else "Claude"
+    started_at = format_timestamp(session.get("started_at", ""))
+    first_message = escape_html(session.get("first_message", "")[:100])
+
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{project} - Agent Session</title>
+    <style>
+{_EXPORT_CSS}
     </style>
 </head>
 <body>
@@ -752,7 +1119,12 @@ def generate_export_html(session: dict, messages: list) -> str:
 
     <main>
         <div class="messages">
-{messages_html}
+'''
+
+
+def _export_footer_html() -> str:
+    """Render the remainder of an HTML export after the last message."""
+    return '''
         </div>
     </main>
 
@@ -762,24 +1134,63 @@ def generate_export_html(session: dict, messages: list) -> str:
 </body>
 </html>'''
 
-    return html
+
+def iter_export_html(session: dict, messages: Iterable[dict], message_count: int) -> Iterator[str]:
+    """Yield a self-contained HTML export of a session in chunks.
+
+    Messages are rendered one at a time (in chronological order - CSS
+    handles the sort toggle), so `messages` may be a lazy iterator.
+    """
+    yield _export_header_html(session, message_count)
+    for i, m in enumerate(messages):
+        if i:
+            yield "\n"
+        yield _export_message_html(m, i)
+    yield _export_footer_html()
+
+
+def generate_export_html(session: dict, messages: list) -> str:
+    """Generate a self-contained HTML export of a session."""
+    message_count = session.get("message_count", len(messages))
+    return "".join(iter_export_html(session, messages, message_count))
+
+
+# Anything that can't be part of a word: FTS5 operators, quotes and
+# punctuation. unicode61 treats these as separators anyway.
+_FTS_SPLIT = re.compile(r"[^\w\u00a0-\uffff]+")
+
+
+def build_fts_query(q: str) -> Optional[str]:
+    """Turn a search box query into an FTS5 MATCH expression.
+
+    The words are matched as a phrase, with the last one as a prefix so
+    partially typed words match. Punctuation and FTS5 syntax in `q` are
+    treated as separators, so no input can make MATCH raise an error.
+    Returns None if `q` has no words.
+    """
+    words = [word for word in _FTS_SPLIT.split(q) if word]
+    if not words:
+        return None
+    return f'"{" ".join(words)}"*'
 
 
 @app.get("/api/search")
 async def search(
     q: str = Query(..., min_length=1),
     limit: int = Query(default=100, le=500),
+    offset: int = Query(default=0, ge=0),
     project: str | None = Query(default=None),
 ):
     """Full-text search across messages, optionally filtered by project."""
-    # Prepare query for FTS5 (wrap in quotes for phrase, add * for prefix)
-    fts_query = q.strip()
-    if " " in fts_query and not fts_query.startswith('"'):
-        # Multi-word: search as phrase
-        fts_query = f'"{fts_query}"'
-
-    results = db.search_messages(fts_query, limit=limit, project=project)
-    return {"query": q, "results": results, "count": len(results)}
+    fts_query = build_fts_query(q)
+    if fts_query is None:
+        # Only punctuation: nothing could match
+        results = []
+    else:
+        results = await run_db_read(
+            db.search_messages, fts_query, limit=limit, project=project, offset=offset
+        )
+    return {"query": q, "results": results, "count": len(results), "offset": offset}
 
 
 @app.get("/api/config/github")
@@ -797,25 +1208,8 @@ async def set_github_config(request: TokenRequest):
         raise HTTPException(status_code=400, detail="Token cannot be empty")
 
     # Validate token by making a test request
-    test_url = "https://api.github.com/user"
-    req = urllib.request.Request(
-        test_url,
-        headers={
-            "Authorization": f"token {token}",
-            "Accept": "application/vnd.github.v3+json",
-            "User-Agent": "agent-session-viewer",
-        },
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=10) as response:
-            user_data = json.loads(response.read().decode("utf-8"))
-            username = user_data.get("login", "unknown")
-    except urllib.error.HTTPError as e:
-        if e.code == 401:
-            raise HTTPException(status_code=401, detail="Invalid GitHub token")
-        raise HTTPException(status_code=e.code, detail=f"GitHub API error: {e.reason}")
-    except urllib.error.URLError as e:
-        raise HTTPException(status_code=502, detail=f"Failed to connect to GitHub: {e.reason}")
+    user_data = await get_github_user(token)
+    username = user_data.get("login", "unknown")
 
     set_github_token(token)
     return {"success": True, "username": username}
@@ -828,12 +1222,12 @@ async def publish_session(session_id: str):
     if not token:
         raise HTTPException(status_code=401, detail="GitHub token not configured")
 
-    session = db.get_session(session_id)
+    session = await run_db_read(db.get_session_detail, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    messages = db.get_session_messages(session_id)
-    html = generate_export_html(session, messages)
+    # Rendering is CPU-bound, so it runs in a worker thread
+    html = await asyncio.to_thread(render_session_export, session)
 
     # Create filename and description
     project = session.get("project", "session").replace("/", "-").replace("\\", "-")
@@ -850,7 +1244,7 @@ async def publish_session(session_id: str):
     description = f"Agent session: {project} - {first_msg}"
 
     # Create the gist
-    gist_response = create_github_gist(html, filename, description, token)
+    gist_response = await create_github_gist(html, filename, description, token)
 
     gist_id = gist_response.get("id")
     gist_url = gist_response.get("html_url")
@@ -873,17 +1267,64 @@ async def publish_session(session_id: str):
 @app.get("/api/projects")
 async def list_projects():
     """List all projects."""
-    projects = db.get_projects()
+    projects = await run_db_read(db.get_projects)
     return {"projects": projects}
 
 
 @app.get("/api/machines")
 async def list_machines():
     """List all machines."""
-    machines = db.get_machines()
+    machines = await run_db_read(db.get_machines)
     return {"machines": machines}
 
 
+UPLOAD_CHUNK_SIZE = 1 << 16  # 64KB
+
+
+def save_upload(src, target_path: Path):
+    """Copy an uploaded file to target_path in UPLOAD_CHUNK_SIZE chunks.
+
+    Writes to a sibling temp file and renames it into place, so a sync
+    running at the same time never sees a half-written session.
+    """
+    src.seek(0)
+    part_path = target_path.with_name(target_path.name + ".part")
+    try:
+        with open(part_path, "wb") as out:
+            shutil.copyfileobj(src, out, UPLOAD_CHUNK_SIZE)
+        part_path.replace(target_path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+
+def index_upload(target_path: Path, session_id: str, project: str, machine: str) -> int:
+    """Parse a saved upload and store it; returns the message count."""
+    from .parser import ParseState, iter_session_file
+
+    # Messages stream from the parser into chunked inserts; the session row
+    # is written last, once the parse has produced its metadata
+    state = ParseState()
+    with db.transaction():
+        db.replace_session_messages(session_id, (
+            (session_id, m.msg_id, m.role, m.content, m.timestamp)
+            for m in iter_session_file(target_path, state)
+        ))
+
+        metadata = state.metadata(target_path.stem, project, machine)
+        db.upsert_session(
+            session_id=metadata.session_id,
+            project=metadata.project,
+            machine=metadata.machine,
+            first_message=metadata.first_message,
+            started_at=metadata.started_at,
+            ended_at=metadata.ended_at,
+            message_count=metadata.message_count,
+        )
+
+    return metadata.message_count
+
+
 @app.post("/api/sessions/upload")
 async def upload_session(
     file: UploadFile = File(...),
@@ -900,149 +1341,357 @@ async def upload_session(
     target_dir.mkdir(parents=True, exist_ok=True)
     target_path = target_dir / file.filename
 
-    content = await file.read()
-    target_path.write_bytes(content)
-
-    # Index it
-    from .parser import parse_session
-    metadata, messages = parse_session(target_path, project, machine)
-
-    db.upsert_session(
-        session_id=metadata.session_id,
-        project=metadata.project,
-        machine=metadata.machine,
-        first_message=metadata.first_message,
-        started_at=metadata.started_at,
-        ended_at=metadata.ended_at,
-        message_count=metadata.message_count,
-    )
+    # Starlette spools the upload to a temp file; copy it in chunks off the
+    # event loop rather than reading it all into memory
+    await asyncio.to_thread(save_upload, file.file, target_path)
 
-    db.delete_session_messages(session_id)
-    if messages:
-        batch = [
-            (session_id, m.msg_id, m.role, m.content, m.timestamp)
-            for m in messages
-        ]
-        db.insert_messages_batch(batch)
+    # Index it; parsing a large session would otherwise stall SSE clients
+    message_count = await asyncio.to_thread(
+        index_upload, target_path, session_id, project, machine
+    )
 
     return {
         "session_id": session_id,
         "project": project,
         "machine": machine,
-        "messages": len(messages),
+        "messages": message_count,
     }
 
 
 # SSE for real-time session updates
-@app.get("/api/events")
-async def event_stream(session_id: Optional[str] = None):
-    """Server-sent events for real-time session updates.
-
-    If session_id is provided, watches the source file for changes
-    and pushes updates when the file is modified.
+SSE_POLL_INTERVAL = 1.5  # seconds between stat() checks without watchfiles
+SSE_RESOLVE_INTERVAL = 5.0  # seconds between lookups for a missing session file
+SSE_HEARTBEAT_INTERVAL = 15.0
+# Sent after SSE_HEARTBEAT_INTERVAL without events. An SSE comment keeps
+# proxies from closing an idle stream and is ignored by EventSource.
+SSE_KEEPALIVE = ": keepalive\n\n"
+# Agents append to session files in bursts; sync once writes have been
+# quiet this long, but at least every SSE_MAX_BATCH_MS during a long burst
+SSE_QUIET_MS = 300
+SSE_MAX_BATCH_MS = 1600
+
+
+async def watch_file_changes(path: Path):
+    """Yield whenever `path` may have changed.
+
+    Uses OS file notifications (inotify, FSEvents, ...) through watchfiles,
+    so an idle stream does not wake up, and a burst of writes produces a
+    single wake-up once it settles. It still yields at least every
+    SSE_HEARTBEAT_INTERVAL seconds so callers can send heartbeats. Without
+    watchfiles this falls back to polling every SSE_POLL_INTERVAL seconds.
+    """
+    if awatch is None:
+        while True:
+            await asyncio.sleep(SSE_POLL_INTERVAL)
+            yield
+    # Watch the directory rather than the file so writes made by replacing
+    # the file are still seen
+    async for _ in awatch(
+        path.parent,
+        watch_filter=lambda _change, changed: Path(changed).name == path.name,
+        step=SSE_QUIET_MS,
+        debounce=SSE_MAX_BATCH_MS,
+        rust_timeout=int(SSE_HEARTBEAT_INTERVAL * 1000),
+        yield_on_timeout=True,
+    ):
+        yield
+
+
+# Per-subscriber queue bound: room for one pending update plus the end of
+# stream. Updates are coalesced (see SessionChannel.publish), and a full
+# queue drops its oldest message rather than holding up other clients.
+SSE_QUEUE_SIZE = 2
+
+
+class SessionChannel:
+    """One file watcher and sync loop per session, shared by all its SSE clients.
+
+    Every tab open on a session subscribes a queue here, so the session's
+    file is watched, stat'ed and re-synced once no matter how many clients
+    are listening. The loop starts with the first subscriber and is
+    cancelled when the last one leaves.
     """
-    async def generate():
-        last_mtime = None
-        source_path = None
 
-        # Find source file if session_id provided
-        if session_id:
-            source_path = sync_module.find_source_file(session_id)
-            if source_path:
-                try:
-                    last_mtime = source_path.stat().st_mtime
-                except (FileNotFoundError, PermissionError):
-                    source_path = None
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.is_codex = session_id.startswith("codex:")
+        self.subscribers: set[asyncio.Queue] = set()
+        self.task: Optional[asyncio.Task] = None
+        # Where incremental syncing of a Claude session file left off
+        self.tail: Optional[sync_module.SessionTail] = None
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a new subscriber queue, starting the watch loop if needed."""
+        queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Remove a subscriber; the last one out stops the loop."""
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            if self.task is not None:
+                self.task.cancel()
+                self.task = None
+            if _session_channels.get(self.session_id) is self:
+                del _session_channels[self.session_id]
+
+    def publish(self, message: Optional[str]):
+        """Queue a message for every subscriber (None ends their streams).
+
+        Updates only name the session, so a subscriber that still has one
+        pending gets nothing more; the client refetches everything new when
+        it reads it. A stalled tab thus holds at most one update.
+        """
+        for queue in self.subscribers:
+            if message is not None and not queue.empty():
+                continue
+            if queue.full():
+                queue.get_nowait()  # Drop the oldest
+            queue.put_nowait(message)
+
+    async def _sync(self, source_path: Path):
+        """Re-sync the session file (in a thread to avoid blocking)."""
+        if self.is_codex:
+            return await asyncio.to_thread(
+                sync_module.sync_codex_session,
+                source_path, machine="local", force=True
+            )
+        else:
+            # Only lines appended since the last sync are read and parsed
+            project_name = sync_module.get_project_name(source_path.parent)
+            result, self.tail = await asyncio.to_thread(
+                sync_module.sync_session_tail,
+                source_path, project_name, machine="local", tail=self.tail
+            )
+            return result
+
+    async def _sync_and_notify(self, source_path: Path):
+        result = await self._sync(source_path)
+        if result and not result.get("skipped"):
+            self.publish(f"event: session_updated\ndata: {self.session_id}\n\n")
+
+    async def _run(self):
+        try:
+            await self._watch()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Watcher for session {self.session_id} failed: {e}")
+            # End the streams so clients reconnect (and restart the loop)
+            self.publish(None)
+            self.task = None
+
+    async def _watch(self):
+        last_mtime = None
+        source_path = sync_module.resolve_source_file(self.session_id)
+        if source_path:
+            try:
+                last_mtime = source_path.stat().st_mtime
+            except (FileNotFoundError, PermissionError):
+                source_path = None
 
-        heartbeat_counter = 0
         while True:
-            # Check for file changes every 1.5 seconds
-            await asyncio.sleep(1.5)
-            heartbeat_counter += 1
-
-            # Helper to sync based on session type
-            is_codex = session_id and session_id.startswith("codex:")
-
-            async def do_sync():
-                if is_codex:
-                    return await asyncio.to_thread(
-                        sync_module.sync_codex_session,
-                        source_path, machine="local", force=True
-                    )
-                else:
-                    project_name = sync_module.get_project_name(source_path.parent)
-                    return await asyncio.to_thread(
-                        sync_module.sync_session_file,
-                        source_path, project_name, machine="local", force=True
-                    )
-
             if source_path:
-                try:
-                    current_mtime = source_path.stat().st_mtime
-                    if last_mtime and current_mtime > last_mtime:
-                        # File changed - sync and notify (run in thread to avoid blocking)
-                        last_mtime = current_mtime
-                        result = await do_sync()
-                        if result and not result.get("skipped"):
-                            yield f"event: session_updated\ndata: {session_id}\n\n"
-                    elif last_mtime is None:
-                        last_mtime = current_mtime
-                except (FileNotFoundError, PermissionError):
-                    # File was deleted or became inaccessible, reset and try to re-resolve
-                    source_path = None
-                    last_mtime = None
-            elif session_id:
-                # Try to re-resolve source file (handles transient errors or file recreation)
-                source_path = sync_module.find_source_file(session_id)
+                # Sleep until the file changes (or the watch times out when idle)
+                async with aclosing(watch_file_changes(source_path)) as changes:
+                    async for _ in changes:
+                        try:
+                            current_mtime = source_path.stat().st_mtime
+                        except (FileNotFoundError, PermissionError):
+                            # File was deleted or became inaccessible, reset and try to re-resolve
+                            sync_module.forget_source_file(self.session_id)
+                            source_path = None
+                            last_mtime = None
+                            break
+                        if current_mtime > last_mtime:
+                            last_mtime = current_mtime
+                            await self._sync_and_notify(source_path)
+            else:
+                await asyncio.sleep(SSE_RESOLVE_INTERVAL)
+                # Try to re-resolve source file (handles transient errors or file recreation);
+                # repeated misses are cached with backoff rather than re-searched each time
+                source_path = sync_module.resolve_source_file(self.session_id)
                 if source_path:
                     try:
                         last_mtime = source_path.stat().st_mtime
                         # Sync on re-resolve since file may have changed while missing
-                        result = await do_sync()
-                        if result and not result.get("skipped"):
-                            yield f"event: session_updated\ndata: {session_id}\n\n"
+                        await self._sync_and_notify(source_path)
                     except (FileNotFoundError, PermissionError):
                         source_path = None
 
-            # Send heartbeat every 20 iterations (~30 seconds)
-            if heartbeat_counter >= 20:
-                heartbeat_counter = 0
-                yield f"event: heartbeat\ndata: {datetime.now().isoformat()}\n\n"
+
+# Active channels by session id
+_session_channels: dict[str, SessionChannel] = {}
+
+
+def get_session_channel(session_id: str) -> SessionChannel:
+    """Get the shared channel for a session, creating it on first use."""
+    channel = _session_channels.get(session_id)
+    if channel is None:
+        channel = _session_channels[session_id] = SessionChannel(session_id)
+    return channel
+
+
+@app.get("/api/events")
+async def event_stream(session_id: Optional[str] = None):
+    """Server-sent events for real-time session updates.
+
+    If session_id is provided, watches the source file for changes
+    and pushes updates when the file is modified.
+    """
+    async def generate():
+        channel = get_session_channel(session_id) if session_id else None
+        queue = channel.subscribe() if channel else asyncio.Queue()
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield SSE_KEEPALIVE
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            if channel:
+                channel.unsubscribe(queue)
 
     return StreamingResponse(
         generate(),
         media_type="text/event-stream",
+        # Connection is hop-by-hop (and invalid over HTTP/2); keep-alive is
+        # already HTTP/1.1's default. X-Accel-Buffering stops nginx from
+        # holding events back when the viewer sits behind a reverse proxy.
         headers={
             "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
         },
     )
 
 
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles with browser caching headers.
+
+    Bundled fonts only change with a package upgrade, so browsers may keep
+    them for a year without revalidating. Anything else is revalidated
+    (cheaply, via the ETag StaticFiles already sends).
+    """
+
+    IMMUTABLE_DIRS = ("fonts",)
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            top_dir = PurePath(path).parts[0] if path else ""
+            if top_dir in self.IMMUTABLE_DIRS:
+                response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+            else:
+                response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
 # Serve static files and SPA
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+app.mount("/static", CachedStaticFiles(directory=STATIC_DIR), name="static")
+
+
+_index_page_cache: Optional[tuple[Path, bytes, str]] = None
+
+
+def load_index_page() -> Optional[tuple[bytes, str]]:
+    """Return index.html's bytes and ETag, reading the file only once.
+
+    The page ships with the package, so it only changes with an upgrade
+    (and a restart). Returns None if the static files are missing.
+    """
+    global _index_page_cache
+    index_path = STATIC_DIR / "index.html"
+    if _index_page_cache is None or _index_page_cache[0] != index_path:
+        try:
+            content = index_path.read_bytes()
+        except FileNotFoundError:
+            return None
+        etag = f'"{hashlib.blake2b(content, digest_size=8).hexdigest()}"'
+        _index_page_cache = (index_path, content, etag)
+    return _index_page_cache[1:]
 
 
 @app.get("/", response_class=HTMLResponse)
-async def index():
+async def index(request: Request):
     """Serve the SPA."""
-    index_path = STATIC_DIR / "index.html"
-    if index_path.exists():
-        return index_path.read_text(encoding="utf-8")
-    return "<h1>Claude Code Session Viewer</h1><p>Static files not found.</p>"
+    page = load_index_page()
+    if page is None:
+        return "<h1>Claude Code Session Viewer</h1><p>Static files not found.</p>"
+    content, etag = page
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content, headers=headers)
+
+
+DEFAULT_PORT = 8080
+# Ports tried upward from an explicit --port before giving up
+PORT_SCAN_LIMIT = 64
 
 
-def find_available_port(start_port: int = 8080) -> int:
-    """Find an available port starting from start_port."""
+def _port_is_free(port: int) -> bool:
+    """Return whether `port` can be bound right now.
+
+    The probe socket is closed before uvicorn binds, so another process can
+    still claim the port in between; the window is a few milliseconds.
+    """
     import socket
-    port = start_port
-    while True:
-        try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(("", port))
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(("", port))
+            return True
+    except OSError:
+        return False
+
+
+def find_available_port(start_port: int = DEFAULT_PORT, scan: bool = False) -> int:
+    """Find an available port, preferring start_port.
+
+    With scan, tries the next PORT_SCAN_LIMIT ports upward and raises
+    OSError if all are taken. Otherwise lets the kernel pick a free port.
+    """
+    import socket
+    if scan:
+        for port in range(start_port, start_port + PORT_SCAN_LIMIT):
+            if _port_is_free(port):
                 return port
-        except OSError:
-            port += 1
+        raise OSError(
+            f"No free port in {start_port}-{start_port + PORT_SCAN_LIMIT - 1}"
+        )
+    if _port_is_free(start_port):
+        return start_port
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
+
+
+def server_options() -> dict:
+    """Pick the event loop and HTTP parser for uvicorn.
+
+    uvicorn[standard] installs uvloop and httptools; both are much cheaper
+    per connection for long-lived SSE streams. uvloop is not available on
+    Windows, so fall back to the stock implementations when either is missing.
+    """
+    options = {"loop": "asyncio", "http": "h11"}
+    try:
+        import uvloop  # noqa: F401
+        options["loop"] = "uvloop"
+    except ImportError:
+        pass
+    try:
+        import httptools  # noqa: F401
+        options["http"] = "httptools"
+    except ImportError:
+        pass
+    return options
 
 
 def cli():
@@ -1059,8 +1708,9 @@ def cli():
     parser.add_argument(
         "--port", "-p",
         type=int,
-        default=8080,
-        help="Port to run server on (default: 8080, auto-finds available port)"
+        default=None,
+        help=f"Port to run server on (default: {DEFAULT_PORT}, or any free port "
+             "if taken; an explicit port falls back to the next free one)"
     )
     parser.add_argument(
         "--host",
@@ -1077,34 +1727,22 @@ def cli():
     import uvicorn
 
     # Find available port
-    port = find_available_port(args.port)
-    if port != args.port:
-        print(f"Port {args.port} in use, using {port}")
+    requested_port = args.port if args.port is not None else DEFAULT_PORT
+    try:
+        port = find_available_port(requested_port, scan=args.port is not None)
+    except OSError as e:
+        parser.error(str(e))
+    if port != requested_port:
+        print(f"Port {requested_port} in use, using {port}")
 
     url = f"http://{args.host}:{port}"
     print(f"Starting Agent Session Viewer at {url}")
 
-    # Open browser when server is ready
+    # lifespan opens the browser once the server is up
     if not args.no_browser:
-        import threading
-        def open_browser():
-            import time
-            import urllib.request
-            import urllib.error
-            # Poll until server is ready (max 60 seconds)
-            for _ in range(120):
-                time.sleep(0.5)
-                try:
-                    urllib.request.urlopen(f"{url}/api/status", timeout=1)
-                    webbrowser.open(url)
-                    return
-                except (urllib.error.URLError, ConnectionRefusedError):
-                    continue
-            print("Warning: Server did not become ready, opening browser anyway")
-            webbrowser.open(url)
-        threading.Thread(target=open_browser, daemon=True).start()
+        app.state.browser_url = url
 
-    uvicorn.run(app, host=args.host, port=port, log_level="warning")
+    uvicorn.run(app, host=args.host, port=port, log_level="warning", **server_options())
 
 
 if __name__ == "__main__":
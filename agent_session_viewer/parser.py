@@ -1,11 +1,15 @@
 """Parse Claude Code JSONL session files."""
 
-import json
 import os
+import re
+import sys
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, Generator, Union
+from typing import Iterable, Iterator, Optional, Generator, Union
 from dataclasses import dataclass
+from functools import lru_cache
+
+import orjson
 
 
 @dataclass
@@ -28,75 +32,152 @@ class ParsedMessage:
     timestamp: str
 
 
+@dataclass
+class ParseState:
+    """Running metadata for a session whose messages are being streamed."""
+    message_count: int = 0
+    first_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    ended_at: Optional[datetime] = None
+
+    def metadata(self, session_id: str, project: str, machine: str = "local") -> SessionMetadata:
+        return SessionMetadata(
+            session_id=session_id,
+            project=project,
+            machine=machine,
+            first_message=self.first_message,
+            started_at=self.started_at.isoformat() if self.started_at else None,
+            ended_at=self.ended_at.isoformat() if self.ended_at else None,
+            message_count=self.message_count,
+        )
+
+
+# Claude Code writes bookkeeping entries (file-history-snapshot, last-prompt,
+# ...) with "type" as the first key, and Codex writes every entry as
+# {"timestamp":...,"type":...,"payload":{"type":...}}. Matching that prefix
+# tells whether a line can hold a message without decoding it; the rest are
+# only needed for their timestamp.
+_CLAUDE_TYPE_PREFIX = re.compile(rb'\{"type":"([^"\\]*)"')
+_CODEX_PREFIX = re.compile(
+    rb'\{"timestamp":"([^"\\]*)","type":"([^"\\]*)"(?:,"payload":\{"type":"([^"\\]*)")?'
+)
+_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*"([^"\\]*)"')
+
+# Shared default for per-line .get() calls, so a missing key doesn't allocate
+# a fresh dict on every line. Read-only: never mutate it.
+_EMPTY_DICT: dict = {}
+
+
+def _scan_claude_line(line: Union[str, bytes]):
+    """Return (True, timestamp) for a Claude line that can't hold a message.
+
+    Only judged from the line's prefix; returns (False, None) when the line
+    must be decoded. A skipped line's timestamp is read directly when it has
+    a single "timestamp" key (its own, or its snapshot's).
+    """
+    if type(line) is not bytes:
+        return False, None
+    match = _CLAUDE_TYPE_PREFIX.match(line)
+    if (match is None or match.group(1) in (b"user", b"assistant")
+            or line.count(b'"timestamp"') > 1):
+        return False, None
+    match = _TIMESTAMP_RE.search(line)
+    return True, parse_timestamp(match.group(1).decode()) if match else None
+
+
+def _scan_codex_line(line: bytes):
+    """Return (True, timestamp) for a Codex line other than metadata or messages.
+
+    Response items that are tool calls, tool output or reasoning rather
+    than messages are skipped too, when their payload type comes first.
+    """
+    match = _CODEX_PREFIX.match(line)
+    if match is None:
+        return False, None
+    entry_type = match.group(2)
+    if entry_type == b"session_meta" or (
+            entry_type == b"response_item" and match.group(3) in (None, b"message")):
+        return False, None
+    return True, parse_timestamp(match.group(1).decode())
+
+
+# Python 3.11+ parses a trailing "Z" itself; older versions need an offset
+_FROMISOFORMAT_PARSES_Z = sys.version_info >= (3, 11)
+
+
 def parse_timestamp(ts_str: str) -> Optional[datetime]:
     """Parse an ISO timestamp string to datetime."""
     if not ts_str:
         return None
     try:
-        return datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-    except (ValueError, AttributeError):
+        if not _FROMISOFORMAT_PARSES_Z and ts_str.endswith("Z"):
+            ts_str = ts_str[:-1] + "+00:00"
+        return datetime.fromisoformat(ts_str)
+    except (ValueError, AttributeError, TypeError):
         return None
 
 
+def _format_ask_user_question(tool_input: dict) -> str:
+    lines = ["[Question: AskUserQuestion]"]
+    for q in tool_input.get("questions", []):
+        lines.append(f"  {q.get('question', '')}")
+        for opt in q.get("options", []):
+            lines.append(f"    - {opt.get('label', '')}: {opt.get('description', '')}")
+    return "\n".join(lines)
+
+
+_TODO_ICONS = {"completed": "✓", "in_progress": "→", "pending": "○"}
+
+
+def _format_todo_write(tool_input: dict) -> str:
+    lines = ["[Todo List]"]
+    for todo in tool_input.get("todos", []):
+        icon = _TODO_ICONS.get(todo.get("status", "pending"), "○")
+        lines.append(f"  {icon} {todo.get('content', '')}")
+    return "\n".join(lines)
+
+
+def _format_bash(tool_input: dict) -> str:
+    cmd = tool_input.get("command", "")
+    desc = tool_input.get("description", "")
+    if desc:
+        return f"[Bash: {desc}]\n$ {cmd}"
+    return f"[Bash]\n$ {cmd}"
+
+
+def _format_task(tool_input: dict) -> str:
+    desc = tool_input.get("description", "")
+    agent_type = tool_input.get("subagent_type", "")
+    return f"[Task: {desc} ({agent_type})]"
+
+
+# Formatters for tools with a custom display, keyed by tool name
+_TOOL_FORMATTERS = {
+    "AskUserQuestion": _format_ask_user_question,
+    "TodoWrite": _format_todo_write,
+    "EnterPlanMode": lambda tool_input: "[Entering Plan Mode]",
+    "ExitPlanMode": lambda tool_input: "[Exiting Plan Mode]",
+    # File operations - show what was accessed
+    "Read": lambda tool_input: f"[Read: {tool_input.get('file_path', 'unknown')}]",
+    "Glob": lambda tool_input: (
+        f"[Glob: {tool_input.get('pattern', '')} in {tool_input.get('path', '.')}]"
+    ),
+    "Grep": lambda tool_input: f"[Grep: {tool_input.get('pattern', '')}]",
+    "Edit": lambda tool_input: f"[Edit: {tool_input.get('file_path', 'unknown')}]",
+    "Write": lambda tool_input: f"[Write: {tool_input.get('file_path', 'unknown')}]",
+    "Bash": _format_bash,
+    "Task": _format_task,
+}
+
+
 def format_tool_use(block: dict) -> str:
     """Format a tool_use block for display."""
     tool_name = block.get("name", "unknown")
-    tool_input = block.get("input", {})
-
-    # Format based on tool type
-    if tool_name == "AskUserQuestion":
-        questions = tool_input.get("questions", [])
-        lines = [f"[Question: {tool_name}]"]
-        for q in questions:
-            lines.append(f"  {q.get('question', '')}")
-            for opt in q.get("options", []):
-                lines.append(f"    - {opt.get('label', '')}: {opt.get('description', '')}")
-        return "\n".join(lines)
-
-    elif tool_name == "TodoWrite":
-        todos = tool_input.get("todos", [])
-        lines = ["[Todo List]"]
-        for todo in todos:
-            status = todo.get("status", "pending")
-            icon = {"completed": "✓", "in_progress": "→", "pending": "○"}.get(status, "○")
-            lines.append(f"  {icon} {todo.get('content', '')}")
-        return "\n".join(lines)
-
-    elif tool_name == "EnterPlanMode":
-        return "[Entering Plan Mode]"
-
-    elif tool_name == "ExitPlanMode":
-        return "[Exiting Plan Mode]"
-
-    elif tool_name in ("Read", "Glob", "Grep"):
-        # File operations - show what was accessed
-        if tool_name == "Read":
-            return f"[Read: {tool_input.get('file_path', 'unknown')}]"
-        elif tool_name == "Glob":
-            return f"[Glob: {tool_input.get('pattern', '')} in {tool_input.get('path', '.')}]"
-        elif tool_name == "Grep":
-            return f"[Grep: {tool_input.get('pattern', '')}]"
-
-    elif tool_name == "Edit":
-        return f"[Edit: {tool_input.get('file_path', 'unknown')}]"
-
-    elif tool_name == "Write":
-        return f"[Write: {tool_input.get('file_path', 'unknown')}]"
-
-    elif tool_name == "Bash":
-        cmd = tool_input.get("command", "")
-        desc = tool_input.get("description", "")
-        if desc:
-            return f"[Bash: {desc}]\n$ {cmd}"
-        return f"[Bash]\n$ {cmd}"
-
-    elif tool_name == "Task":
-        desc = tool_input.get("description", "")
-        agent_type = tool_input.get("subagent_type", "")
-        return f"[Task: {desc} ({agent_type})]"
-
-    # Default: show tool name
-    return f"[Tool: {tool_name}]"
+    formatter = _TOOL_FORMATTERS.get(tool_name)
+    if formatter is None:
+        # Default: show tool name
+        return f"[Tool: {tool_name}]"
+    return formatter(block.get("input", {}))
 
 
 def extract_text_content(content, include_tools: bool = True) -> str:
@@ -123,8 +204,22 @@ def extract_text_content(content, include_tools: bool = True) -> str:
     return ""
 
 
+def _summarize_first_message(content: str) -> str:
+    """Build the session summary from the first 300 characters of a message.
+
+    Only the prefix is copied and rewritten, so long messages cost no more
+    than short ones.
+    """
+    summary = content[:300].replace("\n", " ").strip()
+    if len(content) > 300:
+        summary += "..."
+    return summary
+
+
 def make_msg_id(timestamp: str) -> str:
     """Create a message ID from timestamp."""
+    # Two replace() calls beat str.translate on strings this short
+    # (about 0.3us vs 0.7us on CPython 3.11)
     return f"msg-{timestamp.replace(':', '-').replace('.', '-')}"
 
 
@@ -139,87 +234,129 @@ def parse_session(
     Returns:
         Tuple of (SessionMetadata, list of ParsedMessages)
     """
-    session_id = jsonl_path.stem
-    messages = []
-    first_message = None
-    started_at = None
-    ended_at = None
-    message_count = 0
+    state = ParseState()
+    messages = list(iter_session_file(jsonl_path, state))
+    return state.metadata(jsonl_path.stem, project, machine), messages
+
 
+def iter_session_file(jsonl_path: Path, state: "ParseState") -> Iterator[ParsedMessage]:
+    """Stream a session file's messages, updating `state` as it goes."""
     try:
-        with open(jsonl_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.strip():
-                    continue
+        # Buffered binary iteration splits lines in C and hands orjson bytes;
+        # walking an mmap with find() in Python was over twice as slow.
+        with open(jsonl_path, "rb") as f:
+            yield from iter_session_messages(f, state, source=jsonl_path)
+    except Exception as e:
+        print(f"Error parsing {jsonl_path}: {e}")
 
-                try:
-                    entry = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
 
-                message_count += 1
+def parse_session_lines(
+    lines: Iterable[Union[str, bytes]],
+    session_id: str,
+    project: str,
+    machine: str = "local",
+    message_index: int = 0,
+    source: Optional[Path] = None,
+) -> tuple[SessionMetadata, list[ParsedMessage]]:
+    """
+    Parse Claude Code JSONL lines (str or bytes) into metadata + messages.
 
-                # Extract timestamp
-                ts = None
-                ts_str = None
-                if "timestamp" in entry:
-                    ts_str = entry["timestamp"]
-                    ts = parse_timestamp(ts_str)
-                elif "snapshot" in entry and "timestamp" in entry.get("snapshot", {}):
-                    ts_str = entry["snapshot"]["timestamp"]
-                    ts = parse_timestamp(ts_str)
+    Args:
+        message_index: Number of messages already parsed from earlier lines
+            of the same file, so fallback message IDs match a full parse
+        source: File the lines come from, for error messages
 
+    Returns:
+        Tuple of (SessionMetadata, list of ParsedMessages) for these lines only
+    """
+    state = ParseState()
+    messages = list(iter_session_messages(
+        lines, state, message_index, source=source or session_id,
+    ))
+    return state.metadata(session_id, project, machine), messages
+
+
+def iter_session_messages(
+    lines: Iterable[Union[str, bytes]],
+    state: "ParseState",
+    message_index: int = 0,
+    source: Union[Path, str, None] = None,
+) -> Iterator[ParsedMessage]:
+    """
+    Yield the messages in Claude Code JSONL lines one at a time.
+
+    Metadata accumulates in `state`, which is complete once the iterator is
+    exhausted; see parse_session_lines for the other arguments.
+    """
+    try:
+        for line in lines:
+            if not line.strip():
+                continue
+
+            # Skip decoding lines that can't be messages; they still count
+            # toward the session's time range
+            skip, ts = _scan_claude_line(line)
+            if skip:
                 if ts:
-                    if started_at is None:
-                        started_at = ts
-                    ended_at = ts
+                    if state.started_at is None:
+                        state.started_at = ts
+                    state.ended_at = ts
+                continue
+
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+
+            # Extract timestamp
+            ts = None
+            ts_str = None
+            if "timestamp" in entry:
+                ts_str = entry["timestamp"]
+                ts = parse_timestamp(ts_str)
+            elif "snapshot" in entry and "timestamp" in entry.get("snapshot", _EMPTY_DICT):
+                ts_str = entry["snapshot"]["timestamp"]
+                ts = parse_timestamp(ts_str)
 
-                # Process user messages
-                if entry.get("type") == "user":
-                    msg_data = entry.get("message", {})
-                    content = extract_text_content(msg_data.get("content", ""))
-
-                    if content.strip():
-                        # Capture first user message for summary
-                        if first_message is None:
-                            first_message = content[:300].replace("\n", " ").strip()
-                            if len(content) > 300:
-                                first_message += "..."
-
-                        messages.append(ParsedMessage(
-                            msg_id=make_msg_id(ts_str) if ts_str else f"msg-{len(messages)}",
-                            role="user",
-                            content=content,
-                            timestamp=ts_str or "",
-                        ))
-
-                # Process assistant messages
-                elif entry.get("type") == "assistant":
-                    msg_data = entry.get("message", {})
-                    content = extract_text_content(msg_data.get("content", []))
-
-                    if content.strip():
-                        messages.append(ParsedMessage(
-                            msg_id=make_msg_id(ts_str) if ts_str else f"msg-{len(messages)}",
-                            role="assistant",
-                            content=content,
-                            timestamp=ts_str or "",
-                        ))
+            if ts:
+                if state.started_at is None:
+                    state.started_at = ts
+                state.ended_at = ts
 
-    except Exception as e:
-        print(f"Error parsing {jsonl_path}: {e}")
+            # Process user messages
+            if entry.get("type") == "user":
+                msg_data = entry.get("message", _EMPTY_DICT)
+                content = extract_text_content(msg_data.get("content", ""))
 
-    metadata = SessionMetadata(
-        session_id=session_id,
-        project=project,
-        machine=machine,
-        first_message=first_message,
-        started_at=started_at.isoformat() if started_at else None,
-        ended_at=ended_at.isoformat() if ended_at else None,
-        message_count=len(messages),
-    )
+                if content.strip():
+                    # Capture first user message for summary
+                    if state.first_message is None:
+                        state.first_message = _summarize_first_message(content)
 
-    return metadata, messages
+                    state.message_count += 1
+                    yield ParsedMessage(
+                        msg_id=make_msg_id(ts_str) if ts_str else f"msg-{message_index + state.message_count - 1}",
+                        role="user",
+                        content=content,
+                        timestamp=ts_str or "",
+                    )
+
+            # Process assistant messages
+            elif entry.get("type") == "assistant":
+                msg_data = entry.get("message", _EMPTY_DICT)
+                content = extract_text_content(msg_data.get("content", ""))
+
+                if content.strip():
+                    state.message_count += 1
+                    yield ParsedMessage(
+                        msg_id=make_msg_id(ts_str) if ts_str else f"msg-{message_index + state.message_count - 1}",
+                        role="assistant",
+                        content=content,
+                        timestamp=ts_str or "",
+                    )
+
+    except Exception as e:
+        print(f"Error parsing {source}: {e}")
 
 
 def iter_project_sessions(sessions_dir: Path) -> Generator[tuple[str, Path], None, None]:
@@ -229,10 +366,12 @@ def iter_project_sessions(sessions_dir: Path) -> Generator[tuple[str, Path], Non
     Yields:
         Tuples of (project_name, jsonl_path)
     """
-    for project_dir in sorted(sessions_dir.iterdir()):
-        if not project_dir.is_dir():
-            continue
+    # DirEntry type checks come from the directory listing, without a
+    # stat() per entry (except for symlinks)
+    with os.scandir(sessions_dir) as it:
+        project_dirs = sorted(entry.path for entry in it if entry.is_dir())
 
+    for project_dir in map(Path, project_dirs):
         project_name = project_dir.name
 
         for session_file in project_dir.glob("*.jsonl"):
@@ -259,13 +398,21 @@ def extract_project_from_cwd(cwd: Union[str, os.PathLike]) -> str:
     if not cwd:
         return ""
     try:
-        # Normalize PathLike objects to string, then to Path
+        # Normalize PathLike objects to string
         if isinstance(cwd, os.PathLike):
             cwd = os.fspath(cwd)
-        if not isinstance(cwd, str):
-            return ""
-        path = Path(cwd)
-        name = path.name or ""
+    except TypeError:
+        return ""
+    if not isinstance(cwd, str):
+        return ""
+    return _project_from_cwd(cwd)
+
+
+# Every session of a project repeats the same cwd
+@lru_cache(maxsize=1024)
+def _project_from_cwd(cwd: str) -> str:
+    try:
+        name = Path(cwd).name or ""
     except (ValueError, TypeError):
         return ""
 
@@ -288,13 +435,18 @@ def extract_cwd_from_session(jsonl_path: Path) -> Optional[str]:
     Returns the first cwd found, or None if not present.
     """
     try:
-        with open(jsonl_path, "r", encoding="utf-8") as f:
+        with open(jsonl_path, "rb") as f:
             for line in f:
-                if not line.strip():
+                # Only decode lines that can hold a cwd key and aren't
+                # bookkeeping entries (which can be large snapshots)
+                if b'"cwd"' not in line:
+                    continue
+                match = _CLAUDE_TYPE_PREFIX.match(line)
+                if match is not None and match.group(1) != b"user":
                     continue
                 try:
-                    entry = json.loads(line)
-                except json.JSONDecodeError:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
                     continue
 
                 # Check for cwd in user entries
@@ -307,6 +459,43 @@ def extract_cwd_from_session(jsonl_path: Path) -> Optional[str]:
     return None
 
 
+# Content block types that carry message text in Codex response items
+_CODEX_TEXT_BLOCK_TYPES = frozenset(("input_text", "output_text", "text"))
+
+# Codex injects instructions and environment details as user messages
+_CODEX_INSTRUCTION_PREFIXES = ("# AGENTS.md", "<environment_context>", "<INSTRUCTIONS>")
+
+
+def _extract_codex_response_item(payload: dict) -> Optional[tuple[str, str]]:
+    """Return (role, text) for a Codex response_item payload.
+
+    None for items that aren't user or assistant messages, carry no text,
+    or are injected instructions.
+    """
+    role = payload.get("role")
+    if role not in ("user", "assistant"):
+        return None
+
+    texts = [
+        block["text"] for block in payload.get("content") or ()
+        if isinstance(block, dict)
+        and block.get("type") in _CODEX_TEXT_BLOCK_TYPES
+        and block.get("text")
+    ]
+    if not texts:
+        return None
+
+    # Skip system/instruction messages before joining. No prefix contains
+    # a newline, so the first block starts with one iff the joined text does.
+    if role == "user" and texts[0].startswith(_CODEX_INSTRUCTION_PREFIXES):
+        return None
+
+    content = "\n".join(texts)
+    if not content.strip():
+        return None
+    return role, content
+
+
 def parse_codex_session(
     jsonl_path: Path,
     machine: str = "local",
@@ -329,6 +518,27 @@ def parse_codex_session(
     Returns:
         Tuple of (SessionMetadata or None if skipped, list of ParsedMessages)
     """
+    try:
+        with open(jsonl_path, "rb") as f:
+            return parse_codex_session_lines(f, jsonl_path, machine, include_exec)
+    except OSError as e:
+        print(f"Error parsing Codex session {jsonl_path}: {e}")
+        return parse_codex_session_lines((), jsonl_path, machine, include_exec)
+
+
+def parse_codex_session_lines(
+    lines: Iterable[bytes],
+    jsonl_path: Path,
+    machine: str = "local",
+    include_exec: bool = False,
+    message_index: int = 0,
+) -> tuple[Optional[SessionMetadata], list[ParsedMessage]]:
+    """Parse the lines of a Codex session file, as for parse_codex_session.
+
+    `jsonl_path` names the file for errors and the fallback session ID, and
+    `message_index` is the number of messages already parsed from earlier
+    lines, so fallback message IDs match a full parse.
+    """
     messages = []
     first_message = None
     started_at = None
@@ -338,77 +548,62 @@ def parse_codex_session(
     originator = None
 
     try:
-        with open(jsonl_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if not line.strip():
-                    continue
-
-                try:
-                    entry = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
-
-                entry_type = entry.get("type")
-                payload = entry.get("payload", {})
-                ts_str = entry.get("timestamp")
-                ts = parse_timestamp(ts_str)
+        for line in lines:
+            if not line.strip():
+                continue
 
+            # Only session_meta and response_item lines are decoded
+            skip, ts = _scan_codex_line(line)
+            if skip:
                 if ts:
                     if started_at is None:
                         started_at = ts
                     ended_at = ts
+                continue
+
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue
+
+            entry_type = entry.get("type")
+            payload = entry.get("payload", _EMPTY_DICT)
+            ts_str = entry.get("timestamp")
+            ts = parse_timestamp(ts_str)
+
+            if ts:
+                if started_at is None:
+                    started_at = ts
+                ended_at = ts
+
+            # Extract session metadata
+            if entry_type == "session_meta":
+                session_id = payload.get("id")
+                cwd = payload.get("cwd", "")
+                project = extract_codex_project(cwd)
+                originator = payload.get("originator", "")
+
+                # Skip non-interactive sessions unless explicitly included
+                if not include_exec and originator == "codex_exec":
+                    return None, []
+
+            # Process messages
+            elif entry_type == "response_item":
+                extracted = _extract_codex_response_item(payload)
+                if extracted is None:
+                    continue
+                role, content = extracted
 
-                # Extract session metadata
-                if entry_type == "session_meta":
-                    session_id = payload.get("id")
-                    cwd = payload.get("cwd", "")
-                    project = extract_codex_project(cwd)
-                    originator = payload.get("originator", "")
-
-                    # Skip non-interactive sessions unless explicitly included
-                    if not include_exec and originator == "codex_exec":
-                        return None, []
-
-                # Process messages
-                elif entry_type == "response_item":
-                    role = payload.get("role")
-                    if role not in ("user", "assistant"):
-                        continue
-
-                    content_blocks = payload.get("content", [])
-                    texts = []
-                    for block in content_blocks:
-                        if isinstance(block, dict):
-                            block_type = block.get("type", "")
-                            if block_type in ("input_text", "output_text", "text"):
-                                text = block.get("text", "")
-                                if text:
-                                    texts.append(text)
-
-                    content = "\n".join(texts)
-                    if not content.strip():
-                        continue
-
-                    # Skip system/instruction messages
-                    if role == "user" and (
-                        content.startswith("# AGENTS.md") or
-                        content.startswith("<environment_context>") or
-                        content.startswith("<INSTRUCTIONS>")
-                    ):
-                        continue
+                # Capture first user message for summary
+                if role == "user" and first_message is None:
+                    first_message = _summarize_first_message(content)
 
-                    # Capture first user message for summary
-                    if role == "user" and first_message is None:
-                        first_message = content[:300].replace("\n", " ").strip()
-                        if len(content) > 300:
-                            first_message += "..."
-
-                    messages.append(ParsedMessage(
-                        msg_id=make_msg_id(ts_str) if ts_str else f"msg-{len(messages)}",
-                        role=role,
-                        content=content,
-                        timestamp=ts_str or "",
-                    ))
+                messages.append(ParsedMessage(
+                    msg_id=make_msg_id(ts_str) if ts_str else f"msg-{message_index + len(messages)}",
+                    role=role,
+                    content=content,
+                    timestamp=ts_str or "",
+                ))
 
     except Exception as e:
         print(f"Error parsing Codex session {jsonl_path}: {e}")
@@ -432,3 +627,42 @@ def parse_codex_session(
     )
 
     return metadata, messages
+
+
+def read_codex_session_header(
+    jsonl_path: Path,
+    include_exec: bool = False,
+) -> Optional[tuple[str, str]]:
+    """Read a Codex session's (session_id, project) from its session_meta entry.
+
+    Stops at the first session_meta, normally the first line, so a sync can
+    tell which stored session a file is before reading the rest of it.
+
+    Returns:
+        (session_id, project) as parse_codex_session would report them, or
+        None for a skipped non-interactive session
+    """
+    session_id = None
+    project = "unknown"
+    try:
+        with open(jsonl_path, "rb") as f:
+            for line in f:
+                match = _CODEX_PREFIX.match(line)
+                if match is not None and match.group(2) != b"session_meta":
+                    continue
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    continue
+                if entry.get("type") != "session_meta":
+                    continue
+                payload = entry.get("payload", _EMPTY_DICT)
+                if not include_exec and payload.get("originator", "") == "codex_exec":
+                    return None
+                session_id = payload.get("id")
+                project = extract_codex_project(payload.get("cwd", ""))
+                break
+    except Exception as e:
+        print(f"Error reading Codex session {jsonl_path}: {e}")
+
+    return f"codex:{session_id or jsonl_path.stem}", project
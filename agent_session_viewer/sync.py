@@ -2,30 +2,97 @@
 
 import hashlib
 import os
+import re
 import shutil
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
 import fnmatch
 
+try:
+    from blake3 import blake3 as _new_hasher
+except ImportError:  # compiled extension; fall back to hashlib's BLAKE2
+    def _new_hasher():
+        return hashlib.blake2b(digest_size=16)
+
 from . import db
 from .parser import (
+    ParsedMessage,
+    ParseState,
+    SessionMetadata,
+    iter_session_file,
     parse_session,
-    parse_codex_session,
+    parse_session_lines,
+    parse_codex_session_lines,
+    read_codex_session_header,
     iter_project_sessions,
     extract_cwd_from_session,
     extract_project_from_cwd,
 )
 
 
+# Read size for hashing and copying session files; large reads keep the
+# syscall count down on multi-megabyte sessions
+FILE_CHUNK_SIZE = 1 << 20
+
+
 def compute_file_hash(path: Path) -> str:
-    """Compute MD5 hash of a file."""
-    hasher = hashlib.md5()
+    """Compute the change-detection hash (BLAKE3) of a file."""
+    hasher = _new_hasher()
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b""):
             hasher.update(chunk)
     return hasher.hexdigest()
 
+
+# Length of the MD5 digests stored by versions before BLAKE3
+_MD5_HEX_LENGTH = 32
+
+
+def _hash_matches(path: Path, stored_hash: Optional[str]) -> tuple[bool, Optional[str]]:
+    """Check a file against its stored hash.
+
+    Rows written before the switch to BLAKE3 hold MD5 digests, which have a
+    different length; those are checked with MD5 once so that an upgrade
+    doesn't re-import every session.
+
+    Returns:
+        (matches, new_hash) where new_hash replaces a matching MD5 digest
+    """
+    file_hash = compute_file_hash(path)
+    if file_hash == stored_hash:
+        return True, None
+    if stored_hash and len(stored_hash) == _MD5_HEX_LENGTH != len(file_hash):
+        md5 = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b""):
+                md5.update(chunk)
+        if md5.hexdigest() == stored_hash:
+            return True, file_hash
+    return False, None
+
+
+def _copy_rest(f, hasher, out):
+    """Copy and hash whatever remains of binary file f."""
+    for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b""):
+        hasher.update(chunk)
+        out.write(chunk)
+
+
+def _copied_lines(f, hasher, out):
+    """Yield every line of binary file f, hashing and copying each."""
+    for line in f:
+        hasher.update(line)
+        out.write(line)
+        yield line
+
 # Where Claude Code stores sessions
 CLAUDE_PROJECTS_DIR = Path(os.environ.get(
     "CLAUDE_PROJECTS_DIR",
@@ -45,6 +112,22 @@ SESSIONS_DIR = DATA_DIR / "sessions"
 # Project patterns to match (case-insensitive)
 PROJECT_PATTERNS = ["*"]
 
+# Threads used to hash, copy and parse session files during a full sync.
+# Database writes stay on the calling thread (SQLite has a single writer).
+SYNC_WORKERS = min(8, os.cpu_count() or 1)
+
+# A full sync stores consecutive sessions in one transaction, committing once
+# this many seconds have passed so other writers (live updates) aren't held
+# up for long.
+SYNC_COMMIT_INTERVAL = 0.5
+
+
+# Parent directories skipped when naming a project, in priority order
+PROJECT_PARENT_MARKERS = ("code", "projects", "repos", "src", "work", "dev")
+
+# True system directories, never used as a project name
+SYSTEM_DIRS = frozenset(("users", "home", "var", "tmp", "private"))
+
 
 def get_project_name(dir_path: Path) -> str:
     """Convert a project directory path to a clean name.
@@ -52,7 +135,12 @@ def get_project_name(dir_path: Path) -> str:
     Claude Code encodes paths like /Users/wesm/code/my-app as -Users-wesm-code-my-app.
     This function extracts a meaningful project name from such encoded paths.
     """
-    name = dir_path.name
+    return _project_name_from_dir_name(dir_path.name)
+
+
+# Live updates name the project on every file change; names are few
+@lru_cache(maxsize=1024)
+def _project_name_from_dir_name(name: str) -> str:
     if not name.startswith("-"):
         return name.replace("-", "_")
 
@@ -60,9 +148,7 @@ def get_project_name(dir_path: Path) -> str:
     parts = name.split("-")
 
     # Look for common parent directories to skip, in priority order
-    skip_markers = ["code", "projects", "repos", "src", "work", "dev"]
-
-    for marker in skip_markers:
+    for marker in PROJECT_PARENT_MARKERS:
         for i, part in enumerate(parts):
             if part.lower() == marker and i + 1 < len(parts):
                 # Take everything after this marker
@@ -73,9 +159,8 @@ def get_project_name(dir_path: Path) -> str:
     # No marker found - take the last non-empty part as the project name
     # This handles cases like -Users-wesm -> wesm
     # Only skip true system directories; names like "code", "src", "dev" are valid project names
-    system_dirs = {"users", "home", "var", "tmp", "private"}
     for part in reversed(parts):
-        if part and part.lower() not in system_dirs:
+        if part and part.lower() not in SYSTEM_DIRS:
             return part.replace("-", "_")
 
     # Ultimate fallback
@@ -84,19 +169,23 @@ def get_project_name(dir_path: Path) -> str:
 
 def find_matching_projects() -> list[Path]:
     """Find all projects matching our patterns."""
-    if not CLAUDE_PROJECTS_DIR.exists():
+    try:
+        with os.scandir(CLAUDE_PROJECTS_DIR) as it:
+            entries = [entry for entry in it if entry.is_dir()]
+    except (FileNotFoundError, NotADirectoryError):
         return []
 
-    projects = []
-    for item in CLAUDE_PROJECTS_DIR.iterdir():
-        if not item.is_dir():
-            continue
-
-        name = item.name.lower()
-        for pattern in PROJECT_PATTERNS:
-            if fnmatch.fnmatch(name, pattern.lower()):
-                projects.append(item)
-                break
+    if "*" in PROJECT_PATTERNS:
+        # The default pattern matches every directory
+        projects = [Path(entry.path) for entry in entries]
+    elif PROJECT_PATTERNS:
+        # One regex for all patterns, compiled once per scan
+        match = re.compile(
+            "|".join(fnmatch.translate(pattern.lower()) for pattern in PROJECT_PATTERNS)
+        ).match
+        projects = [Path(entry.path) for entry in entries if match(entry.name.lower())]
+    else:
+        projects = []
 
     return sorted(projects)
 
@@ -118,6 +207,42 @@ def find_source_file(session_id: str) -> Optional[Path]:
     return _find_claude_source_file(session_id)
 
 
+# resolve_source_file cache: session_id -> (path or None, expires_at, consecutive misses)
+SOURCE_FILE_TTL = 60.0
+SOURCE_FILE_MISS_TTL = 5.0
+_source_file_cache: dict[str, tuple[Optional[Path], float, int]] = {}
+
+
+def resolve_source_file(session_id: str) -> Optional[Path]:
+    """find_source_file with a TTL cache, for callers that look up repeatedly.
+
+    Found paths are reused for SOURCE_FILE_TTL seconds while they still
+    exist. Misses are cached for SOURCE_FILE_MISS_TTL seconds, doubling with
+    each consecutive miss up to SOURCE_FILE_TTL, so a deleted session isn't
+    searched for across every project directory every few seconds.
+    """
+    now = time.monotonic()
+    misses = 0
+    cached = _source_file_cache.get(session_id)
+    if cached:
+        path, expires_at, misses = cached
+        if now < expires_at and (path is None or path.exists()):
+            return path
+
+    path = find_source_file(session_id)
+    if path:
+        _source_file_cache[session_id] = (path, now + SOURCE_FILE_TTL, 0)
+    else:
+        ttl = min(SOURCE_FILE_MISS_TTL * 2 ** misses, SOURCE_FILE_TTL)
+        _source_file_cache[session_id] = (None, now + ttl, misses + 1)
+    return path
+
+
+def forget_source_file(session_id: str):
+    """Drop a cached resolve_source_file result (e.g. the file went away)."""
+    _source_file_cache.pop(session_id, None)
+
+
 def _find_claude_source_file(session_id: str) -> Optional[Path]:
     """Find a Claude session source file."""
     if not CLAUDE_PROJECTS_DIR.exists():
@@ -128,20 +253,21 @@ def _find_claude_source_file(session_id: str) -> Optional[Path]:
         return None
 
     for project_dir in CLAUDE_PROJECTS_DIR.iterdir():
-        if not project_dir.is_dir():
-            continue
         candidate = project_dir / f"{session_id}.jsonl"
+        # The ID check keeps the name inside project_dir; resolving both only
+        # for an existing candidate still rejects a symlink pointing outside
+        if not candidate.exists():
+            continue
         try:
             candidate.resolve().relative_to(project_dir.resolve())
         except ValueError:
             continue
-        if candidate.exists():
-            return candidate
+        return candidate
     return None
 
 
 def _find_codex_source_file(session_id: str) -> Optional[Path]:
-    """Find a Codex session source file by searching year/month/day directories."""
+    """Find a Codex session source file, rescanning the sessions tree on a miss."""
     if not CODEX_SESSIONS_DIR.exists():
         return None
 
@@ -149,30 +275,129 @@ def _find_codex_source_file(session_id: str) -> Optional[Path]:
     if not session_id or not all(c.isalnum() or c in '-_' for c in session_id):
         return None
 
-    # Search through year/month/day structure
-    for year_dir in CODEX_SESSIONS_DIR.iterdir():
-        if not year_dir.is_dir() or not year_dir.name.isdigit():
-            continue
-        for month_dir in year_dir.iterdir():
-            if not month_dir.is_dir() or not month_dir.name.isdigit():
-                continue
-            for day_dir in month_dir.iterdir():
-                if not day_dir.is_dir() or not day_dir.name.isdigit():
-                    continue
-                # Codex files are named rollout-{timestamp}-{uuid}.jsonl
-                # UUID format: 8-4-4-4-12 hex chars (e.g., 019b9da7-1f41-7af2-80d9-6e293902fea8)
-                for session_file in day_dir.glob("*.jsonl"):
-                    stem = session_file.stem
-                    if stem.startswith("rollout-"):
-                        # UUID is last 5 dash-separated segments (8-4-4-4-12 format)
-                        # Use rsplit to extract from end, robust to timestamp format changes
-                        parts = stem.rsplit("-", 5)
-                        if len(parts) == 6:
-                            # parts[0] = "rollout-{timestamp}", parts[1:] = UUID segments
-                            file_uuid = "-".join(parts[1:])
-                            if file_uuid == session_id:
-                                return session_file
-    return None
+    path = _indexed_codex_source_file(session_id)
+    if path is None:
+        find_codex_sessions()
+        path = _indexed_codex_source_file(session_id)
+    return path
+
+
+def _indexed_codex_source_file(session_id: str) -> Optional[Path]:
+    """Look a Codex session up in the index from the last find_codex_sessions."""
+    root, index = _codex_source_index
+    path = index.get(session_id) if root == CODEX_SESSIONS_DIR else None
+    return path if path is not None and path.exists() else None
+
+
+def _codex_file_session_id(stem: str) -> Optional[str]:
+    """Return the session UUID from a rollout-{timestamp}-{uuid} file name."""
+    # UUID format: 8-4-4-4-12 hex chars (e.g., 019b9da7-1f41-7af2-80d9-6e293902fea8)
+    if not stem.startswith("rollout-"):
+        return None
+    # UUID is last 5 dash-separated segments (8-4-4-4-12 format)
+    # Use rsplit to extract from end, robust to timestamp format changes
+    parts = stem.rsplit("-", 5)
+    if len(parts) != 6:
+        return None
+    # parts[0] = "rollout-{timestamp}", parts[1:] = UUID segments
+    return "-".join(parts[1:])
+
+
+def _stored_file_info(
+    session_id: str,
+    file_info: Optional[dict[str, tuple[int, str, Optional[int], str]]],
+) -> Optional[tuple[int, str, Optional[int]]]:
+    """Look up stored (file_size, file_hash, file_mtime_ns), preferring a preloaded map."""
+    if file_info is not None:
+        stored_info = file_info.get(session_id)
+        return stored_info[:3] if stored_info else None
+    return db.get_session_file_info(session_id)
+
+
+def _file_size(path: Path) -> Optional[int]:
+    """Return a file's size from a single stat, or None if it doesn't exist."""
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return None
+
+
+def _content_mtime_ns(st: os.stat_result, copied_size: int) -> Optional[int]:
+    """The mtime to store for a file copied after stat() returned `st`.
+
+    None if the file grew while it was being read: the mtime would then
+    predate the stored content, so the next sync must compare hashes.
+    """
+    return st.st_mtime_ns if copied_size == st.st_size else None
+
+
+def _parallel_map(fn, items, workers: int):
+    """Map fn over items on a thread pool, yielding results in order.
+
+    At most 2 * workers results are in flight, so parsed sessions waiting
+    for the (single-threaded) database writes don't pile up in memory.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _store_read(result: Optional[dict], parsed):
+    """Write the outcome of a read step (see _read_session_file)."""
+    if isinstance(parsed, AppendedLines):
+        if not _store_appended_lines(result["session_id"], parsed):
+            # The session changed after the read (e.g. a live tail sync
+            # appended first); re-import the whole file instead
+            if parsed.metadata.agent == "codex":
+                retry = _read_codex_session(parsed.source_path, parsed.metadata.machine, True, None)
+            else:
+                retry = _read_session_file(
+                    parsed.source_path, result["project"], parsed.metadata.machine, True, None,
+                )
+            _store_read(*retry)
+            result.update(retry[0] or {})
+    elif parsed is not None:
+        _store_parsed_session(result["session_id"], parsed)
+    elif result and "file_mtime_ns" in result:
+        # Unchanged content under a new mtime (or one never recorded), and
+        # possibly a legacy MD5 hash to replace
+        db.update_session_file_mtime(
+            result["session_id"], result["file_mtime_ns"], result.get("file_hash"),
+        )
+
+
+def _store_parsed_session(session_id: str, parsed: tuple):
+    """Write a parsed session and its messages in one transaction.
+
+    Args:
+        parsed: (metadata, messages, file_size, file_hash, file_mtime_ns)
+            from a read step
+    """
+    metadata, messages, source_size, source_hash, source_mtime_ns = parsed
+    with db.transaction():
+        db.upsert_session(
+            session_id=metadata.session_id,
+            project=metadata.project,
+            machine=metadata.machine,
+            first_message=metadata.first_message,
+            started_at=metadata.started_at,
+            ended_at=metadata.ended_at,
+            message_count=metadata.message_count,
+            file_size=source_size,
+            file_hash=source_hash,
+            agent=metadata.agent,
+            file_mtime_ns=source_mtime_ns,
+        )
+
+        db.replace_session_messages(session_id, (
+            (session_id, m.msg_id, m.role, m.content, m.timestamp)
+            for m in messages
+        ))
 
 
 def sync_session_file(
@@ -180,57 +405,112 @@ def sync_session_file(
     project_name: str,
     machine: str = "local",
     force: bool = False,
+    file_info: Optional[dict[str, tuple[int, str, Optional[int], str]]] = None,
 ) -> Optional[dict]:
     """
     Sync a single session file using smart incremental sync.
 
-    Skips processing if file size and hash match stored values.
+    Skips processing if file size and mtime, or size and hash, match
+    stored values.
+
+    Args:
+        file_info: Optional preloaded result of db.get_all_session_file_info(),
+            used instead of a per-session lookup
 
     Returns:
         Session metadata dict if synced, None if skipped
     """
+    result, parsed = _read_session_file(source_path, project_name, machine, force, file_info)
+    _store_read(result, parsed)
+    return result
+
+
+def _is_bad_project_name(project: str) -> bool:
+    """Detect bad project names that look like encoded paths.
+
+    Covers: _Users*, _home*, _private*, _tmp*, _var*
+    and paths containing system directory segments
+    """
+    return (
+        project.startswith("_Users") or
+        project.startswith("_home") or
+        project.startswith("_private") or
+        project.startswith("_tmp") or
+        project.startswith("_var") or
+        "_var_folders_" in project or
+        "_var_tmp_" in project
+    )
+
+
+def _read_session_file(
+    source_path: Path,
+    project_name: str,
+    machine: str,
+    force: bool,
+    file_info: Optional[dict[str, tuple[int, str, Optional[int], str]]],
+) -> tuple[Optional[dict], object]:
+    """Check, copy and parse a session file without writing to the database.
+
+    Safe to run on worker threads.
+
+    Returns:
+        (result, parsed) where result is as for sync_session_file and parsed
+        is the input to _store_parsed_session, an AppendedLines, or None if
+        nothing changed. An unchanged file's result carries file_mtime_ns
+        when the stored mtime needs updating.
+    """
     session_id = source_path.stem
 
     # Skip agent files
     if session_id.startswith("agent-"):
-        return None
+        return None, None
 
     # Get source file info
-    source_size = source_path.stat().st_size
-
-    # Check if file has changed using size + hash (before expensive cwd extraction)
-    stored_info = db.get_session_file_info(session_id)
-    if stored_info and not force:
-        stored_size, stored_hash = stored_info
-        if stored_size == source_size:
-            # Size matches, check hash
-            source_hash = compute_file_hash(source_path)
-            if source_hash == stored_hash:
+    st = source_path.stat()
+    source_size = st.st_size
+
+    # Check if file has changed using size + mtime, falling back to a hash
+    # when the mtime differs (before expensive cwd extraction).
+    # Either source gives the file info and project, so an unchanged file
+    # needs no further query.
+    if file_info is None:
+        stored_state = db.get_session_import_state(session_id)
+    else:
+        stored_info = file_info.get(session_id)
+        stored_state = (
+            {"file_size": stored_info[0], "file_hash": stored_info[1],
+             "file_mtime_ns": stored_info[2], "project": stored_info[3]}
+            if stored_info else None
+        )
+    if stored_state and stored_state["file_size"] is not None and not force:
+        if stored_state["file_size"] == source_size:
+            # Size matches; an unchanged mtime skips reading the file at all
+            mtime_matches = stored_state.get("file_mtime_ns") == st.st_mtime_ns
+            unchanged, new_hash = (
+                (True, None) if mtime_matches else _hash_matches(source_path, stored_state["file_hash"])
+            )
+            if unchanged:
                 # File unchanged - check if stored project name needs fixing
-                stored_session = db.get_session(session_id)
-                stored_project = stored_session.get("project", "") if stored_session else ""
-
-                # Detect bad project names that look like encoded paths
-                # Covers: _Users*, _home*, _private*, _tmp*, _var*
-                # and paths containing system directory segments
-                needs_reparse = (
-                    stored_project.startswith("_Users") or
-                    stored_project.startswith("_home") or
-                    stored_project.startswith("_private") or
-                    stored_project.startswith("_tmp") or
-                    stored_project.startswith("_var") or
-                    "_var_folders_" in stored_project or
-                    "_var_tmp_" in stored_project
-                )
+                stored_project = stored_state.get("project") or ""
 
-                if not needs_reparse:
-                    return {
+                if not _is_bad_project_name(stored_project):
+                    result = {
                         "session_id": session_id,
                         "project": stored_project or project_name,
                         "skipped": True,
                         "messages": 0,
                     }
+                    if not mtime_matches:
+                        result["file_mtime_ns"] = st.st_mtime_ns
+                    if new_hash:
+                        result["file_hash"] = new_hash
+                    return result, None
                 # Otherwise, fall through to re-parse for better project name
+        elif 0 < stored_state["file_size"] < source_size:
+            # Usually a live session that has grown: parse only the new lines
+            appended = _read_appended_lines(source_path, machine, st, stored_state)
+            if appended is not None:
+                return appended
 
     # File is new or changed - extract cwd for accurate project name
     # This handles nested directories correctly (e.g., /Users/user/Projects/my-app -> my_app)
@@ -239,60 +519,351 @@ def sync_session_file(
     if actual_project_name:
         project_name = actual_project_name
 
-    # File is new or changed - compute hash if not already done
-    source_hash = compute_file_hash(source_path)
-
-    # Copy to local storage
+    # Copy to local storage, hashing and parsing in the same read
     target_dir = SESSIONS_DIR / project_name
     target_dir.mkdir(parents=True, exist_ok=True)
     target_path = target_dir / source_path.name
-    shutil.copy2(source_path, target_path)
+    hasher = _new_hasher()
+    with open(source_path, "rb") as f, open(target_path, "wb") as out:
+        metadata, messages = parse_session_lines(
+            _copied_lines(f, hasher, out), session_id, project_name, machine,
+            source=source_path,
+        )
+        # The parser stops early on an unexpected error; copy the rest anyway
+        _copy_rest(f, hasher, out)
+        source_size = out.tell()
+    shutil.copystat(source_path, target_path)
+    source_hash = hasher.hexdigest()
+
+    return {
+        "session_id": session_id,
+        "project": project_name,
+        "skipped": False,
+        "messages": len(messages),
+    }, (metadata, messages, source_size, source_hash, _content_mtime_ns(st, source_size))
+
+
+@dataclass
+class AppendedLines:
+    """Lines parsed past a session's stored prefix, for _store_read."""
+    source_path: Path
+    base_size: int  # stored file_size and file_hash the lines were read past
+    base_hash: str
+    metadata: SessionMetadata
+    messages: list[ParsedMessage]
+    file_size: int
+    file_hash: str
+    file_mtime_ns: Optional[int]
+
+
+def _read_appended_lines(
+    source_path: Path,
+    machine: str,
+    st: os.stat_result,
+    stored_state: dict,
+) -> Optional[tuple[dict, Optional[AppendedLines]]]:
+    """Copy, hash and parse only the lines appended to an imported Claude session.
+
+    Returns None, so the caller re-imports the whole file, unless
+    _read_appended_tail can use the stored prefix.
+    """
+    session_id = source_path.stem
+    if "message_count" not in stored_state:
+        stored_state = db.get_session_import_state(session_id) or {}
+    project = stored_state.get("project") or ""
+    if not project or _is_bad_project_name(project):
+        return None
+
+    def parse(lines, message_index):
+        return parse_session_lines(
+            lines, session_id, project, machine,
+            message_index=message_index, source=source_path,
+        )
+
+    return _read_appended_tail(
+        source_path, session_id, project, SESSIONS_DIR / project / source_path.name,
+        st, stored_state, parse,
+    )
+
+
+def _read_appended_tail(
+    source_path: Path,
+    session_id: str,
+    project: str,
+    target_path: Path,
+    st: os.stat_result,
+    stored_state: dict,
+    parse,
+) -> Optional[tuple[dict, Optional[AppendedLines]]]:
+    """Copy, hash and parse the lines past a session's stored prefix.
+
+    `parse(lines, message_index)` returns (metadata, messages) for the new
+    lines. Returns None unless the stored file_size bytes still hash to the
+    stored file_hash, end on a line boundary and match the local copy's
+    size. As in sync_session_tail, a trailing partial line is left for the
+    next sync.
+    """
+    base_size = stored_state.get("file_size") or 0
+    if not 0 < base_size < st.st_size:
+        return None
+
+    if _file_size(target_path) != base_size:
+        return None
+
+    hasher = _new_hasher()
+    with open(source_path, "rb") as f:
+        remaining = base_size
+        last = b""
+        while remaining:
+            chunk = f.read(min(FILE_CHUNK_SIZE, remaining))
+            if not chunk:
+                return None
+            hasher.update(chunk)
+            remaining -= len(chunk)
+            last = chunk
+        if not last.endswith(b"\n") or hasher.hexdigest() != stored_state["file_hash"]:
+            return None
+
+        with open(target_path, "ab") as out:
+            metadata, messages = parse(
+                _complete_lines(f, hasher, out), stored_state["message_count"],
+            )
+            offset = out.tell()
+
+    if offset == base_size:
+        # Only a partial line so far
+        return {
+            "session_id": session_id,
+            "project": project,
+            "skipped": True,
+            "messages": 0,
+        }, None
+
+    return {
+        "session_id": session_id,
+        "project": project,
+        "skipped": False,
+        "messages": len(messages),
+    }, AppendedLines(
+        source_path, base_size, stored_state["file_hash"], metadata, messages,
+        offset, hasher.hexdigest(), _content_mtime_ns(st, offset),
+    )
 
-    # Parse and index
-    metadata, messages = parse_session(target_path, project_name, machine)
 
-    # Update database with file info
+def _store_appended_lines(session_id: str, appended: AppendedLines) -> bool:
+    """Add appended lines to a session unless it changed since they were read."""
+    with db.transaction():
+        stored = db.get_session_detail(session_id)
+        if not stored or (stored["file_size"], stored["file_hash"]) != (
+                appended.base_size, appended.base_hash):
+            return False
+        _write_appended_lines(
+            stored, appended.metadata, appended.messages,
+            appended.file_size, appended.file_hash, appended.file_mtime_ns,
+        )
+    return True
+
+
+def _write_appended_lines(
+    stored: dict,
+    metadata: SessionMetadata,
+    messages: list[ParsedMessage],
+    file_size: int,
+    file_hash: str,
+    file_mtime_ns: Optional[int] = None,
+):
+    """Merge newly parsed lines into a stored session; runs inside a transaction."""
+    session_id = stored["id"]
     db.upsert_session(
-        session_id=metadata.session_id,
-        project=metadata.project,
+        session_id=session_id,
+        project=stored["project"],
         machine=metadata.machine,
-        first_message=metadata.first_message,
-        started_at=metadata.started_at,
-        ended_at=metadata.ended_at,
-        message_count=metadata.message_count,
-        file_size=source_size,
-        file_hash=source_hash,
-        agent=metadata.agent,
+        first_message=stored["first_message"] or metadata.first_message,
+        started_at=stored["started_at"] or metadata.started_at,
+        ended_at=metadata.ended_at or stored["ended_at"],
+        message_count=stored["message_count"] + len(messages),
+        file_size=file_size,
+        file_hash=file_hash,
+        agent=stored["agent"],
+        file_mtime_ns=file_mtime_ns,
+    )
+    db.insert_messages_batch(
+        (session_id, m.msg_id, m.role, m.content, m.timestamp) for m in messages
     )
 
-    # Re-index messages
-    db.delete_session_messages(session_id)
-    if messages:
-        batch = [
-            (session_id, m.msg_id, m.role, m.content, m.timestamp)
-            for m in messages
-        ]
-        db.insert_messages_batch(batch)
+
+@dataclass
+class SessionTail:
+    """How far sync_session_tail has ingested a live session file."""
+    inode: int
+    offset: int  # end of the last complete line ingested
+    hasher: object  # running hash of the source bytes before offset
+
+
+def _complete_lines(f, hasher, out):
+    """Yield complete lines from binary file f, hashing and copying each.
+
+    Stops before a trailing line without a newline, which may still be
+    being written.
+    """
+    for line in f:
+        if not line.endswith(b"\n"):
+            break
+        hasher.update(line)
+        out.write(line)
+        yield line
+
+
+def sync_session_tail(
+    source_path: Path,
+    project_name: str,
+    machine: str = "local",
+    tail: Optional[SessionTail] = None,
+) -> tuple[Optional[dict], Optional[SessionTail]]:
+    """
+    Sync a live Claude session file, parsing only lines appended since `tail`.
+
+    Session files are append-only in practice, so once a file has been
+    imported, each call reads, copies and parses just the complete lines
+    added since; a partial last line is left for the next call. The whole
+    file is re-imported when there is no tail, the file was replaced or
+    truncated, or the stored session or local copy no longer matches the
+    tail (e.g. a full sync rewrote them in between).
+
+    Returns:
+        (result, tail): result as for sync_session_file (None for agent
+        files), and the tail to pass to the next call
+    """
+    session_id = source_path.stem
+    if session_id.startswith("agent-"):
+        return None, None
+
+    st = source_path.stat()
+    if tail is not None and st.st_ino == tail.inode and st.st_size >= tail.offset:
+        with db.transaction():
+            stored = db.get_session_detail(session_id)
+            if (stored and stored["file_size"] == tail.offset
+                    and stored["file_hash"] == tail.hasher.hexdigest()):
+                target_path = SESSIONS_DIR / stored["project"] / source_path.name
+                if _file_size(target_path) == tail.offset:
+                    return _append_session_tail(source_path, target_path, machine, tail, stored)
+
+    return _import_session_tail(source_path, project_name, machine, st.st_ino)
+
+
+def _append_session_tail(
+    source_path: Path,
+    target_path: Path,
+    machine: str,
+    tail: SessionTail,
+    stored: dict,
+) -> tuple[dict, SessionTail]:
+    """Ingest lines appended after tail.offset; runs inside a transaction."""
+    session_id = source_path.stem
+    project = stored["project"]
+    hasher = tail.hasher.copy()
+
+    with open(source_path, "rb") as f, open(target_path, "ab") as out:
+        f.seek(tail.offset)
+        metadata, messages = parse_session_lines(
+            _complete_lines(f, hasher, out), session_id, project, machine,
+            message_index=stored["message_count"], source=source_path,
+        )
+        offset = out.tell()
+
+    if offset == tail.offset:
+        return {
+            "session_id": session_id,
+            "project": project,
+            "skipped": True,
+            "messages": 0,
+        }, tail
+
+    _write_appended_lines(stored, metadata, messages, offset, hasher.hexdigest())
+
+    return {
+        "session_id": session_id,
+        "project": project,
+        "skipped": False,
+        "messages": len(messages),
+    }, SessionTail(tail.inode, offset, hasher)
+
+
+def _import_session_tail(
+    source_path: Path,
+    project_name: str,
+    machine: str,
+    inode: int,
+) -> tuple[dict, SessionTail]:
+    """Import every complete line of a session file, starting a new tail."""
+    session_id = source_path.stem
+    cwd = extract_cwd_from_session(source_path)
+    project_name = (extract_project_from_cwd(cwd) if cwd else None) or project_name
+
+    target_dir = SESSIONS_DIR / project_name
+    target_dir.mkdir(parents=True, exist_ok=True)
+    hasher = _new_hasher()
+    with open(source_path, "rb") as f, open(target_dir / source_path.name, "wb") as out:
+        metadata, messages = parse_session_lines(
+            _complete_lines(f, hasher, out), session_id, project_name, machine,
+            source=source_path,
+        )
+        offset = out.tell()
+
+    # No mtime: the stored size covers complete lines only
+    _store_parsed_session(session_id, (metadata, messages, offset, hasher.hexdigest(), None))
 
     return {
         "session_id": session_id,
         "project": project_name,
         "skipped": False,
         "messages": len(messages),
-    }
+    }, SessionTail(inode, offset, hasher)
 
 
-def sync_project(project_dir: Path, machine: str = "local", on_progress=None) -> dict:
+def sync_project(
+    project_dir: Path,
+    machine: str = "local",
+    on_progress=None,
+    file_info: Optional[dict[str, tuple[int, str, Optional[int], str]]] = None,
+) -> dict:
     """
     Sync all sessions from a project directory.
 
+    Stored file info is loaded in one query unless `file_info` is supplied.
+
     Returns:
         Dict with sync stats
     """
     project_name = get_project_name(project_dir)
-    # Filter out agent- files from the count
-    session_files = [f for f in project_dir.glob("*.jsonl") if not f.stem.startswith("agent-")]
+    session_files = _project_session_files(project_dir)
+
+    if file_info is None:
+        file_info = db.get_all_session_file_info()
+
+    # Hash, copy and parse on worker threads; write here, in file order
+    def read(session_file):
+        return _read_session_file(session_file, project_name, machine, False, file_info)
+
+    reads = _parallel_map(read, session_files, SYNC_WORKERS)
+    return _store_reads(project_name, session_files, reads, on_progress)
+
+
+def _project_session_files(project_dir: Path) -> list[Path]:
+    """List a project's session files, leaving out agent- files."""
+    return [f for f in project_dir.glob("*.jsonl") if not f.stem.startswith("agent-")]
+
+
+def _store_reads(project_name: str, session_files: list[Path], reads, on_progress=None) -> dict:
+    """Store the (result, parsed) reads of one project's files, in file order.
 
+    Consumes exactly len(session_files) items from `reads`, so one read
+    stream can be shared by consecutive projects. Writes are grouped into
+    transactions of up to SYNC_COMMIT_INTERVAL seconds.
+
+    Returns:
+        Dict with sync stats
+    """
     if on_progress:
         on_progress("project_start", project=project_name, sessions=len(session_files))
 
@@ -303,23 +874,43 @@ def sync_project(project_dir: Path, machine: str = "local", on_progress=None) ->
         "skipped": 0,
     }
 
-    for session_file in session_files:
-        if on_progress:
-            on_progress("session_start", session=session_file.stem)
-
-        result = sync_session_file(session_file, project_name, machine)
-        stats["total"] += 1
-
-        msg_count = 0
-        if result:
-            msg_count = result.get("messages", 0)
-            if result.get("skipped"):
-                stats["skipped"] += 1
-            else:
-                stats["synced"] += 1
-
-        if on_progress:
-            on_progress("session_done", messages=msg_count)
+    pending = zip(session_files, reads)
+    item = next(pending, None)
+    while item is not None:
+        # Each session gets a savepoint, so a failing one is undone on its
+        # own: the sessions stored before it are committed, then the error
+        # is raised as if each had been committed separately
+        error = None
+        commit_at = time.monotonic() + SYNC_COMMIT_INTERVAL
+        with db.transaction():
+            try:
+                while item is not None:
+                    session_file, (result, parsed) = item
+                    if on_progress:
+                        on_progress("session_start", session=session_file.stem)
+
+                    with db.savepoint():
+                        _store_read(result, parsed)
+                    stats["total"] += 1
+
+                    msg_count = 0
+                    if result:
+                        msg_count = result.get("messages", 0)
+                        if result.get("skipped"):
+                            stats["skipped"] += 1
+                        else:
+                            stats["synced"] += 1
+
+                    if on_progress:
+                        on_progress("session_done", messages=msg_count)
+
+                    item = next(pending, None)
+                    if time.monotonic() >= commit_at:
+                        break
+            except Exception as exc:
+                error = exc
+        if error is not None:
+            raise error
 
     if on_progress:
         on_progress("project_done", project=project_name)
@@ -327,103 +918,137 @@ def sync_project(project_dir: Path, machine: str = "local", on_progress=None) ->
     return stats
 
 
+def _numbered_subdirs(path) -> list[str]:
+    """List the paths of a directory's all-digit subdirectories (years, months, days)."""
+    with os.scandir(path) as it:
+        return [entry.path for entry in it if entry.name.isdigit() and entry.is_dir()]
+
+
+# Codex session id -> source file, rebuilt by every find_codex_sessions scan
+# (including each sync) so lookups don't walk the year/month/day tree. Tagged
+# with the sessions directory it was built from.
+_codex_source_index: tuple[Optional[Path], dict[str, Path]] = (None, {})
+
+
 def find_codex_sessions() -> list[Path]:
-    """Find all Codex session files (in year/month/day subdirectories)."""
+    """Find all Codex session files (in year/month/day subdirectories).
+
+    Also refreshes the session id index used by find_source_file.
+    """
     if not CODEX_SESSIONS_DIR.exists():
         return []
 
     sessions = []
     # Codex stores in ~/.codex/sessions/{year}/{month}/{day}/*.jsonl
-    for year_dir in CODEX_SESSIONS_DIR.iterdir():
-        if not year_dir.is_dir() or not year_dir.name.isdigit():
-            continue
-        for month_dir in year_dir.iterdir():
-            if not month_dir.is_dir() or not month_dir.name.isdigit():
-                continue
-            for day_dir in month_dir.iterdir():
-                if not day_dir.is_dir() or not day_dir.name.isdigit():
-                    continue
-                for session_file in day_dir.glob("*.jsonl"):
-                    sessions.append(session_file)
-
-    return sorted(sessions)
+    for year_dir in _numbered_subdirs(CODEX_SESSIONS_DIR):
+        for month_dir in _numbered_subdirs(year_dir):
+            for day_dir in _numbered_subdirs(month_dir):
+                sessions.extend(Path(day_dir).glob("*.jsonl"))
+
+    sessions.sort()
+    index = {}
+    for session_file in sessions:
+        session_id = _codex_file_session_id(session_file.stem)
+        if session_id:
+            index.setdefault(session_id, session_file)
+    global _codex_source_index
+    _codex_source_index = (CODEX_SESSIONS_DIR, index)
+    return sessions
 
 
 def sync_codex_session(
     source_path: Path,
     machine: str = "local",
     force: bool = False,
+    file_info: Optional[dict[str, tuple[int, str, Optional[int], str]]] = None,
 ) -> Optional[dict]:
     """
     Sync a single Codex session file.
 
+    `file_info` is an optional preloaded map as for sync_session_file.
+
     Returns:
         Session metadata dict if synced, None if skipped (including non-interactive sessions)
     """
-    # Get source file info
-    source_size = source_path.stat().st_size
+    result, parsed = _read_codex_session(source_path, machine, force, file_info)
+    _store_read(result, parsed)
+    return result
 
-    # Parse to get session_id and project from content
-    # Non-interactive (codex_exec) sessions are skipped by default
-    metadata, messages = parse_codex_session(source_path, machine)
 
-    # Skip non-interactive sessions
-    if metadata is None:
-        return None
+def _read_codex_session(
+    source_path: Path,
+    machine: str,
+    force: bool,
+    file_info: Optional[dict[str, tuple[int, str, Optional[int], str]]],
+) -> tuple[Optional[dict], Optional[tuple]]:
+    """Check, copy and parse a Codex session file without writing to the database.
 
-    session_id = metadata.session_id
+    Returns:
+        (result, parsed) as for _read_session_file
+    """
+    # Get source file info
+    st = source_path.stat()
+    source_size = st.st_size
+
+    # The session_meta header gives session_id and project without parsing
+    # the whole file. Non-interactive (codex_exec) sessions are skipped by default
+    header = read_codex_session_header(source_path)
+    if header is None:
+        return None, None
+    session_id, project = header
+    target_dir = SESSIONS_DIR / f"codex_{project}"
+    target_path = target_dir / f"{session_id}.jsonl"
 
-    # Check if file has changed using size + hash
-    stored_info = db.get_session_file_info(session_id)
+    # Check if file has changed using size + mtime, or size + hash
+    stored_info = _stored_file_info(session_id, file_info)
     if stored_info and not force:
-        stored_size, stored_hash = stored_info
+        stored_size, stored_hash, stored_mtime_ns = stored_info
         if stored_size == source_size:
-            source_hash = compute_file_hash(source_path)
-            if source_hash == stored_hash:
-                return {
+            mtime_matches = stored_mtime_ns == st.st_mtime_ns
+            unchanged, new_hash = (
+                (True, None) if mtime_matches else _hash_matches(source_path, stored_hash)
+            )
+            if unchanged:
+                result = {
                     "session_id": session_id,
-                    "project": metadata.project,
+                    "project": project,
                     "skipped": True,
                     "messages": 0,
                 }
-
-    source_hash = compute_file_hash(source_path)
-
-    # Copy to local storage under codex/ prefix
-    target_dir = SESSIONS_DIR / f"codex_{metadata.project}"
+                if not mtime_matches:
+                    result["file_mtime_ns"] = st.st_mtime_ns
+                if new_hash:
+                    result["file_hash"] = new_hash
+                return result, None
+        elif 0 < stored_size < source_size:
+            # Usually a live rollout that has grown: parse only the new lines
+            appended = _read_appended_tail(
+                source_path, session_id, project, target_path, st,
+                db.get_session_import_state(session_id) or {},
+                lambda lines, message_index: parse_codex_session_lines(
+                    lines, source_path, machine, include_exec=True, message_index=message_index,
+                ),
+            )
+            if appended is not None:
+                return appended
+
+    # Copy to local storage under codex/ prefix, hashing and parsing in the same read
     target_dir.mkdir(parents=True, exist_ok=True)
-    target_path = target_dir / f"{session_id}.jsonl"
-    shutil.copy2(source_path, target_path)
-
-    # Update database
-    db.upsert_session(
-        session_id=metadata.session_id,
-        project=metadata.project,
-        machine=metadata.machine,
-        first_message=metadata.first_message,
-        started_at=metadata.started_at,
-        ended_at=metadata.ended_at,
-        message_count=metadata.message_count,
-        file_size=source_size,
-        file_hash=source_hash,
-        agent=metadata.agent,
-    )
-
-    # Re-index messages
-    db.delete_session_messages(session_id)
-    if messages:
-        batch = [
-            (session_id, m.msg_id, m.role, m.content, m.timestamp)
-            for m in messages
-        ]
-        db.insert_messages_batch(batch)
+    hasher = _new_hasher()
+    with open(source_path, "rb") as f, open(target_path, "wb") as out:
+        metadata, messages = parse_codex_session_lines(
+            _copied_lines(f, hasher, out), source_path, machine, include_exec=True,
+        )
+        _copy_rest(f, hasher, out)
+        source_size = out.tell()
+    shutil.copystat(source_path, target_path)
 
     return {
-        "session_id": session_id,
+        "session_id": metadata.session_id,
         "project": metadata.project,
         "skipped": False,
         "messages": len(messages),
-    }
+    }, (metadata, messages, source_size, hasher.hexdigest(), _content_mtime_ns(st, source_size))
 
 
 def sync_all(machine: str = "local", on_progress=None) -> dict:
@@ -450,49 +1075,37 @@ def sync_all(machine: str = "local", on_progress=None) -> dict:
         "total_synced": 0,
     }
 
-    # Sync Claude projects
+    # Warm change detection with one scan instead of a lookup per file
+    file_info = db.get_all_session_file_info()
+
+    # One read stream for every project, so worker threads keep reading
+    # ahead across project boundaries while this thread writes
+    groups = []
     for project_dir in projects:
-        stats = sync_project(project_dir, machine, on_progress=on_progress)
+        project_name = get_project_name(project_dir)
+        groups.append((project_name, _project_session_files(project_dir), partial(
+            _read_session_file, project_name=project_name, machine=machine,
+            force=False, file_info=file_info,
+        )))
+    if codex_sessions:
+        groups.append(("codex", codex_sessions, partial(
+            _read_codex_session, machine=machine, force=False, file_info=file_info,
+        )))
+
+    jobs = (
+        (read, session_file)
+        for _, session_files, read in groups
+        for session_file in session_files
+    )
+    reads = _parallel_map(lambda job: job[0](job[1]), jobs, SYNC_WORKERS)
+    for project_name, session_files, _ in groups:
+        stats = _store_reads(project_name, session_files, reads, on_progress)
         results["projects"].append(stats)
         results["total_sessions"] += stats["total"]
         results["total_synced"] += stats["synced"]
 
-    # Sync Codex sessions
-    if codex_sessions:
-        if on_progress:
-            on_progress("project_start", project="codex", sessions=len(codex_sessions))
-
-        codex_stats = {
-            "project": "codex",
-            "total": 0,
-            "synced": 0,
-            "skipped": 0,
-        }
-
-        for session_file in codex_sessions:
-            if on_progress:
-                on_progress("session_start", session=session_file.stem)
-
-            result = sync_codex_session(session_file, machine)
-            codex_stats["total"] += 1
-
-            msg_count = 0
-            if result:
-                msg_count = result.get("messages", 0)
-                if result.get("skipped"):
-                    codex_stats["skipped"] += 1
-                else:
-                    codex_stats["synced"] += 1
-
-            if on_progress:
-                on_progress("session_done", messages=msg_count)
-
-        if on_progress:
-            on_progress("project_done", project="codex")
-
-        results["projects"].append(codex_stats)
-        results["total_sessions"] += codex_stats["total"]
-        results["total_synced"] += codex_stats["synced"]
+    # Keep query planner statistics current after bulk imports
+    db.optimize()
 
     if on_progress:
         on_progress("done")
@@ -507,28 +1120,37 @@ def reindex_all():
         "messages": 0,
     }
 
-    for project_name, session_path in iter_project_sessions(SESSIONS_DIR):
-        metadata, messages = parse_session(session_path, project_name)
-
-        db.upsert_session(
-            session_id=metadata.session_id,
-            project=metadata.project,
-            machine=metadata.machine,
-            first_message=metadata.first_message,
-            started_at=metadata.started_at,
-            ended_at=metadata.ended_at,
-            message_count=metadata.message_count,
-        )
-
-        db.delete_session_messages(metadata.session_id)
-        if messages:
-            batch = [
-                (metadata.session_id, m.msg_id, m.role, m.content, m.timestamp)
-                for m in messages
-            ]
-            db.insert_messages_batch(batch)
-            results["messages"] += len(messages)
-
-        results["sessions"] += 1
+    # One transaction per project: session rows are collected while messages
+    # are replaced, then written with a single batched upsert. Messages are
+    # streamed from the parser into chunked inserts, never held as a list.
+    for project_name, entries in groupby(iter_project_sessions(SESSIONS_DIR), key=itemgetter(0)):
+        session_rows = []
+        with db.transaction():
+            for _, session_path in entries:
+                session_id = session_path.stem
+                state = ParseState()
+                db.replace_session_messages(session_id, (
+                    (session_id, m.msg_id, m.role, m.content, m.timestamp)
+                    for m in iter_session_file(session_path, state)
+                ))
+                metadata = state.metadata(session_id, project_name)
+
+                session_rows.append((
+                    metadata.session_id,
+                    metadata.project,
+                    metadata.machine,
+                    metadata.first_message,
+                    metadata.started_at,
+                    metadata.ended_at,
+                    metadata.message_count,
+                    None,
+                    None,
+                    metadata.agent,
+                    None,
+                ))
+                results["messages"] += metadata.message_count
+                results["sessions"] += 1
+
+            db.upsert_sessions_batch(session_rows)
 
     return results
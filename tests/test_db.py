@@ -20,10 +20,25 @@ def test_db(tmp_path):
          patch.object(db, "DATA_DIR", test_data_dir):
         db.init_db()
         yield test_db_path
+        db.close_connection()
 
 
 class TestGetSessions:
-    """Tests for get_sessions filtering behavior."""
+    """Tests for get_sessions_summary filtering behavior."""
+
+    def test_returns_summary_columns(self, test_db, tmp_path):
+        """Listings should omit file bookkeeping columns."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=1,
+                              first_message="hi", file_size=10, file_hash="abc")
+
+            session = db.get_sessions_summary()[0]
+
+            assert session["first_message"] == "hi"
+            assert session["agent"] == "claude"
+            assert "file_hash" not in session
+            assert "file_size" not in session
 
     def test_filters_zero_message_count(self, test_db, tmp_path):
         """Sessions with message_count=0 should be filtered out."""
@@ -34,7 +49,7 @@ class TestGetSessions:
             db.upsert_session("sess-zero", "project1", message_count=0)
             db.upsert_session("sess-more-msgs", "project1", message_count=10)
 
-            sessions = db.get_sessions()
+            sessions = db.get_sessions_summary()
 
             session_ids = [s["id"] for s in sessions]
             assert "sess-with-msgs" in session_ids
@@ -55,7 +70,7 @@ class TestGetSessions:
                     ("sess-null", "project1")
                 )
 
-            sessions = db.get_sessions()
+            sessions = db.get_sessions_summary()
 
             session_ids = [s["id"] for s in sessions]
             assert "sess-with-msgs" in session_ids
@@ -68,7 +83,7 @@ class TestGetSessions:
             db.upsert_session("sess-1", "project1", message_count=1)
             db.upsert_session("sess-100", "project1", message_count=100)
 
-            sessions = db.get_sessions()
+            sessions = db.get_sessions_summary()
 
             assert len(sessions) == 2
             session_ids = [s["id"] for s in sessions]
@@ -82,7 +97,7 @@ class TestGetSessions:
             db.upsert_session("sess-a", "project-a", message_count=5)
             db.upsert_session("sess-b", "project-b", message_count=5)
 
-            sessions = db.get_sessions(project="project-a")
+            sessions = db.get_sessions_summary(project="project-a")
 
             assert len(sessions) == 1
             assert sessions[0]["id"] == "sess-a"
@@ -94,7 +109,7 @@ class TestGetSessions:
             for i in range(10):
                 db.upsert_session(f"sess-{i}", "project1", message_count=5)
 
-            sessions = db.get_sessions(limit=3)
+            sessions = db.get_sessions_summary(limit=3)
 
             assert len(sessions) == 3
 
@@ -102,5 +117,807 @@ class TestGetSessions:
         """Should return empty list for empty database."""
         with patch.object(db, "DB_PATH", test_db), \
              patch.object(db, "DATA_DIR", tmp_path):
-            sessions = db.get_sessions()
+            sessions = db.get_sessions_summary()
             assert sessions == []
+
+    def test_orders_by_most_recent_activity(self, test_db, tmp_path):
+        """Sessions should be ordered by ended_at, falling back to started_at."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-old", "project1", message_count=1,
+                              started_at="2025-01-01T00:00:00", ended_at="2025-01-01T01:00:00")
+            db.upsert_session("sess-new", "project1", message_count=1,
+                              started_at="2025-01-03T00:00:00", ended_at="2025-01-03T01:00:00")
+            db.upsert_session("sess-open", "project1", message_count=1,
+                              started_at="2025-01-02T00:00:00")
+
+            session_ids = [s["id"] for s in db.get_sessions_summary()]
+            assert session_ids == ["sess-new", "sess-open", "sess-old"]
+
+    @pytest.mark.parametrize("project,index", [
+        (None, "idx_sessions_recent"),
+        ("project1", "idx_sessions_project_recent"),
+    ])
+    def test_listing_uses_sort_index(self, test_db, tmp_path, project, index):
+        """Listing should walk the sort index instead of sorting in memory."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            executed = []
+            with db.get_read_db() as conn:
+                conn.set_trace_callback(executed.append)
+                try:
+                    db.get_sessions_summary(project=project)
+                finally:
+                    conn.set_trace_callback(None)
+                query = next(q for q in executed if q.startswith("SELECT"))
+                plan = " ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query))
+
+            assert index in plan
+            assert "TEMP B-TREE" not in plan
+
+
+class TestConnection:
+    """Tests for connection setup."""
+
+    def test_wal_mode_enabled(self, test_db, tmp_path):
+        """init_db should switch the database to WAL journaling."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as conn:
+                mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            assert mode == "wal"
+
+    def test_connection_pragmas_applied(self, test_db, tmp_path):
+        """Each connection should use the tuned synchronous setting."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as conn:
+                # synchronous=NORMAL is reported as 1
+                assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+                # temp_store=MEMORY is reported as 2
+                assert conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+                assert conn.execute("PRAGMA mmap_size").fetchone()[0] == 1073741824
+
+    def test_connection_reused_across_calls(self, test_db, tmp_path):
+        """get_db should hand out the same connection within a thread."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as first:
+                pass
+            with db.get_db() as second:
+                pass
+            assert first is second
+
+    def test_reopens_when_db_path_changes(self, test_db, tmp_path):
+        """A new DB_PATH should get a fresh connection."""
+        other_db = tmp_path / "other.db"
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as first:
+                pass
+        with patch.object(db, "DB_PATH", other_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as second:
+                pass
+            assert first is not second
+            db.close_connection()
+
+    def test_rolls_back_on_error(self, test_db, tmp_path):
+        """Uncommitted writes should be discarded when the block raises."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with pytest.raises(RuntimeError):
+                with db.get_db() as conn:
+                    conn.execute(
+                        "INSERT INTO sessions (id, project) VALUES (?, ?)",
+                        ("sess-rollback", "project1"),
+                    )
+                    raise RuntimeError("boom")
+
+            assert not db.session_exists("sess-rollback")
+
+    def test_reader_is_separate_and_read_only(self, test_db, tmp_path):
+        """Reads should use their own query_only connection."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as writer:
+                pass
+            with db.get_read_db() as reader:
+                assert reader is not writer
+                assert reader.in_transaction is False
+                with pytest.raises(sqlite3.OperationalError):
+                    reader.execute(
+                        "INSERT INTO sessions (id, project) VALUES ('x', 'y')"
+                    )
+
+    def test_reader_sees_committed_writes(self, test_db, tmp_path):
+        """The reader should not hold a stale snapshot between calls."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            assert not db.session_exists("sess-1")
+            db.upsert_session("sess-1", "project1")
+            assert db.session_exists("sess-1")
+
+    def test_reads_in_transaction_see_own_writes(self, test_db, tmp_path):
+        """Inside transaction() reads should use the write connection."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.transaction() as conn:
+                db.upsert_session("sess-1", "project1")
+                assert db.session_exists("sess-1")
+                with db.get_read_db() as reader:
+                    assert reader is conn
+
+
+class TestTransaction:
+    """Tests for the explicit transaction scope."""
+
+    def test_helpers_share_one_commit(self, test_db, tmp_path):
+        """Writes inside transaction() are invisible to others until commit."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.transaction():
+                db.upsert_session("sess-1", "project1", message_count=1)
+                db.insert_messages_batch([
+                    ("sess-1", "msg-1", "user", "hello", "2025-01-01T00:00:00Z"),
+                ])
+                other = sqlite3.connect(test_db)
+                try:
+                    count = other.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                finally:
+                    other.close()
+                assert count == 0
+
+            assert db.session_exists("sess-1")
+            assert db.get_message_count("sess-1") == 1
+
+    def test_rolls_back_all_writes_on_error(self, test_db, tmp_path):
+        """An error inside transaction() discards every helper's writes."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with pytest.raises(RuntimeError):
+                with db.transaction():
+                    db.upsert_session("sess-1", "project1", message_count=1)
+                    db.insert_messages_batch([
+                        ("sess-1", "msg-1", "user", "hello", "2025-01-01T00:00:00Z"),
+                    ])
+                    raise RuntimeError("boom")
+
+            assert not db.session_exists("sess-1")
+            assert db.get_message_count("sess-1") == 0
+
+    def test_savepoint_rolls_back_only_its_block(self, test_db, tmp_path):
+        """A failing savepoint discards its own writes but not earlier ones."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.transaction():
+                db.upsert_session("sess-1", "project1", message_count=1)
+                with pytest.raises(RuntimeError):
+                    with db.savepoint():
+                        db.upsert_session("sess-2", "project1", message_count=1)
+                        raise RuntimeError("boom")
+                with db.savepoint():
+                    db.upsert_session("sess-3", "project1", message_count=1)
+
+            assert db.session_exists("sess-1")
+            assert not db.session_exists("sess-2")
+            assert db.session_exists("sess-3")
+
+    def test_nested_transaction_joins_outer(self, test_db, tmp_path):
+        """A nested transaction() should not commit the outer one early."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with pytest.raises(RuntimeError):
+                with db.transaction():
+                    with db.transaction():
+                        db.upsert_session("sess-1", "project1", message_count=1)
+                    raise RuntimeError("boom")
+
+            assert not db.session_exists("sess-1")
+
+
+class TestReplaceSessionMessages:
+    """Tests for bulk re-import of a session's messages."""
+
+    def test_replaces_messages_and_fts(self, test_db, tmp_path):
+        """Old messages and their FTS entries should be replaced."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=1)
+            db.replace_session_messages("sess-1", [
+                ("sess-1", "msg-1", "user", "original zebra", "2025-01-01T00:00:00Z"),
+            ])
+            db.replace_session_messages("sess-1", [
+                ("sess-1", "msg-1", "user", "updated giraffe", "2025-01-01T00:00:00Z"),
+                ("sess-1", "msg-2", "assistant", "reply", "2025-01-01T00:00:01Z"),
+            ])
+
+            assert db.get_message_count("sess-1") == 2
+            assert db.search_messages("zebra") == []
+            assert len(db.search_messages("giraffe")) == 1
+
+    def test_empty_messages_clears_session(self, test_db, tmp_path):
+        """Replacing with no messages should just delete existing ones."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=1)
+            db.replace_session_messages("sess-1", [
+                ("sess-1", "msg-1", "user", "hello", "2025-01-01T00:00:00Z"),
+            ])
+            db.replace_session_messages("sess-1", [])
+
+            assert db.get_message_count("sess-1") == 0
+
+
+class TestGetAllSessionFileInfo:
+    """Tests for bulk loading stored file info."""
+
+    def test_returns_sessions_with_file_info(self, test_db, tmp_path):
+        """Only sessions with a stored file size should be included."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", file_size=100, file_hash="abc")
+            db.upsert_session("sess-2", "project1")
+
+            assert db.get_all_session_file_info() == {"sess-1": (100, "abc", None, "project1")}
+
+
+class TestGetSessionImportState:
+    """Tests for the combined sync prelude lookup."""
+
+    def test_returns_file_info_and_project(self, test_db, tmp_path):
+        """One lookup should return file info, project and message count."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=4,
+                              file_size=100, file_hash="abc", file_mtime_ns=123)
+
+            assert db.get_session_import_state("sess-1") == {
+                "file_size": 100,
+                "file_hash": "abc",
+                "file_mtime_ns": 123,
+                "project": "project1",
+                "message_count": 4,
+            }
+
+    def test_missing_session(self, test_db, tmp_path):
+        """A session that does not exist should return None."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            assert db.get_session_import_state("missing") is None
+
+
+class TestUpsertSessionsBatch:
+    """Tests for batched session upserts."""
+
+    def test_inserts_and_updates_sessions(self, test_db, tmp_path):
+        """Rows should be inserted, and existing ids updated in place."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "old_project", message_count=1)
+
+            db.upsert_sessions_batch([
+                ("sess-1", "project1", "local", "hi", None, None, 3, 10, "abc", "claude", None),
+                ("sess-2", "project2", "laptop", None, None, None, 1, None, None, "codex", None),
+            ])
+
+            updated = db.get_session_detail("sess-1")
+            assert updated["project"] == "project1"
+            assert updated["message_count"] == 3
+            assert updated["file_hash"] == "abc"
+            assert db.get_session_detail("sess-2")["agent"] == "codex"
+            assert db.get_projects() == ["project1", "project2"]
+
+    def test_empty_batch(self, test_db, tmp_path):
+        """An empty batch should be a no-op."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_sessions_batch([])
+            assert db.get_sessions_summary() == []
+
+
+class TestInsertMessagesBatch:
+    """Tests for chunked batch inserts."""
+
+    def test_accepts_generator_across_chunks(self, test_db, tmp_path):
+        """A generator spanning several chunks should be fully inserted."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=25)
+            rows = (
+                ("sess-1", f"msg-{i}", "user", f"message {i}", f"2025-01-01T00:00:{i:02d}Z")
+                for i in range(25)
+            )
+            db.insert_messages_batch(rows, chunk_size=10)
+
+            assert db.get_message_count("sess-1") == 25
+
+    def test_empty_iterable(self, test_db, tmp_path):
+        """An empty iterable should insert nothing."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.insert_messages_batch(iter([]))
+            assert db.get_stats()["messages"] == 0
+
+
+class TestSearchMessages:
+    """Tests for full-text search."""
+
+    def _seed(self):
+        db.upsert_session("sess-a", "project-a", message_count=1)
+        db.upsert_session("sess-b", "project-b", message_count=1)
+        db.insert_messages_batch([
+            ("sess-a", "msg-1", "user", "deploy the widget", "2025-01-01T00:00:00Z"),
+            ("sess-b", "msg-1", "user", "widget refactor", "2025-01-01T00:00:00Z"),
+        ])
+
+    def test_filters_by_project(self, test_db, tmp_path):
+        """Project filter should restrict results to that project."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            self._seed()
+
+            assert len(db.search_messages("widget")) == 2
+            results = db.search_messages("widget", project="project-a")
+            assert [r["session_id"] for r in results] == ["sess-a"]
+            assert "<mark>" in results[0]["snippet"]
+
+    def test_offset_pages_through_ranked_results(self, test_db, tmp_path):
+        """Consecutive pages should partition the full ranked result list."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            self._seed()
+
+            full = [r["id"] for r in db.search_messages("widget")]
+            pages = [
+                r["id"]
+                for offset in (0, 1)
+                for r in db.search_messages("widget", limit=1, offset=offset)
+            ]
+            assert pages == full
+            assert db.search_messages("widget", offset=2) == []
+
+    @pytest.mark.parametrize("sql,params", [
+        (db.SQL_SEARCH_MESSAGES, ("widget", 10, 0)),
+        (db.SQL_SEARCH_MESSAGES_IN_PROJECT, ("widget", "project-a", 10, 0)),
+    ])
+    def test_query_plan_uses_fts_match_index(self, test_db, tmp_path, sql, params):
+        """Searches should be driven by the FTS5 MATCH index, not a scan."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as conn:
+                plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+            # e.g. "SCAN messages_fts VIRTUAL TABLE INDEX 32:M1"; a full
+            # scan would report an index string without an M constraint
+            fts_steps = [step for step in plan if "messages_fts" in step]
+            assert fts_steps and "M" in fts_steps[0].rsplit(":", 1)[-1]
+
+
+class TestOptimize:
+    """Tests for planner statistics maintenance."""
+
+    def test_close_collects_statistics(self, test_db, tmp_path):
+        """Closing a connection that ran queries should populate sqlite_stat1."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            for i in range(20):
+                db.upsert_session(f"sess-{i}", "project1", message_count=1)
+            db.get_sessions_summary(project="project1")
+            db.close_connection()
+
+            with db.get_db() as conn:
+                row = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+                ).fetchone()
+            assert row is not None
+
+
+class TestGetSessionMessages:
+    """Tests for loading a session's messages."""
+
+    def test_returns_plain_dicts_in_timestamp_order(self, test_db, tmp_path):
+        """Messages should come back as dicts ordered by timestamp."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=2)
+            db.insert_messages_batch([
+                ("sess-1", "msg-2", "assistant", "second", "2025-01-01T00:00:02Z"),
+                ("sess-1", "msg-1", "user", "first", "2025-01-01T00:00:01Z"),
+            ])
+
+            messages = db.get_session_messages("sess-1")
+
+            assert all(type(m) is dict for m in messages)
+            assert [m["content"] for m in messages] == ["first", "second"]
+            assert set(messages[0]) == {"id", "session_id", "msg_id", "role", "content", "timestamp"}
+
+
+class TestMessageIndexes:
+    """Tests for the messages table indexes."""
+
+    def test_session_load_needs_no_sort(self, test_db, tmp_path):
+        """Loading a session in timestamp order should not build a temp B-tree."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as conn:
+                plan = " ".join(row[3] for row in conn.execute(
+                    "EXPLAIN QUERY PLAN SELECT * FROM messages "
+                    "WHERE session_id = ? ORDER BY timestamp, id", ("sess-1",)
+                ))
+                indexes = {row[0] for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'messages'"
+                )}
+
+            assert "idx_messages_session_ts" in plan
+            assert "TEMP B-TREE" not in plan
+            assert "idx_messages_session" not in indexes
+
+
+class TestSessionMessagePages:
+    """Tests for keyset pagination of session messages."""
+
+    def _seed(self, count):
+        db.upsert_session("sess-1", "project1", message_count=count)
+        # Insert in reverse so id order differs from timestamp order
+        db.insert_messages_batch([
+            ("sess-1", f"msg-{i}", "user", f"message {i}", f"2025-01-01T00:00:{i:02d}Z")
+            for i in reversed(range(count))
+        ])
+
+    def test_pages_follow_timestamp_order(self, test_db, tmp_path):
+        """Consecutive pages should cover every message once, in order."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            self._seed(7)
+
+            first = db.get_session_messages_page("sess-1", limit=3)
+            second = db.get_session_messages_page("sess-1", after_id=first[-1]["id"], limit=3)
+            third = db.get_session_messages_page("sess-1", after_id=second[-1]["id"], limit=3)
+
+            contents = [m["content"] for m in first + second + third]
+            assert contents == [f"message {i}" for i in range(7)]
+            assert len(third) == 1
+
+    def test_iter_matches_full_load(self, test_db, tmp_path):
+        """iter_session_messages should yield the same rows as a full load."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            self._seed(10)
+
+            streamed = list(db.iter_session_messages("sess-1", page_size=4))
+            assert streamed == db.get_session_messages("sess-1")
+
+    def test_iter_survives_reimport(self, test_db, tmp_path):
+        """A re-import between pages should not end the iteration early."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            self._seed(6)
+
+            messages = db.iter_session_messages("sess-1", page_size=2)
+            contents = [next(messages)["content"], next(messages)["content"]]
+            # Re-import replaces every row, so the cursor's id is gone
+            db.replace_session_messages("sess-1", [
+                ("sess-1", f"msg-{i}", "user", f"message {i}", f"2025-01-01T00:00:{i:02d}Z")
+                for i in range(6)
+            ])
+            contents += [m["content"] for m in messages]
+
+            assert contents == [f"message {i}" for i in range(6)]
+
+    def test_iter_pages_through_shared_timestamps(self, test_db, tmp_path):
+        """Messages sharing a timestamp across a page boundary appear once."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=5)
+            db.insert_messages_batch([
+                ("sess-1", f"msg-{i}", "user", f"message {i}", "2025-01-01T00:00:00Z")
+                for i in range(5)
+            ])
+
+            streamed = list(db.iter_session_messages("sess-1", page_size=2))
+            assert streamed == db.get_session_messages("sess-1")
+
+
+class TestGetStats:
+    """Tests for database statistics."""
+
+    def test_counts(self, test_db, tmp_path):
+        """Stats should count sessions, messages, projects and machines."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project-a", machine="laptop", message_count=2)
+            db.upsert_session("sess-2", "project-a", machine="desktop", message_count=1)
+            db.upsert_session("sess-3", "project-b", machine="laptop", message_count=1)
+            db.insert_messages_batch([
+                ("sess-1", "msg-1", "user", "hi", "2025-01-01T00:00:00Z"),
+                ("sess-1", "msg-2", "assistant", "hello", "2025-01-01T00:00:01Z"),
+                ("sess-2", "msg-1", "user", "hi", "2025-01-01T00:00:00Z"),
+            ])
+
+            assert db.get_stats() == {
+                "sessions": 3,
+                "messages": 3,
+                "projects": 2,
+                "machines": 2,
+            }
+
+
+class TestProjectAndMachineNames:
+    """Tests for the trigger-maintained project/machine name tables."""
+
+    def test_lists_distinct_sorted_names(self, test_db, tmp_path):
+        """get_projects/get_machines should list each name once, sorted."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "zeta", machine="laptop")
+            db.upsert_session("sess-2", "alpha", machine="laptop")
+            db.upsert_session("sess-3", "alpha", machine="desktop")
+
+            assert db.get_projects() == ["alpha", "zeta"]
+            assert db.get_machines() == ["desktop", "laptop"]
+
+    def test_renamed_project_drops_stale_name(self, test_db, tmp_path):
+        """Re-upserting a session under a new project should retire the old name."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "_Users_alice_code_my_app")
+            db.upsert_session("sess-1", "my_app")
+
+            assert db.get_projects() == ["my_app"]
+
+    def test_shared_name_survives_partial_rename(self, test_db, tmp_path):
+        """A name should stay listed while any session still uses it."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "shared")
+            db.upsert_session("sess-2", "shared")
+            db.upsert_session("sess-1", "other")
+
+            assert db.get_projects() == ["other", "shared"]
+
+    def test_delete_removes_unused_names(self, test_db, tmp_path):
+        """Deleting the last session of a project should drop its name."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", machine="laptop")
+            with db.get_db() as conn:
+                conn.execute("DELETE FROM sessions WHERE id = ?", ("sess-1",))
+
+            assert db.get_projects() == []
+            assert db.get_machines() == []
+
+    def test_backfills_existing_database(self, test_db, tmp_path):
+        """init_db should populate name tables from pre-existing sessions."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            # Simulate a database created before the name tables existed
+            with db.get_db() as conn:
+                conn.executescript("""
+                    DROP TABLE project_names;
+                    DROP TABLE machine_names;
+                    DROP TRIGGER sessions_names_ai;
+                    INSERT INTO sessions (id, project) VALUES ('sess-1', 'legacy');
+                """)
+
+            db.init_db()
+
+            assert db.get_projects() == ["legacy"]
+            assert db.get_machines() == ["local"]
+
+    def test_names_cached_until_session_write(self, test_db, tmp_path):
+        """Name lists should be served from cache and refreshed on upsert."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1")
+            assert db.get_projects() == ["project1"]
+
+            with patch.object(db, "get_db") as mock_get_db:
+                assert db.get_projects() == ["project1"]
+                mock_get_db.assert_not_called()
+
+            db.upsert_session("sess-2", "project2", machine="laptop")
+            assert db.get_projects() == ["project1", "project2"]
+            assert db.get_machines() == ["laptop", "local"]
+
+    def test_name_cache_cleared_after_rollback(self, test_db, tmp_path):
+        """Names read inside a rolled-back transaction must not stay cached."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with pytest.raises(RuntimeError):
+                with db.transaction():
+                    db.upsert_session("sess-1", "project1")
+                    assert db.get_projects() == ["project1"]
+                    raise RuntimeError("abort")
+
+            assert db.get_projects() == []
+
+
+class TestFullTextIndex:
+    """Tests for the FTS index configuration and migration."""
+
+    def test_stemmed_search(self, test_db, tmp_path):
+        """Porter stemming should match other forms of a word."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=1)
+            db.insert_messages_batch([
+                ("sess-1", "msg-1", "user", "the tests are running", "2025-01-01T00:00:00Z"),
+            ])
+
+            assert len(db.search_messages("run")) == 1
+            assert len(db.search_messages("test")) == 1
+            assert len(db.search_messages("tes*")) == 1
+
+    def test_migrates_legacy_fts_table(self, test_db, tmp_path):
+        """A pre-versioned database should get the new tokenizer and a rebuilt index."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=1)
+            db.insert_messages_batch([
+                ("sess-1", "msg-1", "user", "the tests are running", "2025-01-01T00:00:00Z"),
+            ])
+            # Recreate the original unstemmed FTS table without any index data
+            with db.get_db() as conn:
+                conn.executescript("""
+                    DROP TABLE messages_fts;
+                    CREATE VIRTUAL TABLE messages_fts USING fts5(
+                        content, content='messages', content_rowid='id'
+                    );
+                    PRAGMA user_version = 0;
+                """)
+
+            db.init_db()
+
+            with db.get_db() as conn:
+                sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = 'messages_fts'"
+                ).fetchone()[0]
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+            assert "porter" in sql
+            assert version == db.SCHEMA_VERSION
+            assert len(db.search_messages("run")) == 1
+
+    def test_indexes_only_leading_content(self, test_db, tmp_path):
+        """Text past FTS_CONTENT_LIMIT is stored but not searchable."""
+        with patch.object(db, "DB_PATH", tmp_path / "capped.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(db, "FTS_CONTENT_LIMIT", 64):
+            db.init_db()
+            content = "head " + "x" * 100 + " tail"
+            db.upsert_session("sess-1", "project1", message_count=1)
+            db.insert_messages_batch([
+                ("sess-1", "msg-1", "user", content, "2025-01-01T00:00:00Z"),
+            ])
+
+            results = db.search_messages("head")
+            assert len(results) == 1
+            assert results[0]["content"] == content
+            assert db.search_messages("tail") == []
+
+    def test_delete_and_rebuild_with_long_content(self, test_db, tmp_path):
+        """Deleting capped rows and rebuilding should leave a consistent index."""
+        with patch.object(db, "DB_PATH", tmp_path / "capped.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(db, "FTS_CONTENT_LIMIT", 64):
+            db.init_db()
+            db.upsert_session("sess-1", "project1", message_count=1)
+            db.replace_session_messages("sess-1", [
+                ("sess-1", "msg-1", "user", "alpha " + "x" * 100, "2025-01-01T00:00:00Z"),
+            ])
+            db.replace_session_messages("sess-1", [
+                ("sess-1", "msg-1", "user", "beta " + "y" * 100, "2025-01-01T00:00:00Z"),
+            ])
+
+            with db.get_db() as conn:
+                conn.execute("INSERT INTO messages_fts(messages_fts) VALUES('integrity-check')")
+                conn.execute("INSERT INTO messages_fts(messages_fts) VALUES('rebuild')")
+
+            assert db.search_messages("alpha") == []
+            assert len(db.search_messages("beta")) == 1
+
+
+class TestSessionsTable:
+    """Tests for the sessions table layout and its migration."""
+
+    def test_sessions_without_rowid(self, test_db, tmp_path):
+        """New databases should create sessions as a WITHOUT ROWID table."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            with db.get_db() as conn:
+                sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = 'sessions'"
+                ).fetchone()[0]
+            assert "WITHOUT ROWID" in sql
+
+    def test_migrates_rowid_sessions_table(self, test_db, tmp_path):
+        """A rowid sessions table should be rebuilt with data, indexes and triggers."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=2,
+                              started_at="2025-01-01T00:00:00", file_size=10, file_hash="abc")
+            # Recreate sessions as an ordinary rowid table, as older versions did
+            with db.get_db() as conn:
+                conn.executescript(f"""
+                    CREATE TABLE sessions_old ({db.SESSIONS_COLUMNS});
+                    INSERT INTO sessions_old SELECT * FROM sessions;
+                    DROP TABLE sessions;
+                    ALTER TABLE sessions_old RENAME TO sessions;
+                    PRAGMA user_version = 2;
+                """)
+
+            db.init_db()
+
+            with db.get_db() as conn:
+                sql = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = 'sessions'"
+                ).fetchone()[0]
+                objects = {
+                    row[0] for row in conn.execute(
+                        "SELECT name FROM sqlite_master WHERE tbl_name = 'sessions'"
+                    )
+                }
+            assert "WITHOUT ROWID" in sql
+            assert {"idx_sessions_recent", "sessions_names_ai"} <= objects
+            assert db.get_session_file_info("sess-1") == (10, "abc", None)
+            assert [s["id"] for s in db.get_sessions_summary()] == ["sess-1"]
+
+            db.upsert_session("sess-2", "project2")
+            assert db.get_projects() == ["project1", "project2"]
+
+    def test_migration_adds_file_mtime_column(self, test_db, tmp_path):
+        """A version 3 database should gain file_mtime_ns with its rows intact."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", file_size=10, file_hash="abc")
+            with db.get_db() as conn:
+                conn.executescript("""
+                    ALTER TABLE sessions DROP COLUMN file_mtime_ns;
+                    PRAGMA user_version = 3;
+                """)
+
+            db.init_db()
+
+            assert db.get_session_file_info("sess-1") == (10, "abc", None)
+            db.update_session_file_mtime("sess-1", 123)
+            assert db.get_session_file_info("sess-1") == (10, "abc", 123)
+
+    def test_update_session_file_mtime_replaces_hash(self, test_db, tmp_path):
+        """A new hash should replace the stored one; omitting it keeps it."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", file_size=10, file_hash="abc")
+
+            db.update_session_file_mtime("sess-1", 5, "def")
+            assert db.get_session_file_info("sess-1") == (10, "def", 5)
+            db.update_session_file_mtime("sess-1", 6)
+            assert db.get_session_file_info("sess-1") == (10, "def", 6)
+
+
+class TestExportCache:
+    """Tests for cached HTML exports."""
+
+    def test_round_trip(self, test_db, tmp_path):
+        """Saved HTML should be returned for the same count and format."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=2)
+            db.save_cached_export("sess-1", 2, 1, "<html>café</html>")
+
+            assert db.get_cached_export("sess-1", 2, 1) == "<html>café</html>"
+            assert db.get_cached_export("sess-1", 3, 1) is None
+            assert db.get_cached_export("sess-1", 2, 2) is None
+
+    def test_session_update_invalidates(self, test_db, tmp_path):
+        """Re-importing a session should drop its cached export."""
+        with patch.object(db, "DB_PATH", test_db), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.upsert_session("sess-1", "project1", message_count=2)
+            db.upsert_session("sess-2", "project1", message_count=2)
+            db.save_cached_export("sess-1", 2, 1, "<html>one</html>")
+            db.save_cached_export("sess-2", 2, 1, "<html>two</html>")
+
+            db.upsert_session("sess-1", "project1", message_count=2)
+
+            assert db.get_cached_export("sess-1", 2, 1) is None
+            assert db.get_cached_export("sess-2", 2, 1) == "<html>two</html>"
@@ -1,13 +1,25 @@
 """Tests for main module export functionality."""
 
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import httpx
+import orjson
 import pytest
+from fastapi import HTTPException
 
+from agent_session_viewer import main
 from agent_session_viewer.main import (
     sanitize_filename,
     sanitize_role_class,
     sanitize_agent_class,
     escape_html,
+    format_content_for_export,
+    format_timestamp,
     generate_export_html,
+    is_thinking_only,
 )
 
 
@@ -128,6 +140,108 @@ class TestEscapeHtml:
         assert "<tag>" not in result
 
 
+class TestFormatContentForExport:
+    """Tests for markdown-ish export formatting."""
+
+    def test_code_and_inline_code(self):
+        """Fenced and inline code should become pre/code elements."""
+        html = format_content_for_export("run `ls`\n```sh\necho <hi>\n```")
+        assert "<code>ls</code>" in html
+        assert "<pre><code>echo &lt;hi&gt;\n</code></pre>" in html
+
+    def test_thinking_and_tool_blocks(self):
+        """Thinking and tool markers should be wrapped in styled blocks."""
+        html = format_content_for_export("[Thinking]\nhmm\n[Bash: list]\n$ ls")
+        assert '<div class="thinking-block"><div class="thinking-label">Thinking</div>hmm</div>' in html
+        assert '<div class="tool-block">[Bash: list]\n$ ls</div>' in html
+
+    def test_tool_marker_inside_thinking_stays_text(self):
+        """A tool marker mid-thought should not open a tool block inside it."""
+        html = format_content_for_export("[Thinking]\nI will run [Bash: ls] now")
+        assert html == ('<div class="thinking-block"><div class="thinking-label">Thinking</div>'
+                        'I will run [Bash: ls] now</div>')
+
+    def test_code_block_contents_are_verbatim(self):
+        """Backticks and markers inside fenced code should not be formatted."""
+        html = format_content_for_export("```\nuse `x`\n[Read: y]\n```")
+        assert html == "<pre><code>use `x`\n[Read: y]\n</code></pre>"
+
+    def test_tool_block_spans_fenced_code(self):
+        """Blank lines inside fenced code should not end a tool block."""
+        html = format_content_for_export("[Bash: ls]\n```\na\n\nb\n```\nafter")
+        assert html == ('<div class="tool-block">[Bash: ls]\n'
+                        '<pre><code>a\n\nb\n</code></pre>\nafter</div>')
+
+    def test_is_thinking_only(self):
+        """Only messages made entirely of thinking blocks should match."""
+        assert is_thinking_only("[Thinking]\nhmm")
+        assert not is_thinking_only("[Thinking]\nhmm\n[Bash]\n$ ls")
+        assert not is_thinking_only("")
+
+    def test_is_thinking_only_prefix_check(self):
+        """Leading whitespace is allowed; leading text rules a message out."""
+        assert is_thinking_only("  \n[Thinking]\nhmm")
+        assert not is_thinking_only("Sure. [Thinking]\nhmm")
+
+
+class TestBuildFtsQuery:
+    """Tests for turning search input into FTS5 queries."""
+
+    @pytest.mark.parametrize("q,expected", [
+        ("parser", '"parser"*'),
+        ("parser bug", '"parser bug"*'),
+        ('"parser bug"', '"parser bug"*'),
+        ("foo-bar: (baz)", '"foo bar baz"*'),
+        ("NOT a OR b*", '"NOT a OR b"*'),
+        ("café", '"café"*'),
+    ])
+    def test_words_become_prefix_phrase(self, q, expected):
+        assert main.build_fts_query(q) == expected
+
+    @pytest.mark.parametrize("q", ["", "   ", '"', "-:()*"])
+    def test_no_words(self, q):
+        assert main.build_fts_query(q) is None
+
+    def test_search_endpoint_accepts_punctuation(self, tmp_path):
+        """Pasted punctuation should search, not fail with a MATCH syntax error."""
+        from fastapi.testclient import TestClient
+
+        from agent_session_viewer import db
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db.upsert_session(session_id="s1", project="proj", machine="local",
+                                  message_count=1)
+                db.insert_messages_batch([("s1", "m1", "user", "fix foo-bar: parsing", None)])
+                client = TestClient(main.app)
+                found = client.get("/api/search", params={"q": 'foo-bar: "pars'})
+                empty = client.get("/api/search", params={"q": "-:"})
+            finally:
+                db.close_connection()
+
+        assert found.status_code == 200
+        assert found.json()["count"] == 1
+        assert empty.status_code == 200
+        assert empty.json()["results"] == []
+
+
+class TestFormatTimestamp:
+    """Tests for export timestamp formatting."""
+
+    def test_formats_iso_timestamps(self):
+        """ISO timestamps should render as local-style date and time."""
+        assert format_timestamp("2025-01-02T03:04:05Z") == "2025-01-02 03:04:05"
+        assert format_timestamp("2025-01-02T03:04:05.123+00:00") == "2025-01-02 03:04:05"
+
+    def test_passes_through_invalid_values(self):
+        """Empty and unparseable values should not raise."""
+        assert format_timestamp("") == ""
+        assert format_timestamp(None) == ""
+        assert format_timestamp("yesterday") == "yesterday"
+
+
 class TestGenerateExportHtml:
     """Tests for HTML export generation."""
 
@@ -210,3 +324,809 @@ class TestGenerateExportHtml:
         # Should not raise
         html = generate_export_html(session, messages)
         assert isinstance(html, str)
+
+
+class TestConfig:
+    """Tests for config file persistence."""
+
+    def test_round_trip(self, tmp_path):
+        """Saved config should load back unchanged."""
+        with patch.object(main, "DATA_DIR", tmp_path), \
+             patch.object(main, "CONFIG_FILE", tmp_path / "config.json"):
+            main.save_config({"github_token": "abc", "nested": {"n": 1}})
+
+            assert main.load_config() == {"github_token": "abc", "nested": {"n": 1}}
+            assert (tmp_path / "config.json").stat().st_mode & 0o777 == 0o600
+
+    def test_invalid_json_returns_empty(self, tmp_path):
+        """A corrupt config file should be treated as empty."""
+        config_file = tmp_path / "config.json"
+        config_file.write_text("{not json")
+        with patch.object(main, "CONFIG_FILE", config_file):
+            assert main.load_config() == {}
+
+    def test_load_is_cached_until_save(self, tmp_path):
+        """The file should be parsed once, and saves should refresh the cache."""
+        config_file = tmp_path / "config.json"
+        config_file.write_text('{"github_token": "old"}')
+        with patch.object(main, "DATA_DIR", tmp_path), \
+             patch.object(main, "CONFIG_FILE", config_file):
+            assert main.get_github_token() == "old"
+            with patch.object(main.orjson, "loads") as mock_loads:
+                assert main.get_github_token() == "old"
+                mock_loads.assert_not_called()
+
+            main.load_config()["github_token"] = "mutated"
+            assert main.get_github_token() == "old"
+
+            main.set_github_token("new")
+            assert main.get_github_token() == "new"
+
+
+class TestSyncStatus:
+    """Tests for the sync status snapshot served by /api/status."""
+
+    def test_to_dict_matches_asdict(self):
+        """to_dict should return the same flat mapping asdict would."""
+        from dataclasses import asdict
+
+        status = main.SyncStatus(is_syncing=True, current_project="p", sessions_done=3)
+        assert status.to_dict() == asdict(status)
+        assert not hasattr(status, "__dict__")
+
+    def test_progress_publishes_new_snapshots(self):
+        """Readers holding a status object should never see it change."""
+        snapshots = []
+
+        def fake_sync_all(on_progress):
+            on_progress("start", projects=1)
+            on_progress("project_start", project="p", sessions=2)
+            snapshots.append(main.sync_status)
+            on_progress("session_done", messages=5)
+            on_progress("session_done", messages=5)
+            snapshots.append(main.sync_status)
+            on_progress("done")
+            return {"total_sessions": 2}
+
+        with patch.object(main.sync_module, "sync_all", fake_sync_all), \
+             patch.object(main, "sync_status", main.SyncStatus()):
+            main.run_sync()
+            final = main.sync_status
+
+        assert snapshots[0].sessions_done == 0
+        assert snapshots[0].current_project == "p"
+        assert (snapshots[1].sessions_done, snapshots[1].messages_indexed) == (2, 10)
+        assert (final.phase, final.is_syncing, final.sessions_done) == ("idle", False, 2)
+        with pytest.raises(AttributeError):
+            final.phase = "syncing"
+
+
+class TestRunSync:
+    """Tests for the sync runner's progress output."""
+
+    def test_progress_redraws_are_throttled(self, capsys):
+        """Many fast sessions should redraw the bar a few times, ending on final counts."""
+        def fake_sync_all(on_progress):
+            on_progress("start", projects=1)
+            on_progress("project_start", project="p", sessions=100)
+            for i in range(100):
+                on_progress("session_start", session=f"s{i}")
+                on_progress("session_done", messages=1)
+            on_progress("project_done", project="p")
+            on_progress("done")
+            return {"total_sessions": 100}
+
+        with patch.object(main.sync_module, "sync_all", fake_sync_all), \
+             patch.object(main, "PROGRESS_PRINT_INTERVAL", 3600):
+            main.run_sync()
+
+        redraws = capsys.readouterr().out.split("\r")[1:]
+        assert 1 <= len(redraws) <= 3
+        assert "100/100 sessions | 100 msgs" in redraws[-1]
+
+
+class TestSyncAdmission:
+    """Tests for serializing sync runs."""
+
+    @pytest.fixture(autouse=True)
+    def sync_state(self):
+        """Fresh admission state, as lifespan creates it."""
+        with patch.object(main.app.state, "sync_lock", asyncio.Condition(), create=True), \
+             patch.object(main.app.state, "sync_active", False, create=True):
+            yield
+
+    async def test_overlapping_syncs_run_one_at_a_time(self):
+        """A second sync should wait for the first instead of overlapping."""
+        active = 0
+        max_active = 0
+        guard = threading.Lock()
+
+        def fake_run_sync():
+            nonlocal active, max_active
+            with guard:
+                active += 1
+                max_active = max(max_active, active)
+            time.sleep(0.05)
+            with guard:
+                active -= 1
+            return {"total_sessions": 0}
+
+        with patch.object(main, "run_sync", fake_run_sync):
+            results = await asyncio.gather(
+                main.run_sync_exclusive(), main.run_sync_exclusive()
+            )
+
+        assert results == [{"total_sessions": 0}] * 2
+        assert max_active == 1
+        assert main.app.state.sync_active is False
+
+    async def test_periodic_ticks_skipped_while_syncing(self):
+        """Periodic ticks should be skipped, not queued, behind an active sync."""
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def fake_run_sync():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+
+        with patch.object(main, "run_sync", fake_run_sync), \
+             patch.object(main, "SYNC_INTERVAL", 0.01):
+            manual = asyncio.create_task(main.run_sync_exclusive())
+            await asyncio.to_thread(started.wait, 5)
+            periodic = asyncio.create_task(main.periodic_sync())
+            await asyncio.sleep(0.1)
+            assert len(calls) == 1
+
+            release.set()
+            await manual
+            for _ in range(100):
+                if len(calls) > 1:
+                    break
+                await asyncio.sleep(0.01)
+            periodic.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await periodic
+
+        assert len(calls) > 1
+
+    async def test_periodic_sync_survives_errors(self, capsys):
+        """A failed sync should be reported and the loop should keep running."""
+        calls = []
+
+        def failing_run_sync():
+            calls.append(1)
+            raise OSError("disk gone")
+
+        with patch.object(main, "run_sync", failing_run_sync), \
+             patch.object(main, "SYNC_INTERVAL", 0.01):
+            periodic = asyncio.create_task(main.periodic_sync())
+            for _ in range(100):
+                if len(calls) > 1:
+                    break
+                await asyncio.sleep(0.01)
+            periodic.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await periodic
+
+        assert len(calls) > 1
+        assert "Periodic sync failed: disk gone" in capsys.readouterr().out
+
+
+class TestLifespan:
+    """Tests for server startup and shutdown."""
+
+    async def test_initial_sync_does_not_block_startup(self, tmp_path):
+        """The app should start serving while the initial sync is running."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def fake_run_sync():
+            started.set()
+            release.wait(5)
+
+        with patch.object(main.db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(main.db, "DATA_DIR", tmp_path), \
+             patch.object(main, "run_sync", fake_run_sync):
+            async with main.lifespan(main.app):
+                await asyncio.to_thread(started.wait, 5)
+                assert not main.app.state.initial_sync.done()
+                release.set()
+            assert main.app.state.initial_sync.done()
+
+
+    async def test_failed_initial_sync_is_reported(self, tmp_path, capsys):
+        """A failing startup sync should be printed and leave status idle."""
+        def failing_sync_all(on_progress=None):
+            on_progress("start", projects=1)
+            raise OSError("disk gone")
+
+        with patch.object(main.db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(main.db, "DATA_DIR", tmp_path), \
+             patch.object(main.sync_module, "sync_all", failing_sync_all), \
+             patch.object(main, "sync_status", main.SyncStatus()):
+            async with main.lifespan(main.app):
+                await main.app.state.initial_sync
+                status = await main.get_status()
+
+            assert main.app.state.initial_sync.exception() is None
+
+        assert status["sync"]["is_syncing"] is False
+        assert status["sync"]["phase"] == "idle"
+        assert "Initial sync failed: disk gone" in capsys.readouterr().out
+
+    def test_restarts_on_a_new_event_loop(self, tmp_path):
+        """A second lifespan on a fresh event loop should still serialize syncs."""
+        def fake_run_sync():
+            time.sleep(0.01)
+            return {"total_sessions": 0}
+
+        async def serve():
+            async with main.lifespan(main.app):
+                return await asyncio.gather(
+                    main.run_sync_exclusive(), main.run_sync_exclusive()
+                )
+
+        with patch.object(main.db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(main.db, "DATA_DIR", tmp_path), \
+             patch.object(main, "run_sync", fake_run_sync):
+            for _ in range(2):
+                assert asyncio.run(serve()) == [{"total_sessions": 0}] * 2
+
+    async def test_opens_browser_after_startup(self, tmp_path):
+        """A browser URL set by the CLI should be opened without polling."""
+        opened = []
+
+        async def noop_sync():
+            return None
+
+        with patch.object(main.db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(main.db, "DATA_DIR", tmp_path), \
+             patch.object(main, "run_sync_exclusive", noop_sync), \
+             patch.object(main.webbrowser, "open", opened.append), \
+             patch.object(main.app.state, "browser_url", "http://127.0.0.1:8080", create=True):
+            async with main.lifespan(main.app):
+                await main.app.state.browser_task
+
+        assert opened == ["http://127.0.0.1:8080"]
+
+
+class TestRunDbRead:
+    """Tests for running read queries off the event loop."""
+
+    async def test_runs_on_read_pool(self, tmp_path):
+        """Reads should run on a db-read thread and see committed data."""
+        from agent_session_viewer import db
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db.upsert_session(session_id="s1", project="proj", machine="local",
+                                  message_count=1)
+
+                def read():
+                    return threading.current_thread().name, db.get_projects()
+
+                thread_name, projects = await main.run_db_read(read)
+            finally:
+                db.close_connection()
+
+        assert thread_name.startswith("db-read")
+        assert projects == ["proj"]
+
+
+class TestORJSONResponse:
+    """Tests for the default API response class."""
+
+    def test_renders_json_bytes(self):
+        """Responses should be compact UTF-8 JSON."""
+        response = main.ORJSONResponse({"snippet": "<mark>caf\u00e9</mark>", "count": 1})
+
+        assert response.body == '{"snippet":"<mark>caf\u00e9</mark>","count":1}'.encode()
+        assert response.media_type == "application/json"
+
+
+class TestRenderSessionExport:
+    """Tests for export caching around generate_export_html."""
+
+    def test_reuses_cached_html(self, tmp_path):
+        """A second export should not reload messages or re-render."""
+        from agent_session_viewer import db
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db.upsert_session("sess-1", "project1", message_count=1,
+                                  first_message="hello export")
+                db.insert_messages_batch([
+                    ("sess-1", "msg-1", "user", "hello export", "2025-01-01T00:00:00Z"),
+                ])
+                session = db.get_session_detail("sess-1")
+
+                first = main.render_session_export(session)
+                with patch.object(main, "generate_export_html") as mock_generate, \
+                     patch.object(db, "get_session_messages") as mock_messages:
+                    second = main.render_session_export(session)
+                    mock_generate.assert_not_called()
+                    mock_messages.assert_not_called()
+
+                assert "hello export" in first
+                assert second == first
+            finally:
+                db.close_connection()
+
+    def test_stream_matches_full_render_and_fills_cache(self, tmp_path):
+        """Streamed exports should match generate_export_html and be cached."""
+        from agent_session_viewer import db
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db.upsert_session("sess-1", "project1", message_count=3,
+                                  first_message="first")
+                db.insert_messages_batch([
+                    ("sess-1", f"msg-{i}", "user", f"message {i}", f"2025-01-01T00:00:0{i}Z")
+                    for i in range(3)
+                ])
+                session = db.get_session_detail("sess-1")
+                expected = generate_export_html(session, db.get_session_messages("sess-1"))
+
+                streamed = b"".join(main.stream_session_export(session)).decode("utf-8")
+
+                assert streamed == expected
+                assert db.get_cached_export("sess-1", 3, main.EXPORT_FORMAT_VERSION) == expected
+                assert b"".join(main.stream_session_export(session)).decode("utf-8") == expected
+            finally:
+                db.close_connection()
+
+    def test_stream_out_of_step_with_count_is_not_cached(self, tmp_path):
+        """A stream that rendered fewer messages than the count should not be cached."""
+        from agent_session_viewer import db
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db.upsert_session("sess-1", "project1", message_count=3,
+                                  first_message="first")
+                db.insert_messages_batch([
+                    ("sess-1", f"msg-{i}", "user", f"message {i}", f"2025-01-01T00:00:0{i}Z")
+                    for i in range(3)
+                ])
+                session = db.get_session_detail("sess-1")
+                truncated = db.get_session_messages("sess-1")[:2]
+
+                # As if a re-import cut the stream short without changing the count
+                with patch.object(db, "iter_session_messages", return_value=iter(truncated)):
+                    b"".join(main.stream_session_export(session))
+
+                assert db.get_cached_export("sess-1", 3, main.EXPORT_FORMAT_VERSION) is None
+            finally:
+                db.close_connection()
+
+    def test_stream_coalesces_small_chunks(self, tmp_path):
+        """Messages should be streamed in a few large pieces, not one per message."""
+        from agent_session_viewer import db
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db.upsert_session("sess-1", "project1", message_count=50,
+                                  first_message="first")
+                db.insert_messages_batch([
+                    ("sess-1", f"msg-{i}", "user", f"message {i}", "2025-01-01T00:00:00Z")
+                    for i in range(50)
+                ])
+                session = db.get_session_detail("sess-1")
+
+                with patch.object(main, "EXPORT_STREAM_CHUNK_SIZE", 4096):
+                    pieces = list(main.stream_session_export(session))
+
+                assert 1 < len(pieces) < 50
+                assert all(len(piece) >= 4096 for piece in pieces[:-1])
+                assert b"".join(pieces).decode("utf-8") == generate_export_html(
+                    session, db.get_session_messages("sess-1")
+                )
+            finally:
+                db.close_connection()
+
+    def test_export_endpoint_compresses(self, tmp_path):
+        """Exports should be gzipped, and cache hits sent as stored deflate data."""
+        from fastapi.testclient import TestClient
+
+        from agent_session_viewer import db
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db.upsert_session("sess-1", "project1", message_count=1,
+                                  first_message="first")
+                db.insert_messages_batch([
+                    ("sess-1", "msg-1", "user", "hello export", "2025-01-01T00:00:00Z"),
+                ])
+                client = TestClient(main.app)
+
+                first = client.get("/api/sessions/sess-1/export",
+                                   headers={"Accept-Encoding": "gzip"})
+                second = client.get("/api/sessions/sess-1/export",
+                                    headers={"Accept-Encoding": "gzip, deflate"})
+
+                assert first.headers["content-encoding"] == "gzip"
+                assert second.headers["content-encoding"] == "deflate"
+                assert "hello export" in first.text
+                assert second.text == first.text
+
+                refused = client.get("/api/sessions/sess-1/export",
+                                     headers={"Accept-Encoding": "gzip, deflate;q=0"})
+                assert refused.headers["content-encoding"] == "gzip"
+                assert refused.text == first.text
+            finally:
+                db.close_connection()
+
+    def test_accepts_encoding_honours_q_values(self):
+        """Accept-Encoding parsing should respect q=0 and wildcards."""
+        assert main._accepts_encoding("gzip, deflate", "deflate")
+        assert main._accepts_encoding("gzip, Deflate;q=0.5", "deflate")
+        assert not main._accepts_encoding("gzip, deflate;q=0", "deflate")
+        assert not main._accepts_encoding("gzip, deflate; q=0.0", "deflate")
+        assert not main._accepts_encoding("gzip", "deflate")
+        assert main._accepts_encoding("gzip, *", "deflate")
+        assert not main._accepts_encoding("*, deflate;q=0", "deflate")
+        assert not main._accepts_encoding("*;q=0", "deflate")
+
+
+class TestSessionChannel:
+    """Tests for sharing one session watcher across SSE clients."""
+
+    async def test_subscribers_share_one_watch_and_sync(self, tmp_path):
+        """A file change should be synced once and reach every subscriber."""
+        path = tmp_path / "sess-1.jsonl"
+        path.write_text("{}\n")
+        synced = []
+
+        def fake_sync(source_path, project_name, machine, tail):
+            synced.append(source_path)
+            return {"skipped": False}, tail
+
+        with patch.object(main.sync_module, "resolve_source_file", return_value=path), \
+             patch.object(main.sync_module, "sync_session_tail", fake_sync):
+            channel = main.get_session_channel("sess-1")
+            first, second = channel.subscribe(), channel.subscribe()
+            assert main.get_session_channel("sess-1") is channel
+            try:
+                await asyncio.sleep(0.3)  # let the watcher start
+                with path.open("a") as f:
+                    f.write("{}\n")
+
+                for queue in (first, second):
+                    message = await asyncio.wait_for(queue.get(), timeout=5)
+                    assert message == "event: session_updated\ndata: sess-1\n\n"
+                assert synced == [path]
+            finally:
+                channel.unsubscribe(first)
+                channel.unsubscribe(second)
+
+        assert channel.task is None
+        assert "sess-1" not in main._session_channels
+
+    async def test_idle_stream_sends_comment_keepalive(self):
+        """An idle stream should send SSE comments, not named events."""
+        with patch.object(main, "SSE_HEARTBEAT_INTERVAL", 0.01):
+            response = await main.event_stream()
+            stream = response.body_iterator
+            try:
+                assert await anext(stream) == ": keepalive\n\n"
+                assert await anext(stream) == ": keepalive\n\n"
+            finally:
+                await stream.aclose()
+
+        assert response.headers["cache-control"] == "no-cache"
+        assert response.headers["x-accel-buffering"] == "no"
+        assert "connection" not in response.headers
+
+    def test_pending_updates_are_coalesced(self):
+        """A slow subscriber should hold one update, then the end of stream."""
+        channel = main.SessionChannel("sess-1")
+        queue = asyncio.Queue(maxsize=main.SSE_QUEUE_SIZE)
+        channel.subscribers.add(queue)
+
+        for _ in range(5):
+            channel.publish("event: session_updated\ndata: sess-1\n\n")
+        channel.publish(None)
+
+        assert queue.qsize() == 2
+        assert queue.get_nowait() == "event: session_updated\ndata: sess-1\n\n"
+        assert queue.get_nowait() is None
+
+    def test_full_queue_drops_oldest(self):
+        """The end-of-stream marker should get through a full queue."""
+        channel = main.SessionChannel("sess-1")
+        queue = asyncio.Queue(maxsize=1)
+        channel.subscribers.add(queue)
+
+        channel.publish("update")
+        channel.publish(None)
+
+        assert queue.get_nowait() is None
+
+
+class TestStaticFiles:
+    """Tests for static asset caching headers."""
+
+    def test_cache_control(self):
+        """Fonts should be cached as immutable; other assets revalidated."""
+        from fastapi.testclient import TestClient
+
+        client = TestClient(main.app)
+        font = client.get("/static/fonts/MesloLGS-NF-Regular.ttf")
+        page = client.get("/static/index.html")
+        revalidated = client.get(
+            "/static/index.html", headers={"If-None-Match": page.headers["etag"]}
+        )
+
+        assert font.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert page.headers["cache-control"] == "no-cache"
+        assert revalidated.status_code == 304
+
+    def test_index_served_from_memory_with_etag(self, tmp_path):
+        """The SPA page should be read once and support conditional requests."""
+        from fastapi.testclient import TestClient
+
+        (tmp_path / "index.html").write_text("<html>viewer</html>")
+        with patch.object(main, "STATIC_DIR", tmp_path), \
+             patch.object(main, "_index_page_cache", None):
+            client = TestClient(main.app)
+            page = client.get("/")
+            (tmp_path / "index.html").unlink()
+            cached = client.get("/")
+            revalidated = client.get("/", headers={"If-None-Match": page.headers["etag"]})
+
+        assert page.text == "<html>viewer</html>"
+        assert page.headers["content-type"] == "text/html; charset=utf-8"
+        assert page.headers["cache-control"] == "no-cache"
+        assert cached.text == page.text
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == page.headers["etag"]
+
+
+class TestUploadSession:
+    """Tests for the session upload endpoint."""
+
+    def test_upload_stores_and_indexes(self, tmp_path):
+        """An upload should store the file and index the session and messages."""
+        from fastapi.testclient import TestClient
+
+        from agent_session_viewer import db
+
+        lines = b"".join(
+            orjson.dumps({"type": "user", "timestamp": f"2025-01-01T00:00:0{i}Z",
+                          "message": {"content": f"message {i}"}}) + b"\n"
+            for i in range(3)
+        )
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(main, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                client = TestClient(main.app)
+                response = client.post(
+                    "/api/sessions/upload",
+                    params={"project": "proj", "machine": "laptop"},
+                    files={"file": ("up-1.jsonl", lines)},
+                )
+
+                assert response.status_code == 200
+                assert response.json()["messages"] == 3
+                assert (tmp_path / "sessions" / "proj" / "up-1.jsonl").read_bytes() == lines
+                assert db.get_message_count("up-1") == 3
+                assert db.get_session_detail("up-1")["machine"] == "laptop"
+            finally:
+                db.close_connection()
+
+    def test_index_upload_commits_once(self, tmp_path):
+        """Session upsert, delete and message inserts should share one commit."""
+        from agent_session_viewer import db
+
+        session_file = tmp_path / "up-2.jsonl"
+        session_file.write_bytes(b"".join(
+            orjson.dumps({"type": "user", "message": {"content": f"m{i}"}}) + b"\n"
+            for i in range(50)
+        ))
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                statements = []
+                db._thread_connection().set_trace_callback(statements.append)
+                assert main.index_upload(session_file, "up-2", "proj", "laptop") == 50
+                db._thread_connection().set_trace_callback(None)
+
+                assert statements.count("BEGIN IMMEDIATE") == 1
+                assert statements.count("COMMIT") == 1
+                assert db.get_message_count("up-2") == 50
+            finally:
+                db.close_connection()
+
+    def test_save_upload_copies_in_chunks(self, tmp_path):
+        """Uploads larger than a chunk should be copied intact from the start."""
+        import io
+
+        data = bytes(range(256)) * 10
+        src = io.BytesIO(data)
+        src.seek(100)  # already read from, e.g. by content sniffing
+        with patch.object(main, "UPLOAD_CHUNK_SIZE", 64):
+            main.save_upload(src, tmp_path / "out.jsonl")
+
+        assert (tmp_path / "out.jsonl").read_bytes() == data
+
+    def test_save_upload_failure_keeps_existing_file(self, tmp_path):
+        """A failed copy should leave the previous upload and no temp file."""
+        class FailingReader:
+            def seek(self, pos):
+                pass
+
+            def read(self, size=-1):
+                raise OSError("connection reset")
+
+        target = tmp_path / "out.jsonl"
+        target.write_bytes(b"old\n")
+        with pytest.raises(OSError):
+            main.save_upload(FailingReader(), target)
+
+        assert target.read_bytes() == b"old\n"
+        assert list(tmp_path.iterdir()) == [target]
+
+
+def mock_github_client(handler):
+    """Build a GitHub client whose requests are answered by `handler`."""
+    return httpx.AsyncClient(
+        base_url=main.GITHUB_API_URL,
+        transport=httpx.MockTransport(handler),
+    )
+
+
+class TestGithubApi:
+    """Tests for the GitHub API helpers."""
+
+    async def test_get_user(self):
+        """A valid token should return the decoded user payload."""
+        def handler(request):
+            assert request.url.path == "/user"
+            assert request.headers["Authorization"] == "token tok"
+            return httpx.Response(200, json={"login": "octocat"})
+
+        with patch.object(main, "_github_client", mock_github_client(handler)):
+            assert await main.get_github_user("tok") == {"login": "octocat"}
+
+    async def test_invalid_token(self):
+        """A 401 from GitHub should surface as a 401 HTTPException."""
+        with patch.object(main, "_github_client", mock_github_client(lambda r: httpx.Response(401))):
+            with pytest.raises(HTTPException) as exc_info:
+                await main.get_github_user("bad")
+        assert exc_info.value.status_code == 401
+
+    async def test_create_gist(self):
+        """Gist payloads should carry the file content and return the response."""
+        def handler(request):
+            payload = orjson.loads(request.content)
+            assert request.method == "POST"
+            assert payload["files"] == {"s.html": {"content": "<html></html>"}}
+            return httpx.Response(201, json={"id": "abc"})
+
+        with patch.object(main, "_github_client", mock_github_client(handler)):
+            result = await main.create_github_gist("<html></html>", "s.html", "desc", "tok")
+        assert result == {"id": "abc"}
+
+    async def test_connection_error(self):
+        """Network failures should surface as a 502."""
+        def handler(request):
+            raise httpx.ConnectError("unreachable")
+
+        with patch.object(main, "_github_client", mock_github_client(handler)):
+            with pytest.raises(HTTPException) as exc_info:
+                await main.create_github_gist("x", "s.html", "desc", "tok")
+        assert exc_info.value.status_code == 502
+
+
+class TestWatchFileChanges:
+    """Tests for the SSE file change watcher."""
+
+    async def test_yields_on_write(self, tmp_path):
+        """Appending to the watched file should wake the watcher."""
+        path = tmp_path / "session.jsonl"
+        path.write_text("{}\n")
+
+        changes = main.watch_file_changes(path)
+        waiter = asyncio.ensure_future(anext(changes))
+        await asyncio.sleep(0.3)  # let the watcher start
+        with path.open("a") as f:
+            f.write("{}\n")
+        try:
+            await asyncio.wait_for(waiter, timeout=5)
+        finally:
+            await changes.aclose()
+
+    async def test_burst_of_writes_yields_once(self, tmp_path):
+        """Writes closer together than the quiet period should coalesce."""
+        path = tmp_path / "session.jsonl"
+        path.write_text("{}\n")
+
+        changes = main.watch_file_changes(path)
+        waiter = asyncio.ensure_future(anext(changes))
+        await asyncio.sleep(0.3)  # let the watcher start
+        try:
+            for _ in range(5):
+                with path.open("a") as f:
+                    f.write("{}\n")
+                await asyncio.sleep(0.05)
+            await asyncio.wait_for(waiter, timeout=5)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(anext(changes), timeout=main.SSE_QUIET_MS / 1000 * 2)
+        finally:
+            await changes.aclose()
+
+    async def test_polls_without_watchfiles(self, tmp_path):
+        """Without watchfiles the watcher should fall back to polling."""
+        path = tmp_path / "session.jsonl"
+        path.write_text("{}\n")
+
+        with patch.object(main, "awatch", None), patch.object(main, "SSE_POLL_INTERVAL", 0.01):
+            changes = main.watch_file_changes(path)
+            try:
+                await asyncio.wait_for(anext(changes), timeout=1)
+            finally:
+                await changes.aclose()
+
+
+class TestServerOptions:
+    """Tests for uvicorn loop/parser selection."""
+
+    def test_prefers_uvloop_and_httptools(self):
+        """Installed accelerators should be selected."""
+        assert main.server_options() == {"loop": "uvloop", "http": "httptools"}
+
+    def test_falls_back_when_missing(self):
+        """Missing accelerators (e.g. uvloop on Windows) use the defaults."""
+        with patch.dict("sys.modules", {"uvloop": None, "httptools": None}):
+            assert main.server_options() == {"loop": "asyncio", "http": "h11"}
+
+
+class TestFindAvailablePort:
+    """Tests for choosing the server port."""
+
+    def test_free_port_is_used_as_is(self):
+        """The requested port should be kept when it is free."""
+        with patch.object(main, "_port_is_free", return_value=True):
+            assert main.find_available_port(8080) == 8080
+
+    def test_taken_default_port_lets_kernel_pick(self):
+        """Without an explicit port, fall back to a kernel-assigned port."""
+        import socket
+
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as held:
+            held.bind(("", 0))
+            held.listen()
+            taken = held.getsockname()[1]
+            port = main.find_available_port(taken)
+
+        assert port != taken
+        assert port > 0
+
+    def test_explicit_port_scans_upward(self):
+        """An explicit port should fall back to the next free one."""
+        with patch.object(main, "_port_is_free", side_effect=lambda p: p >= 9003):
+            assert main.find_available_port(9000, scan=True) == 9003
+
+    def test_scan_is_bounded(self):
+        """The upward scan should stop after PORT_SCAN_LIMIT ports."""
+        with patch.object(main, "_port_is_free", return_value=False) as mock_free, \
+             pytest.raises(OSError, match="No free port in 9000-9063"):
+            main.find_available_port(9000, scan=True)
+
+        assert mock_free.call_count == main.PORT_SCAN_LIMIT
@@ -2,6 +2,7 @@
 
 import json
 import tempfile
+from datetime import datetime, timezone
 from pathlib import Path
 from unittest.mock import patch
 
@@ -54,6 +55,13 @@ class TestGetProjectName:
         """Should normalize hyphens to underscores."""
         assert get_project_name(Path("-Users-alice-code-my-cool-app")) == "my_cool_app"
 
+    def test_cached_by_directory_name(self):
+        """Directories with the same name should share one cached result."""
+        sync._project_name_from_dir_name.cache_clear()
+        assert get_project_name(Path("/a/-Users-alice-code-app")) == "app"
+        assert get_project_name(Path("/b/-Users-alice-code-app")) == "app"
+        assert sync._project_name_from_dir_name.cache_info().hits == 1
+
 
 class TestFindSourceFile:
     """Tests for find_source_file path validation."""
@@ -123,6 +131,19 @@ class TestFindSourceFile:
             assert sync.find_source_file("test$(ls)") is None
             assert sync.find_source_file("test\x00null") is None
 
+    def test_symlink_outside_project_blocked(self, tmp_path):
+        """A session file symlinked to outside its project should not be returned."""
+        projects_dir = tmp_path / "projects"
+        project_dir = projects_dir / "test-project"
+        project_dir.mkdir(parents=True)
+        (projects_dir / "stray.txt").write_text("")
+        outside = tmp_path / "secret.jsonl"
+        outside.write_text("{}")
+        (project_dir / "abc123.jsonl").symlink_to(outside)
+
+        with patch.object(sync, "CLAUDE_PROJECTS_DIR", projects_dir):
+            assert sync.find_source_file("abc123") is None
+
     def test_nonexistent_session(self, tmp_path):
         """Non-existent session should return None."""
         project_dir = tmp_path / "test-project"
@@ -141,6 +162,91 @@ class TestFindSourceFile:
             assert result is None
 
 
+class TestFindMatchingProjects:
+    """Tests for listing Claude project directories."""
+
+    def test_lists_directories_only(self, tmp_path):
+        """Files and non-matching names should be left out, in sorted order."""
+        for name in ["-code-beta", "-code-alpha", "-other-gamma"]:
+            (tmp_path / name).mkdir()
+        (tmp_path / "-code-file.jsonl").write_text("{}")
+        (tmp_path / "-code-link").symlink_to(tmp_path / "-code-alpha")
+
+        with patch.object(sync, "CLAUDE_PROJECTS_DIR", tmp_path), \
+             patch.object(sync, "PROJECT_PATTERNS", ["-code-*"]):
+            projects = sync.find_matching_projects()
+
+        assert [p.name for p in projects] == ["-code-alpha", "-code-beta", "-code-link"]
+
+    @pytest.mark.parametrize("patterns,expected", [
+        (["*"], ["-Code-App", "-code-lib", "-other"]),
+        (["-CODE-*", "*other"], ["-Code-App", "-code-lib", "-other"]),
+        (["-code-a?p"], ["-Code-App"]),
+        (["[!-]*"], []),
+        ([], []),
+    ])
+    def test_patterns_match_case_insensitively(self, tmp_path, patterns, expected):
+        """Any pattern may match, ignoring case on both sides."""
+        for name in ["-Code-App", "-code-lib", "-other"]:
+            (tmp_path / name).mkdir()
+
+        with patch.object(sync, "CLAUDE_PROJECTS_DIR", tmp_path), \
+             patch.object(sync, "PROJECT_PATTERNS", patterns):
+            assert [p.name for p in sync.find_matching_projects()] == expected
+
+    def test_missing_projects_dir(self, tmp_path):
+        """A missing projects directory should yield no projects."""
+        with patch.object(sync, "CLAUDE_PROJECTS_DIR", tmp_path / "missing"):
+            assert sync.find_matching_projects() == []
+
+
+class TestResolveSourceFile:
+    """Tests for the cached source file lookup used by live updates."""
+
+    def test_found_path_is_reused_while_it_exists(self, tmp_path):
+        """Hits should skip the directory scan until the file disappears."""
+        project_dir = tmp_path / "test-project"
+        project_dir.mkdir()
+        session_file = project_dir / "abc123.jsonl"
+        session_file.write_text("{}")
+
+        with patch.object(sync, "CLAUDE_PROJECTS_DIR", tmp_path), \
+             patch.object(sync, "_source_file_cache", {}), \
+             patch.object(sync, "find_source_file", wraps=sync.find_source_file) as mock_find:
+            assert sync.resolve_source_file("abc123") == session_file
+            assert sync.resolve_source_file("abc123") == session_file
+            assert mock_find.call_count == 1
+
+            session_file.unlink()
+            assert sync.resolve_source_file("abc123") is None
+            assert mock_find.call_count == 2
+
+    def test_misses_back_off(self, tmp_path):
+        """Repeated misses should be cached for exponentially longer."""
+        now = [1000.0]
+        with patch.object(sync, "CLAUDE_PROJECTS_DIR", tmp_path), \
+             patch.object(sync, "_source_file_cache", {}), \
+             patch.object(sync.time, "monotonic", lambda: now[0]), \
+             patch.object(sync, "find_source_file", return_value=None) as mock_find:
+            scans = []
+            for _ in range(80):
+                sync.resolve_source_file("gone")
+                scans.append(mock_find.call_count)
+                now[0] += 1
+
+            # Scans at t=0, 5, 15, 35, 75: gaps of 5, 10, 20, 40 seconds
+            assert [t for t in range(80) if t == 0 or scans[t] > scans[t - 1]] == [0, 5, 15, 35, 75]
+
+    def test_forget_forces_a_new_lookup(self, tmp_path):
+        """forget_source_file should drop a cached miss."""
+        with patch.object(sync, "_source_file_cache", {}), \
+             patch.object(sync, "find_source_file", return_value=None) as mock_find:
+            sync.resolve_source_file("gone")
+            sync.forget_source_file("gone")
+            sync.resolve_source_file("gone")
+            assert mock_find.call_count == 2
+
+
 class TestFindCodexSourceFile:
     """Tests for Codex source file lookup with UUID extraction."""
 
@@ -227,6 +333,41 @@ class TestFindCodexSourceFile:
             result = sync.find_source_file("codex:019b9da7-1f41-7af2-80d9-6e293902fea8")
             assert result == session_file
 
+    def test_find_codex_sessions_walks_numbered_dirs(self, tmp_path):
+        """Only {year}/{month}/{day} directories should be searched, in sorted order."""
+        later = self._create_codex_structure(tmp_path, "rollout-b.jsonl")
+        earlier = tmp_path / "2025" / "12" / "31" / "rollout-a.jsonl"
+        earlier.parent.mkdir(parents=True)
+        earlier.write_text("{}")
+        (tmp_path / "2026" / "01" / "08" / "notes.txt").write_text("")
+        (tmp_path / "archive" / "01" / "01").mkdir(parents=True)
+        (tmp_path / "archive" / "01" / "01" / "rollout-c.jsonl").write_text("{}")
+        (tmp_path / "2026" / "02").write_text("not a directory")
+
+        with patch.object(sync, "CODEX_SESSIONS_DIR", tmp_path):
+            assert sync.find_codex_sessions() == [earlier, later]
+
+    def test_lookups_use_index_from_last_scan(self, tmp_path):
+        """Indexed sessions should be found without a scan; moved files trigger one."""
+        session_file = self._create_codex_structure(
+            tmp_path,
+            "rollout-2026-01-08T06-48-54-019b9da7-1f41-7af2-80d9-6e293902fea8.jsonl"
+        )
+        session_id = "019b9da7-1f41-7af2-80d9-6e293902fea8"
+
+        with patch.object(sync, "CODEX_SESSIONS_DIR", tmp_path):
+            assert sync.find_codex_sessions() == [session_file]
+            with patch.object(sync, "find_codex_sessions",
+                              wraps=sync.find_codex_sessions) as mock_scan:
+                assert sync._find_codex_source_file(session_id) == session_file
+                mock_scan.assert_not_called()
+
+                moved = tmp_path / "2026" / "01" / "09"
+                moved.mkdir()
+                session_file = session_file.rename(moved / session_file.name)
+                assert sync._find_codex_source_file(session_id) == session_file
+                assert mock_scan.call_count == 1
+
     def test_nonexistent_codex_dir(self, tmp_path):
         """Non-existent Codex directory should return None."""
         nonexistent = tmp_path / "nonexistent"
@@ -291,6 +432,283 @@ class TestCodexExecFiltering:
         assert metadata is not None
         assert metadata.session_id == "codex:test-id"
 
+    @pytest.mark.parametrize("content,expected", [
+        ('{"timestamp":"2025-01-01T00:00:00Z","type":"session_meta",'
+         '"payload":{"id":"test-id","cwd":"/home/u/code/app","originator":"codex_cli_rs"}}\n',
+         ("codex:test-id", "app")),
+        ('{"timestamp":"2025-01-01T00:00:00Z","type":"response_item","payload":{}}\n'
+         '{"type":"session_meta","payload":{"id":"test-id","cwd":"/test","originator":"codex_exec"}}\n',
+         None),
+        ('not json\n', ("codex:rollout", "unknown")),
+    ])
+    def test_read_codex_session_header(self, tmp_path, content, expected):
+        """The header should agree with a full parse on id, project and exec filtering."""
+        from agent_session_viewer.parser import parse_codex_session, read_codex_session_header
+
+        session_file = tmp_path / "rollout.jsonl"
+        session_file.write_text(content)
+
+        assert read_codex_session_header(session_file) == expected
+        metadata, _ = parse_codex_session(session_file)
+        assert expected == (metadata and (metadata.session_id, metadata.project))
+
+    def test_unchanged_codex_session_is_not_parsed(self, tmp_path):
+        """A re-sync should read only the header of an unchanged Codex session."""
+        from agent_session_viewer import db
+
+        session_file = tmp_path / "rollout.jsonl"
+        session_file.write_text(
+            '{"timestamp":"2025-01-01T00:00:00Z","type":"session_meta",'
+            '"payload":{"id":"cx","cwd":"/home/u/code/app"}}\n'
+            '{"timestamp":"2025-01-01T00:00:01Z","type":"response_item",'
+            '"payload":{"type":"message","role":"user","content":[{"type":"input_text","text":"hi"}]}}\n'
+        )
+
+        with patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                first = sync.sync_codex_session(session_file)
+                with patch.object(sync, "parse_codex_session_lines") as mock_parse:
+                    again = sync.sync_codex_session(session_file)
+
+                assert (first["session_id"], first["messages"]) == ("codex:cx", 1)
+                assert (sync.SESSIONS_DIR / "codex_app" / "codex:cx.jsonl").read_bytes() == \
+                    session_file.read_bytes()
+                assert again["skipped"] is True
+                mock_parse.assert_not_called()
+                assert db.get_message_count("codex:cx") == 1
+            finally:
+                db.close_connection()
+
+
+class TestParseSession:
+    """Tests for Claude Code session parsing."""
+
+    @pytest.mark.parametrize("value,expected", [
+        ("2025-01-01T12:30:00Z", datetime(2025, 1, 1, 12, 30, tzinfo=timezone.utc)),
+        ("2025-01-01T12:30:00.250Z", datetime(2025, 1, 1, 12, 30, 0, 250000, tzinfo=timezone.utc)),
+        ("2025-01-01T12:30:00+00:00", datetime(2025, 1, 1, 12, 30, tzinfo=timezone.utc)),
+        ("2025-01-01T12:30:00", datetime(2025, 1, 1, 12, 30)),
+        ("not a timestamp", None),
+        ("", None),
+        (None, None),
+        (1735734600, None),
+    ])
+    def test_parse_timestamp(self, value, expected):
+        from agent_session_viewer.parser import parse_timestamp
+
+        assert parse_timestamp(value) == expected
+
+    @pytest.mark.parametrize("value", ["2025-01-01T12:30:00Z", "2025-01-01T12:30:00.250Z"])
+    def test_parse_timestamp_z_without_native_support(self, value):
+        """The Python 3.10 path should rewrite a trailing Z as an offset."""
+        from agent_session_viewer import parser
+
+        expected = parser.parse_timestamp(value)
+        with patch.object(parser, "_FROMISOFORMAT_PARSES_Z", False):
+            assert parser.parse_timestamp(value) == expected
+
+    def test_make_msg_id(self):
+        """Message IDs are stored, so their format must stay stable."""
+        from agent_session_viewer.parser import make_msg_id
+
+        assert make_msg_id("2025-01-01T12:34:56.789Z") == "msg-2025-01-01T12-34-56-789Z"
+
+    @pytest.mark.parametrize("content,expected", [
+        ("  hello\nworld  ", "hello world"),
+        ("a" * 300, "a" * 300),
+        ("a" * 299 + "\n" + "b" * 5000, "a" * 299 + "..."),
+    ])
+    def test_summarize_first_message(self, content, expected):
+        from agent_session_viewer.parser import _summarize_first_message
+
+        assert _summarize_first_message(content) == expected
+
+    def test_entries_missing_nested_keys(self, tmp_path):
+        """Entries without message or payload dicts parse against a shared default."""
+        from agent_session_viewer import parser
+
+        claude_file = tmp_path / "sess.jsonl"
+        claude_file.write_text(
+            '{"type":"user","timestamp":"2025-01-01T00:00:00Z"}\n'
+            '{"snapshot":{},"type":"file-history-snapshot"}\n'
+            '{"type":"assistant","timestamp":"2025-01-01T00:00:01Z","message":{}}\n'
+            '{"type":"user","timestamp":"2025-01-01T00:00:02Z","message":{"content":"hi"}}\n'
+        )
+        codex_file = tmp_path / "rollout.jsonl"
+        codex_file.write_text(
+            '{"timestamp":"2025-01-01T00:00:00Z","type":"session_meta",'
+            '"payload":{"id":"cx","cwd":"/home/u/code/app"}}\n'
+            '{"type":"response_item"}\n'
+        )
+
+        metadata, messages = parser.parse_session(claude_file, "proj")
+        assert [m.content for m in messages] == ["hi"]
+        assert metadata.started_at == "2025-01-01T00:00:00+00:00"
+        assert parser.parse_codex_session(codex_file)[1] == []
+        assert parser._EMPTY_DICT == {}
+
+    def test_invalid_utf8_line_is_skipped(self, tmp_path):
+        """A corrupt line should be dropped without losing the rest of the file."""
+        from agent_session_viewer.parser import parse_session
+
+        session_file = tmp_path / "sess.jsonl"
+        session_file.write_bytes(
+            b'{"type":"user","timestamp":"2025-01-01T00:00:00Z","message":{"content":"first"}}\n'
+            b'{"type":"user","message":{"content":"bad \xff byte"}}\n'
+            b'not json\n'
+            b'{"type":"user","timestamp":"2025-01-01T00:00:01Z","message":{"content":"caf\xc3\xa9"}}\n'
+        )
+
+        metadata, messages = parse_session(session_file, "proj")
+        assert [m.content for m in messages] == ["first", "café"]
+        assert metadata.message_count == 2
+
+    def test_bookkeeping_lines_count_toward_time_range(self, tmp_path):
+        """Lines skipped without decoding should still set started/ended."""
+        from agent_session_viewer.parser import parse_session
+
+        session_file = tmp_path / "sess.jsonl"
+        session_file.write_bytes(
+            b'{"type":"file-history-snapshot","messageId":"m","snapshot":'
+            b'{"trackedFileBackups":{},"timestamp":"2025-01-01T00:00:00Z"}}\n'
+            b'{"type": "user","timestamp":"2025-01-01T00:00:01Z","message":{"content":"spaced"}}\n'
+            b'{"parentUuid":null,"type":"assistant","timestamp":"2025-01-01T00:00:02Z",'
+            b'"message":{"content":[{"type":"text","text":"reply"}]}}\n'
+            b'{"type":"last-prompt","timestamp":"2025-01-01T00:00:03Z"}\n'
+        )
+
+        metadata, messages = parse_session(session_file, "proj")
+        assert [m.content for m in messages] == ["spaced", "reply"]
+        assert metadata.started_at == "2025-01-01T00:00:00+00:00"
+        assert metadata.ended_at == "2025-01-01T00:00:03+00:00"
+
+    def test_iter_session_messages_streams(self):
+        """Messages should be yielded as lines are read, with metadata in the state."""
+        from agent_session_viewer.parser import ParseState, iter_session_messages
+
+        lines_read = []
+
+        def lines():
+            for i in range(3):
+                lines_read.append(i)
+                yield json.dumps({"type": "user", "timestamp": f"2025-01-01T00:00:0{i}Z",
+                                  "message": {"content": f"message {i}"}})
+
+        state = ParseState()
+        messages = iter_session_messages(lines(), state)
+        assert next(messages).content == "message 0"
+        assert lines_read == [0]
+
+        assert [m.content for m in messages] == ["message 1", "message 2"]
+        metadata = state.metadata("sess", "proj")
+        assert metadata.message_count == 3
+        assert metadata.first_message == "message 0"
+        assert metadata.ended_at == "2025-01-01T00:00:02+00:00"
+
+    def test_codex_event_lines_count_toward_time_range(self, tmp_path):
+        """Codex lines other than metadata and messages are not decoded."""
+        from agent_session_viewer.parser import parse_codex_session
+
+        session_file = tmp_path / "rollout.jsonl"
+        session_file.write_text(
+            '{"timestamp":"2025-01-01T00:00:00Z","type":"session_meta",'
+            '"payload":{"id":"cx","cwd":"/home/u/code/app","originator":"codex_cli_rs"}}\n'
+            '{"timestamp":"2025-01-01T00:00:01Z","type":"response_item",'
+            '"payload":{"role":"user","content":[{"type":"input_text","text":"hi"}]}}\n'
+            '{"timestamp":"2025-01-01T00:00:05Z","type":"event_msg","payload":{"type":"token_count"}}\n'
+        )
+
+        metadata, messages = parse_codex_session(session_file)
+        assert [m.content for m in messages] == ["hi"]
+        assert metadata.ended_at == "2025-01-01T00:00:05+00:00"
+
+    @pytest.mark.parametrize("payload,expected", [
+        ({"role": "assistant", "content": [
+            {"type": "output_text", "text": "a"}, "junk", {"type": "image"},
+            {"type": "text", "text": ""}, {"type": "input_text", "text": "b"}]},
+         ("assistant", "a\nb")),
+        ({"role": "developer", "content": [{"type": "input_text", "text": "x"}]}, None),
+        ({"role": "user", "content": None}, None),
+        ({"role": "user", "content": [{"type": "input_text", "text": "<INSTRUCTIONS>x"}]}, None),
+        ({"role": "user", "content": [{"type": "input_text", "text": "# AGENTS"},
+                                      {"type": "input_text", "text": ".md"}]},
+         ("user", "# AGENTS\n.md")),
+        ({"role": "user", "content": [{"type": "input_text", "text": "<environment_context>"},
+                                      {"type": "input_text", "text": "real question"}]}, None),
+        ({"role": "assistant", "content": [{"type": "output_text", "text": "<INSTRUCTIONS>"}]},
+         ("assistant", "<INSTRUCTIONS>")),
+    ])
+    def test_extract_codex_response_item(self, payload, expected):
+        """Only text blocks of user/assistant messages should be extracted."""
+        from agent_session_viewer.parser import _extract_codex_response_item
+
+        assert _extract_codex_response_item(payload) == expected
+
+    def test_codex_tool_items_skipped_by_payload_type(self, tmp_path):
+        """Non-message response items should be skipped but keep the time range."""
+        from agent_session_viewer import parser
+
+        session_file = tmp_path / "rollout.jsonl"
+        session_file.write_text(
+            '{"timestamp":"2025-01-01T00:00:00Z","type":"session_meta",'
+            '"payload":{"id":"cx","cwd":"/home/u/code/app","originator":"codex_cli_rs"}}\n'
+            '{"timestamp":"2025-01-01T00:00:01Z","type":"response_item",'
+            '"payload":{"type":"message","role":"user","content":[{"type":"input_text","text":"hi"}]}}\n'
+            '{"timestamp":"2025-01-01T00:00:02Z","type":"response_item",'
+            '"payload":{"role":"assistant","content":[{"type":"output_text","text":"unordered"}]}}\n'
+            '{"timestamp":"2025-01-01T00:00:03Z","type":"response_item",'
+            '"payload":{"type":"function_call_output","call_id":"c","output":"ok"}}\n'
+        )
+
+        with patch.object(parser, "_extract_codex_response_item",
+                          wraps=parser._extract_codex_response_item) as mock_extract:
+            metadata, messages = parser.parse_codex_session(session_file)
+
+        assert [m.content for m in messages] == ["hi", "unordered"]
+        assert mock_extract.call_count == 2
+        assert metadata.ended_at == "2025-01-01T00:00:03+00:00"
+
+
+class TestFormatToolUse:
+    """Tests for tool_use block display text."""
+
+    @pytest.mark.parametrize("name,tool_input,expected", [
+        ("AskUserQuestion",
+         {"questions": [{"question": "Which?", "options": [{"label": "A", "description": "first"}]}]},
+         "[Question: AskUserQuestion]\n  Which?\n    - A: first"),
+        ("TodoWrite",
+         {"todos": [{"status": "completed", "content": "done"},
+                    {"status": "in_progress", "content": "doing"},
+                    {"content": "later"}, {"status": "odd", "content": "?"}]},
+         "[Todo List]\n  ✓ done\n  → doing\n  ○ later\n  ○ ?"),
+        ("EnterPlanMode", {}, "[Entering Plan Mode]"),
+        ("ExitPlanMode", {"plan": "x"}, "[Exiting Plan Mode]"),
+        ("Read", {"file_path": "/a.py"}, "[Read: /a.py]"),
+        ("Read", {}, "[Read: unknown]"),
+        ("Glob", {"pattern": "*.py", "path": "src"}, "[Glob: *.py in src]"),
+        ("Glob", {"pattern": "*.py"}, "[Glob: *.py in .]"),
+        ("Grep", {"pattern": "TODO"}, "[Grep: TODO]"),
+        ("Edit", {"file_path": "/a.py"}, "[Edit: /a.py]"),
+        ("Write", {}, "[Write: unknown]"),
+        ("Bash", {"command": "ls", "description": "List"}, "[Bash: List]\n$ ls"),
+        ("Bash", {"command": "ls"}, "[Bash]\n$ ls"),
+        ("Task", {"description": "Look", "subagent_type": "explore"}, "[Task: Look (explore)]"),
+        ("WebFetch", {"url": "https://example.com"}, "[Tool: WebFetch]"),
+    ])
+    def test_format(self, name, tool_input, expected):
+        from agent_session_viewer.parser import format_tool_use
+
+        assert format_tool_use({"type": "tool_use", "name": name, "input": tool_input}) == expected
+
+    def test_missing_name_and_input(self):
+        from agent_session_viewer.parser import format_tool_use
+
+        assert format_tool_use({"type": "tool_use"}) == "[Tool: unknown]"
+        assert format_tool_use({"name": "Read"}) == "[Read: unknown]"
+
 
 class TestCwdExtraction:
     """Tests for extracting project names from cwd field."""
@@ -331,6 +749,18 @@ class TestCwdExtraction:
         cwd = extract_cwd_from_session(session_file)
         assert cwd is None
 
+    def test_extract_cwd_skips_bookkeeping_and_message_text(self, tmp_path):
+        """A cwd on bookkeeping entries, or only in message text, should be ignored."""
+        session_file = tmp_path / "test.jsonl"
+        session_file.write_text(
+            '{"type":"file-history-snapshot","cwd":"/snapshot","snapshot":{}}\n'
+            + json.dumps({"type": "assistant", "cwd": "/assistant"}) + "\n"
+            + json.dumps({"type": "user", "message": {"content": 'set "cwd": "/text"'}}) + "\n"
+            + json.dumps({"cwd": "/Users/user/code/app", "type": "user"}) + "\n"
+        )
+
+        assert extract_cwd_from_session(session_file) == "/Users/user/code/app"
+
     def test_extract_cwd_from_session_uses_first_cwd(self, tmp_path):
         """Should use the first cwd found."""
         session_file = tmp_path / "test.jsonl"
@@ -414,6 +844,15 @@ class TestCwdExtraction:
         # Just verify it doesn't crash - result may vary by platform
         assert isinstance(result, str)
 
+    def test_extract_project_from_cwd_cached_by_path(self):
+        """Repeated cwds should be answered from the cache, whatever their type."""
+        from agent_session_viewer import parser
+
+        parser._project_from_cwd.cache_clear()
+        assert extract_project_from_cwd("/Users/user/code/my-app") == "my_app"
+        assert extract_project_from_cwd(Path("/Users/user/code/my-app")) == "my_app"
+        assert parser._project_from_cwd.cache_info().hits == 1
+
 
 class TestGetProjectNameFallback:
     """Tests for get_project_name fallback behavior."""
@@ -464,16 +903,19 @@ class TestReparseBehavior:
         # Mock db functions and CLAUDE_PROJECTS_DIR
         with patch.object(sync_module, "CLAUDE_PROJECTS_DIR", tmp_path), \
              patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
-             patch.object(db, "get_session_file_info") as mock_file_info, \
-             patch.object(db, "get_session") as mock_get_session, \
+             patch.object(db, "get_session_import_state") as mock_state, \
              patch.object(db, "upsert_session") as mock_upsert, \
-             patch.object(db, "delete_session_messages"), \
-             patch.object(db, "insert_messages_batch"):
+             patch.object(db, "replace_session_messages"), \
+             patch.object(db, "transaction"):
 
             # Simulate: file hash matches but stored project is bad
             file_hash = sync_module.compute_file_hash(session_file)
-            mock_file_info.return_value = (session_file.stat().st_size, file_hash)
-            mock_get_session.return_value = {"project": "_Users_alice_code_my_app"}
+            mock_state.return_value = {
+                "file_size": session_file.stat().st_size,
+                "file_hash": file_hash,
+                "project": "_Users_alice_code_my_app",
+                "message_count": 1,
+            }
 
             result = sync_module.sync_session_file(
                 session_file, "_Users_alice_code_my_app", "local"
@@ -503,15 +945,18 @@ class TestReparseBehavior:
 
         with patch.object(sync_module, "CLAUDE_PROJECTS_DIR", tmp_path), \
              patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
-             patch.object(db, "get_session_file_info") as mock_file_info, \
-             patch.object(db, "get_session") as mock_get_session, \
+             patch.object(db, "get_session_import_state") as mock_state, \
              patch.object(db, "upsert_session") as mock_upsert, \
-             patch.object(db, "delete_session_messages"), \
-             patch.object(db, "insert_messages_batch"):
+             patch.object(db, "replace_session_messages"), \
+             patch.object(db, "transaction"):
 
             file_hash = sync_module.compute_file_hash(session_file)
-            mock_file_info.return_value = (session_file.stat().st_size, file_hash)
-            mock_get_session.return_value = {"project": "_tmp_my_app"}
+            mock_state.return_value = {
+                "file_size": session_file.stat().st_size,
+                "file_hash": file_hash,
+                "project": "_tmp_my_app",
+                "message_count": 1,
+            }
 
             result = sync_module.sync_session_file(
                 session_file, "_tmp_my_app", "local"
@@ -534,15 +979,18 @@ class TestReparseBehavior:
 
         with patch.object(sync_module, "CLAUDE_PROJECTS_DIR", tmp_path), \
              patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
-             patch.object(db, "get_session_file_info") as mock_file_info, \
-             patch.object(db, "get_session") as mock_get_session, \
+             patch.object(db, "get_session_import_state") as mock_state, \
              patch.object(db, "upsert_session") as mock_upsert, \
-             patch.object(db, "delete_session_messages"), \
-             patch.object(db, "insert_messages_batch"):
+             patch.object(db, "replace_session_messages"), \
+             patch.object(db, "transaction"):
 
             file_hash = sync_module.compute_file_hash(session_file)
-            mock_file_info.return_value = (session_file.stat().st_size, file_hash)
-            mock_get_session.return_value = {"project": "_var_tmp_my_app"}
+            mock_state.return_value = {
+                "file_size": session_file.stat().st_size,
+                "file_hash": file_hash,
+                "project": "_var_tmp_my_app",
+                "message_count": 1,
+            }
 
             result = sync_module.sync_session_file(
                 session_file, "_var_tmp_my_app", "local"
@@ -562,14 +1010,707 @@ class TestReparseBehavior:
         session_file.write_text('{"type": "user", "message": {"content": "hello"}}\n')
 
         with patch.object(sync_module, "CLAUDE_PROJECTS_DIR", tmp_path), \
-             patch.object(db, "get_session_file_info") as mock_file_info, \
-             patch.object(db, "get_session") as mock_get_session:
+             patch.object(db, "get_session_import_state") as mock_state:
 
             file_hash = sync_module.compute_file_hash(session_file)
-            mock_file_info.return_value = (session_file.stat().st_size, file_hash)
-            mock_get_session.return_value = {"project": "my_app"}
+            mock_state.return_value = {
+                "file_size": session_file.stat().st_size,
+                "file_hash": file_hash,
+                "file_mtime_ns": session_file.stat().st_mtime_ns,
+                "project": "my_app",
+                "message_count": 1,
+            }
 
             result = sync_module.sync_session_file(session_file, "my_app", "local")
 
             assert result is not None
             assert result.get("skipped") is True
+
+    def test_sync_uses_preloaded_file_info(self, tmp_path):
+        """A preloaded file info map should replace the per-session lookup."""
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+
+        project_dir = tmp_path / "my_app"
+        project_dir.mkdir()
+        session_file = project_dir / "test-session.jsonl"
+        session_file.write_text('{"type": "user", "message": {"content": "hello"}}\n')
+
+        with patch.object(sync_module, "CLAUDE_PROJECTS_DIR", tmp_path), \
+             patch.object(db, "get_session_file_info") as mock_file_info, \
+             patch.object(db, "get_session_import_state") as mock_state:
+
+            file_hash = sync_module.compute_file_hash(session_file)
+            stat = session_file.stat()
+            file_info = {"test-session": (stat.st_size, file_hash, stat.st_mtime_ns, "my_app")}
+
+            result = sync_module.sync_session_file(
+                session_file, "my_app", "local", file_info=file_info
+            )
+
+            assert result.get("skipped") is True
+            assert result["project"] == "my_app"
+            mock_file_info.assert_not_called()
+            mock_state.assert_not_called()
+
+
+class TestReindexAll:
+    """Tests for rebuilding the index from the synced sessions directory."""
+
+    def test_reindexes_all_projects(self, tmp_path):
+        """Every session file should be upserted with its messages."""
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+
+        sessions_dir = tmp_path / "sessions"
+        for project, session_id in [("alpha", "s1"), ("alpha", "s2"), ("beta", "s3")]:
+            project_dir = sessions_dir / project
+            project_dir.mkdir(parents=True, exist_ok=True)
+            (project_dir / f"{session_id}.jsonl").write_text(
+                '{"type": "user", "message": {"content": "hello"}, "timestamp": "2025-01-01T00:00:00Z"}\n'
+            )
+
+        with patch.object(sync_module, "SESSIONS_DIR", sessions_dir), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                results = sync_module.reindex_all()
+
+                assert results == {"sessions": 3, "messages": 3}
+                assert db.get_projects() == ["alpha", "beta"]
+                assert db.get_session_detail("s3")["project"] == "beta"
+                assert db.get_message_count("s1") == 1
+            finally:
+                db.close_connection()
+
+    def test_message_rows_are_streamed(self, tmp_path):
+        """Import paths should hand message rows to the database lazily."""
+        from types import GeneratorType
+
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+        from agent_session_viewer.parser import parse_session
+
+        session_dir = tmp_path / "sessions" / "alpha"
+        session_dir.mkdir(parents=True)
+        session_path = session_dir / "s1.jsonl"
+        session_path.write_text(
+            '{"type": "user", "message": {"content": "hello"}, "timestamp": "2025-01-01T00:00:00Z"}\n'
+        )
+
+        batches = []
+        with patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(db, "replace_session_messages",
+                          lambda session_id, rows: batches.append(rows)):
+            db.init_db()
+            try:
+                sync_module.reindex_all()
+                metadata, messages = parse_session(session_path, "alpha")
+                sync_module._store_parsed_session("s1", (metadata, messages, 1, "h", None))
+            finally:
+                db.close_connection()
+
+        assert len(batches) == 2
+        assert all(isinstance(rows, GeneratorType) for rows in batches)
+
+
+class TestSyncProject:
+    """Tests for syncing a whole project directory."""
+
+    def test_parallel_reads_sync_every_session(self, tmp_path):
+        """Sessions parsed on worker threads should all be written and reported in order."""
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+
+        project_dir = tmp_path / "projects" / "my_app"
+        project_dir.mkdir(parents=True)
+        session_ids = [f"sess-{i}" for i in range(6)]
+        for session_id in session_ids:
+            (project_dir / f"{session_id}.jsonl").write_text(
+                '{"type": "user", "message": {"content": "hello"}, "timestamp": "2025-01-01T00:00:00Z"}\n'
+            )
+
+        events = []
+        with patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(sync_module, "SYNC_WORKERS", 2), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                stats = sync_module.sync_project(
+                    project_dir, on_progress=lambda event, **kw: events.append((event, kw))
+                )
+                again = sync_module.sync_project(project_dir)
+
+                assert (stats["total"], stats["synced"]) == (6, 6)
+                assert (again["synced"], again["skipped"]) == (0, 6)
+                started = [kw["session"] for event, kw in events if event == "session_start"]
+                assert started == [f.stem for f in project_dir.glob("*.jsonl")]
+                assert all(db.get_message_count(s) == 1 for s in session_ids)
+            finally:
+                db.close_connection()
+
+    def test_file_info_loaded_in_one_query(self, tmp_path):
+        """Unchanged sessions should be skipped after one bulk query, with no per-session lookups."""
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+
+        project_dir = tmp_path / "projects" / "my_app"
+        project_dir.mkdir(parents=True)
+        for i in range(4):
+            (project_dir / f"sess-{i}.jsonl").write_text(
+                '{"type": "user", "message": {"content": "hello"}, "timestamp": "2025-01-01T00:00:00Z"}\n'
+            )
+
+        with patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                sync_module.sync_project(project_dir)
+                with patch.object(db, "get_all_session_file_info",
+                                  wraps=db.get_all_session_file_info) as mock_all, \
+                     patch.object(db, "get_session_file_info") as mock_one, \
+                     patch.object(db, "get_session_import_state") as mock_state:
+                    stats = sync_module.sync_project(project_dir)
+
+                assert stats["skipped"] == 4
+                assert mock_all.call_count == 1
+                mock_one.assert_not_called()
+                mock_state.assert_not_called()
+            finally:
+                db.close_connection()
+
+    @pytest.mark.parametrize("interval,commits", [(60.0, 1), (0.0, 5)])
+    def test_sessions_stored_in_timed_transactions(self, tmp_path, interval, commits):
+        """Consecutive sessions should share a transaction until the commit interval passes."""
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+
+        project_dir = tmp_path / "projects" / "my_app"
+        project_dir.mkdir(parents=True)
+        for i in range(5):
+            (project_dir / f"sess-{i}.jsonl").write_text(
+                '{"type": "user", "message": {"content": "hello"}, "timestamp": "2025-01-01T00:00:00Z"}\n'
+            )
+
+        statements = []
+        with patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(sync_module, "SYNC_COMMIT_INTERVAL", interval), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                db._thread_connection().set_trace_callback(statements.append)
+                stats = sync_module.sync_project(project_dir)
+                db._thread_connection().set_trace_callback(None)
+
+                assert stats["synced"] == 5
+                assert statements.count("BEGIN IMMEDIATE") == commits
+                assert all(db.get_message_count(f"sess-{i}") == 1 for i in range(5))
+            finally:
+                db.close_connection()
+
+    def test_failed_store_keeps_earlier_sessions(self, tmp_path):
+        """A session that fails to store should not roll back those stored before it."""
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+
+        project_dir = tmp_path / "projects" / "my_app"
+        project_dir.mkdir(parents=True)
+        for i in range(3):
+            (project_dir / f"sess-{i}.jsonl").write_text(
+                '{"type": "user", "message": {"content": "hello"}, "timestamp": "2025-01-01T00:00:00Z"}\n'
+            )
+        store_read = sync_module._store_read
+        stored = []
+
+        def failing_store(result, parsed):
+            store_read(result, parsed)
+            stored.append(result["session_id"])
+            if len(stored) == 2:
+                raise RuntimeError("boom")
+
+        with patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(sync_module, "SYNC_COMMIT_INTERVAL", 60.0), \
+             patch.object(sync_module, "_store_read", failing_store), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                with pytest.raises(RuntimeError):
+                    sync_module.sync_project(project_dir)
+
+                first, failed = stored
+                assert db.get_message_count(first) == 1
+                assert not db.session_exists(failed)
+                assert [f"sess-{i}" for i in range(3) if db.session_exists(f"sess-{i}")] == [first]
+            finally:
+                db.close_connection()
+
+    def test_sync_all_shares_reads_across_projects(self, tmp_path):
+        """Each project's stats and progress should cover only its own files."""
+        from agent_session_viewer import db
+        from agent_session_viewer import sync as sync_module
+
+        projects_dir = tmp_path / "projects"
+        layout = {"-code-alpha": 3, "-code-beta": 0, "-code-gamma": 2}
+        for name, count in layout.items():
+            (projects_dir / name).mkdir(parents=True)
+            for i in range(count):
+                (projects_dir / name / f"{name}-{i}.jsonl").write_text(
+                    '{"type": "user", "message": {"content": "hello"}, "timestamp": "2025-01-01T00:00:00Z"}\n'
+                )
+        codex_file = tmp_path / "codex" / "2025" / "01" / "01" / "rollout-1.jsonl"
+        codex_file.parent.mkdir(parents=True)
+        codex_file.write_text(
+            '{"timestamp":"2025-01-01T00:00:00Z","type":"session_meta",'
+            '"payload":{"id":"cx-1","cwd":"/home/u/code/delta","originator":"codex_cli_rs"}}\n'
+        )
+
+        events = []
+        with patch.object(sync_module, "CLAUDE_PROJECTS_DIR", projects_dir), \
+             patch.object(sync_module, "CODEX_SESSIONS_DIR", tmp_path / "codex"), \
+             patch.object(sync_module, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(sync_module, "SYNC_WORKERS", 2), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                results = sync_module.sync_all(
+                    on_progress=lambda event, **kw: events.append((event, kw))
+                )
+            finally:
+                db.close_connection()
+
+        assert [(p["project"], p["total"]) for p in results["projects"]] == [
+            ("alpha", 3), ("beta", 0), ("gamma", 2), ("codex", 1),
+        ]
+        assert results["total_sessions"] == results["total_synced"] == 6
+        current = None
+        for event, kw in events:
+            if event == "project_start":
+                current = kw["project"]
+            elif event == "session_start" and current != "codex":
+                assert kw["session"].startswith(f"-code-{current}-")
+
+
+class TestSyncSessionFile:
+    """Tests for importing a changed session file."""
+
+    def test_copy_hash_and_parse_in_one_read(self, tmp_path):
+        """The local copy, stored hash and messages should all match the source."""
+        from agent_session_viewer import db
+
+        source = tmp_path / "projects" / "-my-app" / "sess-1.jsonl"
+        source.parent.mkdir(parents=True)
+        lines = [
+            json.dumps({"type": "user", "timestamp": f"2025-01-01T00:00:0{i}Z",
+                        "message": {"content": f"message {i}"}})
+            for i in range(3)
+        ]
+        # No trailing newline on the last line
+        source.write_text("\n".join(lines))
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"), \
+             patch.object(sync, "FILE_CHUNK_SIZE", 16):
+            db.init_db()
+            try:
+                result = sync.sync_session_file(source, "my_app")
+                state = db.get_session_import_state("sess-1")
+                stored_messages = db.get_session_messages("sess-1")
+            finally:
+                db.close_connection()
+
+        copy = tmp_path / "sessions" / "my_app" / "sess-1.jsonl"
+        assert result["messages"] == 3
+        assert copy.read_bytes() == source.read_bytes()
+        assert copy.stat().st_mtime == source.stat().st_mtime
+        assert state["file_size"] == source.stat().st_size
+        assert state["file_hash"] == sync.compute_file_hash(source)
+        assert [m["content"] for m in stored_messages] == ["message 0", "message 1", "message 2"]
+
+    @staticmethod
+    def _line(i):
+        return json.dumps({"type": "user", "timestamp": f"2025-01-01T00:00:{i:02d}Z",
+                           "message": {"content": f"message {i}"}}) + "\n"
+
+    def test_appended_lines_are_parsed_alone(self, tmp_path):
+        """A grown file with an unchanged prefix should only insert its new messages."""
+        from agent_session_viewer import db
+
+        source = tmp_path / "projects" / "-my-app" / "sess-1.jsonl"
+        source.parent.mkdir(parents=True)
+        source.write_text(self._line(0) + self._line(1))
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            db.init_db()
+            try:
+                sync.sync_session_file(source, "my_app")
+                # A partial last line is left for the next sync
+                with open(source, "a") as f:
+                    f.write(self._line(2) + self._line(3)[:10])
+
+                with patch.object(db, "replace_session_messages") as mock_replace:
+                    result = sync.sync_session_file(source, "my_app")
+                mock_replace.assert_not_called()
+                assert result["messages"] == 1
+
+                with open(source, "a") as f:
+                    f.write(self._line(3)[10:])
+                sync.sync_session_file(source, "my_app")
+
+                detail = db.get_session_detail("sess-1")
+                contents = [m["content"] for m in db.get_session_messages("sess-1")]
+            finally:
+                db.close_connection()
+
+        assert contents == [f"message {i}" for i in range(4)]
+        assert detail["message_count"] == 4
+        assert detail["started_at"] == "2025-01-01T00:00:00+00:00"
+        assert detail["ended_at"] == "2025-01-01T00:00:03+00:00"
+        assert detail["file_hash"] == sync.compute_file_hash(source)
+        copy = tmp_path / "sessions" / "my_app" / "sess-1.jsonl"
+        assert copy.read_bytes() == source.read_bytes()
+
+    def test_rewritten_prefix_reimports_whole_file(self, tmp_path):
+        """A grown file whose earlier bytes changed should be fully re-imported."""
+        from agent_session_viewer import db
+
+        source = tmp_path / "projects" / "-my-app" / "sess-1.jsonl"
+        source.parent.mkdir(parents=True)
+        source.write_text(self._line(0))
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            db.init_db()
+            try:
+                sync.sync_session_file(source, "my_app")
+                source.write_text(self._line(5) + self._line(6))
+
+                sync.sync_session_file(source, "my_app")
+                contents = [m["content"] for m in db.get_session_messages("sess-1")]
+            finally:
+                db.close_connection()
+
+        assert contents == ["message 5", "message 6"]
+
+    def test_appended_lines_reimport_if_session_changed_meanwhile(self, tmp_path):
+        """If the stored session moved on after the read, the write re-imports."""
+        from agent_session_viewer import db
+
+        source = tmp_path / "projects" / "-my-app" / "sess-1.jsonl"
+        source.parent.mkdir(parents=True)
+        source.write_text(self._line(0))
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            db.init_db()
+            try:
+                sync.sync_session_file(source, "my_app")
+                with open(source, "a") as f:
+                    f.write(self._line(1))
+
+                result, parsed = sync._read_session_file(source, "my_app", "local", False, None)
+                assert isinstance(parsed, sync.AppendedLines)
+                with db.get_db() as conn:
+                    conn.execute("UPDATE sessions SET file_hash = 'other' WHERE id = 'sess-1'")
+
+                sync._store_read(result, parsed)
+                contents = [m["content"] for m in db.get_session_messages("sess-1")]
+                detail = db.get_session_detail("sess-1")
+            finally:
+                db.close_connection()
+
+        assert contents == ["message 0", "message 1"]
+        assert detail["file_hash"] == sync.compute_file_hash(source)
+
+    def test_codex_appended_lines_are_parsed_alone(self, tmp_path):
+        """A grown Codex rollout should only insert its new messages."""
+        from agent_session_viewer import db
+
+        def item(i, role="user", timestamp=True):
+            entry = {"type": "response_item", "payload": {
+                "type": "message", "role": role,
+                "content": [{"type": "input_text", "text": f"message {i}"}]}}
+            if timestamp:
+                entry = {"timestamp": f"2025-01-01T00:00:0{i}Z", **entry}
+            return json.dumps(entry, separators=(",", ":")) + "\n"
+
+        source = tmp_path / "rollout-2025-01-01T00-00-00-cx.jsonl"
+        source.write_text(
+            '{"timestamp":"2025-01-01T00:00:00Z","type":"session_meta",'
+            '"payload":{"id":"cx","cwd":"/home/u/code/app"}}\n' + item(0)
+        )
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            db.init_db()
+            try:
+                sync.sync_codex_session(source)
+                with open(source, "a") as f:
+                    f.write(item(1, "assistant", timestamp=False))
+
+                with patch.object(db, "replace_session_messages") as mock_replace:
+                    result = sync.sync_codex_session(source)
+                mock_replace.assert_not_called()
+                assert (result["session_id"], result["messages"]) == ("codex:cx", 1)
+
+                # A session changed between read and write is re-imported whole
+                with open(source, "a") as f:
+                    f.write(item(2))
+                result, parsed = sync._read_codex_session(source, "local", False, None)
+                assert isinstance(parsed, sync.AppendedLines)
+                with db.get_db() as conn:
+                    conn.execute("UPDATE sessions SET file_hash = 'other' WHERE id = 'codex:cx'")
+                sync._store_read(result, parsed)
+
+                messages = db.get_session_messages("codex:cx")
+                detail = db.get_session_detail("codex:cx")
+            finally:
+                db.close_connection()
+
+        assert {(m["msg_id"], m["content"]) for m in messages} == {
+            ("msg-2025-01-01T00-00-00Z", "message 0"),
+            ("msg-1", "message 1"),
+            ("msg-2025-01-01T00-00-02Z", "message 2"),
+        }
+        assert (detail["message_count"], detail["agent"]) == (3, "codex")
+        assert detail["file_hash"] == sync.compute_file_hash(source)
+        copy = tmp_path / "sessions" / "codex_app" / "codex:cx.jsonl"
+        assert copy.read_bytes() == source.read_bytes()
+
+    def test_unchanged_mtime_skips_hashing(self, tmp_path):
+        """A matching size and mtime should skip the file without reading it."""
+        from agent_session_viewer import db
+
+        source = tmp_path / "projects" / "-my-app" / "sess-1.jsonl"
+        source.parent.mkdir(parents=True)
+        source.write_text('{"type":"user","message":{"content":"hi"}}\n')
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            db.init_db()
+            try:
+                sync.sync_session_file(source, "my_app")
+                assert db.get_session_file_info("sess-1")[2] == source.stat().st_mtime_ns
+
+                with patch.object(sync, "compute_file_hash") as mock_hash:
+                    result = sync.sync_session_file(source, "my_app")
+                assert result["skipped"] is True
+                mock_hash.assert_not_called()
+            finally:
+                db.close_connection()
+
+    def test_touched_file_records_new_mtime(self, tmp_path):
+        """Same content under a new mtime should be skipped and the mtime stored."""
+        import os
+
+        from agent_session_viewer import db
+
+        source = tmp_path / "projects" / "-my-app" / "sess-1.jsonl"
+        source.parent.mkdir(parents=True)
+        source.write_text('{"type":"user","message":{"content":"hi"}}\n')
+
+        with patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            db.init_db()
+            try:
+                sync.sync_session_file(source, "my_app")
+                touched = source.stat().st_mtime_ns + 1_000_000_000
+                os.utime(source, ns=(touched, touched))
+
+                result = sync.sync_session_file(source, "my_app")
+                assert result["skipped"] is True
+                assert db.get_session_file_info("sess-1")[2] == touched
+            finally:
+                db.close_connection()
+
+    def test_legacy_md5_hash_is_upgraded_without_reimport(self, tmp_path):
+        """Rows hashed by older versions (MD5) should only have their hash replaced."""
+        import hashlib
+
+        from agent_session_viewer import db
+
+        source = tmp_path / "sess-2.jsonl"
+        source.write_text('{"type":"user","message":{"content":"hi"}}\n')
+        md5 = hashlib.md5(source.read_bytes()).hexdigest()
+        current = sync.compute_file_hash(source)
+        if len(current) == len(md5):
+            pytest.skip("legacy hashes are only told apart by length with blake3")
+
+        with patch.object(db, "get_session_import_state", return_value={
+                 "file_size": source.stat().st_size, "file_hash": md5, "project": "p"}), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            result, parsed = sync._read_session_file(source, "p", "local", False, None)
+
+        assert parsed is None
+        assert result["skipped"] is True
+        assert result["file_hash"] == current
+        assert result["file_mtime_ns"] == source.stat().st_mtime_ns
+
+        # A different MD5 of the same length is still a changed file
+        with patch.object(db, "get_session_import_state", return_value={
+                 "file_size": source.stat().st_size, "file_hash": "0" * 32, "project": "p"}), \
+             patch.object(sync, "SESSIONS_DIR", tmp_path / "sessions"):
+            result, parsed = sync._read_session_file(source, "p", "local", False, None)
+
+        assert result["skipped"] is False
+        assert parsed[3] == current
+
+    def test_copied_lines_then_rest(self, tmp_path):
+        """Copying some lines and then the rest should match compute_file_hash."""
+        source = tmp_path / "a.jsonl"
+        source.write_bytes(b"".join(b"line %d\n" % i for i in range(50)) + bytes(range(256)) * 3)
+
+        hasher = sync._new_hasher()
+        with patch.object(sync, "FILE_CHUNK_SIZE", 100), \
+             open(source, "rb") as f, open(tmp_path / "b.jsonl", "wb") as out:
+            lines = sync._copied_lines(f, hasher, out)
+            for _ in range(10):
+                next(lines)
+            sync._copy_rest(f, hasher, out)
+
+        assert hasher.hexdigest() == sync.compute_file_hash(source)
+        assert (tmp_path / "b.jsonl").read_bytes() == source.read_bytes()
+
+
+class TestSyncSessionTail:
+    """Tests for incremental syncing of live session files."""
+
+    @staticmethod
+    def _line(i, role="user"):
+        return json.dumps({
+            "type": role,
+            "timestamp": f"2025-01-01T00:00:{i:02d}Z",
+            "message": {"content": f"message {i}"},
+        }) + "\n"
+
+    @pytest.fixture
+    def env(self, tmp_path):
+        from agent_session_viewer import db
+
+        sessions_dir = tmp_path / "sessions"
+        with patch.object(sync, "SESSIONS_DIR", sessions_dir), \
+             patch.object(db, "DB_PATH", tmp_path / "test.db"), \
+             patch.object(db, "DATA_DIR", tmp_path):
+            db.init_db()
+            try:
+                yield tmp_path / "my_app", sessions_dir
+            finally:
+                db.close_connection()
+
+    def test_appended_lines_match_full_parse(self, env):
+        """Incremental syncs should end in the same state as a full import."""
+        from agent_session_viewer import db
+
+        project_dir, sessions_dir = env
+        project_dir.mkdir()
+        source = project_dir / "sess-1.jsonl"
+        source.write_text(self._line(0) + self._line(1, "assistant"))
+
+        result, tail = sync.sync_session_tail(source, "my_app")
+        assert result["messages"] == 2
+
+        with source.open("a") as f:
+            f.write(self._line(2) + self._line(3, "assistant"))
+        with patch.object(sync, "parse_session") as mock_full_parse:
+            result, tail = sync.sync_session_tail(source, "my_app", tail=tail)
+            mock_full_parse.assert_not_called()
+
+        assert result == {"session_id": "sess-1", "project": "my_app",
+                          "skipped": False, "messages": 2}
+        _, expected = sync.parse_session(source, "my_app")
+        stored = db.get_session_messages("sess-1")
+        assert [(m["msg_id"], m["content"]) for m in stored] == [
+            (m.msg_id, m.content) for m in expected
+        ]
+        session = db.get_session_detail("sess-1")
+        assert session["message_count"] == 4
+        assert session["started_at"] == "2025-01-01T00:00:00+00:00"
+        assert session["ended_at"] == "2025-01-01T00:00:03+00:00"
+        assert session["file_size"] == source.stat().st_size
+        assert session["file_hash"] == sync.compute_file_hash(source)
+        assert (sessions_dir / "my_app" / "sess-1.jsonl").read_bytes() == source.read_bytes()
+
+    def test_missing_local_copy_reimports(self, env):
+        """If the local copy is gone, the next call should re-import the whole file."""
+        from agent_session_viewer import db
+
+        project_dir, sessions_dir = env
+        project_dir.mkdir()
+        source = project_dir / "sess-1.jsonl"
+        source.write_text(self._line(0))
+
+        _, tail = sync.sync_session_tail(source, "my_app")
+        (sessions_dir / "my_app" / "sess-1.jsonl").unlink()
+        with source.open("a") as f:
+            f.write(self._line(1))
+
+        result, tail = sync.sync_session_tail(source, "my_app", tail=tail)
+
+        assert result["messages"] == 2
+        assert tail.offset == source.stat().st_size
+        assert db.get_message_count("sess-1") == 2
+        assert (sessions_dir / "my_app" / "sess-1.jsonl").read_bytes() == source.read_bytes()
+
+    def test_partial_line_waits_for_newline(self, env):
+        """A line still being written should be ingested once it is complete."""
+        from agent_session_viewer import db
+
+        project_dir, _ = env
+        project_dir.mkdir()
+        source = project_dir / "sess-1.jsonl"
+        line = self._line(1)
+        source.write_text(self._line(0) + line[:10])
+
+        result, tail = sync.sync_session_tail(source, "my_app")
+        assert result["messages"] == 1
+
+        result, tail = sync.sync_session_tail(source, "my_app", tail=tail)
+        assert result["skipped"] is True
+
+        with source.open("a") as f:
+            f.write(line[10:])
+        result, tail = sync.sync_session_tail(source, "my_app", tail=tail)
+        assert result["messages"] == 1
+        assert db.get_message_count("sess-1") == 2
+
+    def test_rewritten_file_is_reimported(self, env):
+        """A truncated file or a full sync in between should force a full import."""
+        from agent_session_viewer import db
+
+        project_dir, _ = env
+        project_dir.mkdir()
+        source = project_dir / "sess-1.jsonl"
+        source.write_text(self._line(0) + self._line(1))
+        _, tail = sync.sync_session_tail(source, "my_app")
+
+        # Truncated and rewritten in place
+        with source.open("w") as f:
+            f.write(self._line(5))
+        result, tail = sync.sync_session_tail(source, "my_app", tail=tail)
+        assert result["messages"] == 1
+        assert db.get_message_count("sess-1") == 1
+
+        # Another writer re-imports the session after more lines arrive
+        with source.open("a") as f:
+            f.write(self._line(6))
+        sync.sync_session_file(source, "my_app", force=True)
+        with source.open("a") as f:
+            f.write(self._line(7))
+        result, tail = sync.sync_session_tail(source, "my_app", tail=tail)
+        assert result["messages"] == 3
+        assert db.get_message_count("sess-1") == 3